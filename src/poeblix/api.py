@@ -0,0 +1,216 @@
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Mapping, Optional, Sequence, Tuple, Union
+
+from poeblix.util.daemon import project_stamps
+
+"""
+Python API to build and validate wheels in the current process, without starting the poetry CLI:
+
+    from poeblix import api
+
+    result = api.build("path/to/project", only_lock=True)
+    print(result.wheels, result.cached)
+    assert api.validate_wheel(result.wheels[0], "path/to/project", only_lock=True)
+
+Projects stay loaded between calls, like in `poetry blixdaemon`, until their pyproject.toml, poetry.lock or poetry.toml
+change, so that repeated calls only pay for loading Poetry and the project once.  Keyword arguments are named like the
+options of the blix commands, and relative paths are relative to the current working directory.
+
+This module is imported by poeblix.plugins, so it must not import Poetry or poeblix modules which do at the top level.
+"""
+
+StrPath = Union[str, "os.PathLike[str]"]
+
+
+class BuildResult:
+    """Wheels built by build(), whether they were copied from the build cache, and how long it took"""
+
+    __slots__ = ("wheels", "cached", "seconds", "output")
+
+    def __init__(self, wheels: List[Path], cached: bool, seconds: float, output: str = "") -> None:
+        self.wheels = wheels
+        self.cached = cached
+        self.seconds = seconds
+        # What `poetry blixbuild` would have printed
+        self.output = output
+
+    def __repr__(self) -> str:
+        return f"BuildResult(wheels={self.wheels}, cached={self.cached}, seconds={self.seconds:.2f})"
+
+
+class ValidationResult:
+    """Outcome of validate_wheel(), which is truthy if the wheel is valid"""
+
+    __slots__ = ("wheel", "valid", "error", "seconds", "output")
+
+    def __init__(self, wheel: Path, valid: bool, error: Optional[str], seconds: float, output: str = "") -> None:
+        self.wheel = wheel
+        self.valid = valid
+        # Why the wheel is not valid, None if it is
+        self.error = error
+        self.seconds = seconds
+        # What `poetry blixvalidatewheel` would have printed
+        self.output = output
+
+    def __bool__(self) -> bool:
+        return self.valid
+
+    def __repr__(self) -> str:
+        return f"ValidationResult(wheel={self.wheel}, valid={self.valid}, error={self.error!r})"
+
+
+# Loaded projects by directory, with the stamps of their files when they were loaded
+_projects: Dict[Path, Tuple[Any, Any, Any]] = {}
+_projects_lock = threading.Lock()
+
+
+def load_project(project_dir: StrPath = ".") -> Tuple[Any, Any]:
+    """
+    Poetry project and virtualenv of a project directory, loaded once and kept until its pyproject.toml, poetry.lock or
+    poetry.toml change.
+    """
+    from cleo.io.null_io import NullIO
+    from poetry.factory import Factory
+    from poetry.utils.env import EnvManager
+
+    project = Path(project_dir).resolve()
+    stamps = project_stamps(str(project))
+    if stamps[0] is None:
+        raise RuntimeError(f"Poetry could not find a pyproject.toml file in {project}")
+    with _projects_lock:
+        loaded = _projects.get(project)
+        if loaded is None or loaded[0] != stamps:
+            poetry = Factory().create_poetry(project)
+            env = EnvManager(poetry, io=NullIO()).create_venv()
+            loaded = _projects[project] = (stamps, poetry, env)
+    return loaded[1], loaded[2]
+
+
+def unload_projects() -> None:
+    """Unloads all projects loaded by previous calls"""
+    with _projects_lock:
+        _projects.clear()
+
+
+def _option_func(values: Mapping[str, Any]) -> Callable[[str], Any]:
+    """A command's `option` function reading the given option values, and None for the others"""
+    return lambda name: values.get(name)
+
+
+def _output() -> Tuple[Any, Callable[..., None]]:
+    """Buffer of what a command would have printed, and a `line` function writing to it"""
+    from cleo.formatters.style import Style
+    from cleo.io.outputs.buffered_output import BufferedOutput
+
+    output = BufferedOutput(decorated=False)
+    # Styles Poetry's commands use, which are otherwise printed as tags
+    for style in ("c1", "c2", "debug", "success"):
+        output.formatter.set_style(style, Style())
+    return output, output.write_line
+
+
+def _absolute(path: Optional[StrPath]) -> Optional[str]:
+    return None if path is None else os.path.abspath(path)
+
+
+def build(
+    project_dir: StrPath = ".",
+    *,
+    no_lock: bool = False,
+    only_lock: bool = False,
+    with_groups: Sequence[str] = (),
+    group_sets: Sequence[str] = (),
+    target_envs: Sequence[StrPath] = (),
+    force: bool = False,
+    no_build_cache: bool = False,
+    reproducible: bool = False,
+    variant: Optional[str] = None,
+    workers: int = 1,
+    cache_dir: Optional[StrPath] = None,
+    no_resolution_cache: bool = False,
+    fast_resolve: bool = False,
+    locked_only: bool = False,
+    marker_env: Optional[StrPath] = None,
+    full_solve: bool = False,
+) -> BuildResult:
+    """
+    Builds the wheels of a project like `poetry blixbuild`, into its dist/ folder.  `group_sets` are comma delimited
+    lists of groups like --group-set, and `target_envs` paths to marker snapshots like --target-env.  Raises the same
+    errors as the command fails with.
+    """
+    from poeblix.plugins import BlixBuild
+
+    poetry, env = load_project(project_dir)
+    option = _option_func(
+        {
+            "no-lock": no_lock,
+            "only-lock": only_lock,
+            "with-groups": list(with_groups),
+            "group-set": list(group_sets),
+            "target-env": [_absolute(path) for path in target_envs],
+            "force": force,
+            "no-build-cache": no_build_cache,
+            "reproducible": reproducible,
+            "variant": variant,
+            "workers": str(workers),
+            "cache-dir": _absolute(cache_dir),
+            "no-resolution-cache": no_resolution_cache,
+            "fast-resolve": fast_resolve,
+            "locked-only": locked_only,
+            "marker-env": _absolute(marker_env),
+            "full-solve": full_solve,
+        }
+    )
+    output, line = _output()
+    result = BlixBuild(poetry, env, option, line, line).run()
+    result.output = output.fetch()
+    return result
+
+
+def validate_wheel(
+    wheel_path: StrPath,
+    project_dir: StrPath = ".",
+    *,
+    no_lock: bool = False,
+    with_groups: Sequence[str] = (),
+    target_envs: Sequence[StrPath] = (),
+    ignore_manifest: bool = False,
+    cache_dir: Optional[StrPath] = None,
+    no_resolution_cache: bool = False,
+    fast_resolve: bool = False,
+    locked_only: bool = False,
+    marker_env: Optional[StrPath] = None,
+    full_solve: bool = False,
+) -> ValidationResult:
+    """
+    Validates a wheel against a project like `poetry blixvalidatewheel`.  A wheel which does not match the project
+    gives an invalid result with the reason in `error`, other errors such as a missing wheel are raised.
+    """
+    from poeblix.validatewheel import WheelValidator
+
+    poetry, env = load_project(project_dir)
+    option = _option_func(
+        {
+            "no-lock": no_lock,
+            "with-groups": list(with_groups),
+            "target-env": [_absolute(path) for path in target_envs],
+            "ignore-manifest": ignore_manifest,
+            "cache-dir": _absolute(cache_dir),
+            "no-resolution-cache": no_resolution_cache,
+            "fast-resolve": fast_resolve,
+            "locked-only": locked_only,
+            "marker-env": _absolute(marker_env),
+            "full-solve": full_solve,
+        }
+    )
+    output, line = _output()
+    wheel = Path(wheel_path).absolute()
+    start = time.perf_counter()
+    try:
+        WheelValidator(poetry, env, option, line).validate(str(wheel))
+    except RuntimeError as e:
+        return ValidationResult(wheel, False, str(e), time.perf_counter() - start, output.fetch())
+    return ValidationResult(wheel, True, None, time.perf_counter() - start, output.fetch())
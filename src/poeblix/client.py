@@ -0,0 +1,64 @@
+import argparse
+import os
+import subprocess
+import sys
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from poeblix.util import daemon
+
+"""
+Thin client of `poetry blixdaemon`, which sends a blix command to the daemon and prints its output, without starting
+Poetry.  If no daemon is listening, runs the command with `poetry` instead, so the same calls work with or without one:
+
+    python -m poeblix.client blixbuild --only-lock
+    python -m poeblix.client --stop
+"""
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m poeblix.client",
+        description="Runs a blix command through the blix daemon started by `poetry blixdaemon`.",
+    )
+    parser.add_argument(
+        "--socket",
+        help=f"Socket of the daemon.  Defaults to the {daemon.SOCKET_ENV} environment variable, or the default "
+        "socket of `poetry blixdaemon`.",
+    )
+    parser.add_argument("--stop", action="store_true", help="Stops the daemon.")
+    parser.add_argument(
+        "--no-fallback",
+        action="store_true",
+        help="Fails if no daemon is listening, instead of running the command with `poetry`.",
+    )
+    parser.add_argument("command", nargs=argparse.REMAINDER, help="The blix command and its arguments.")
+    args = parser.parse_args(argv)
+
+    socket_path = Path(args.socket).expanduser() if args.socket else daemon.default_socket_path()
+    message: Dict[str, Any]
+    if args.stop:
+        message = {"stop": True}
+    elif args.command:
+        message = {"cwd": os.getcwd(), "argv": args.command, "env": dict(os.environ)}
+    else:
+        parser.error("a blix command is required, e.g. blixbuild")
+
+    try:
+        response = daemon.request(socket_path, message)
+    except (FileNotFoundError, ConnectionRefusedError):
+        if args.stop:
+            print(f"No blix daemon is listening on {socket_path}", file=sys.stderr)
+            return 0
+        if args.no_fallback:
+            print(f"No blix daemon is listening on {socket_path}, start one with `poetry blixdaemon`", file=sys.stderr)
+            return 1
+        return subprocess.call(["poetry", *args.command])
+
+    sys.stdout.write(response.get("output", ""))
+    sys.stdout.flush()
+    return response["exit_code"]
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,89 @@
+import os
+from pathlib import Path
+from typing import List, ClassVar
+
+from cleo.helpers import option
+from cleo.io.inputs.option import Option
+
+# For fixing https://github.com/python-poetry/poetry/issues/5216
+from packaging.tags import sys_tags  # noqa
+from poetry.console.commands.command import Command
+
+from poeblix.util import daemon, util
+
+
+class DaemonPlugin(Command):
+    """
+    Runs a daemon which keeps Poetry and the projects it runs blix commands for loaded, so that repeated commands do
+    not pay for starting Poetry each time.  Clients send commands with `python -m poeblix.client`.  Like
+    `blixworkspace`, it does not need to be run in a project.
+    """
+
+    name = "blixdaemon"
+    description = (
+        "Runs a daemon serving blix commands sent by `python -m poeblix.client` over a Unix socket, keeping Poetry and "
+        "each project loaded between commands.  Stops after it was idle for a while."
+    )
+
+    options: ClassVar[List[Option]] = [
+        option(
+            "socket",
+            None,
+            f"Path of the Unix socket to listen on.  Defaults to the {daemon.SOCKET_ENV} environment variable, or "
+            "poeblix-<uid>.sock in $XDG_RUNTIME_DIR or the temporary directory.",
+            flag=False,
+        ),
+        option(
+            "jobs",
+            None,
+            "Number of commands run at the same time, for different projects.  Commands of the same project always "
+            "run one after another.  Defaults to 1, use 0 for one per CPU.",
+            flag=False,
+            default="1",
+        ),
+        option(
+            "max-projects",
+            None,
+            "Number of projects kept loaded, each by a worker process of its own.  The least recently used project is "
+            "unloaded first.",
+            flag=False,
+            default="8",
+        ),
+        option(
+            "idle-timeout",
+            None,
+            "Stops the daemon after this many seconds without commands.",
+            flag=False,
+            default="900",
+        ),
+    ]
+
+    def handle(self) -> int:
+        try:
+            jobs = util.parse_workers(self.option("jobs"))
+        except ValueError:
+            raise ValueError(f"--jobs must be a non-negative integer, got [{self.option('jobs')}]")
+        try:
+            max_projects = int(self.option("max-projects"))
+            idle_timeout = float(self.option("idle-timeout"))
+        except ValueError:
+            raise ValueError("--max-projects and --idle-timeout must be numbers")
+        if max_projects < 1 or idle_timeout <= 0:
+            raise ValueError("--max-projects and --idle-timeout must be positive")
+
+        socket_path = (
+            Path(self.option("socket")).expanduser() if self.option("socket") else daemon.default_socket_path()
+        )
+        server = daemon.BlixDaemon(socket_path, jobs, max_projects, idle_timeout)
+
+        def on_command(project: Path, argv: List[str], exit_code: int, seconds: float) -> None:
+            status = "<info>done</info>" if exit_code == 0 else f"<error>failed with exit code {exit_code}</error>"
+            self.line(f"<c1>{project}</c1>: {' '.join(argv)} {status} in {seconds:.2f}s")
+
+        self.line(
+            f"Blix daemon {os.getpid()} listening on {socket_path} with {jobs} job(s), stops after "
+            f"{idle_timeout:g}s without commands"
+        )
+        server.serve(on_command)
+        self.line("Blix daemon stopped")
+        return 0
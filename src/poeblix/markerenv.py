@@ -0,0 +1,44 @@
+import json
+from pathlib import Path
+from typing import List, ClassVar
+
+from cleo.helpers import option
+from cleo.io.inputs.option import Option
+
+# For fixing https://github.com/python-poetry/poetry/issues/5216
+from packaging.tags import sys_tags  # noqa
+from poetry.console.commands.env_command import EnvCommand
+
+
+class MarkerEnvPlugin(EnvCommand):
+    """
+    Writes a snapshot of the environment markers of the project's environment, which can be passed to the other blix
+    commands via --marker-env to resolve dependencies for that environment without its interpreter being present.
+    """
+
+    name = "blixmarkerenv"
+    description = (
+        "Prints a snapshot of the environment markers (python version, platform, implementation, etc.) of the "
+        "project's environment as JSON.  Pass it to the --marker-env option of the other blix commands to resolve "
+        "dependencies for that environment."
+    )
+
+    options: ClassVar[List[Option]] = [
+        option(
+            "output",
+            "o",
+            "Writes the snapshot to this file instead of printing it.",
+            flag=False,
+        ),
+    ]
+
+    def handle(self) -> int:
+        content = json.dumps(self.env.marker_env, indent=2, sort_keys=True)
+        output = self.option("output")
+        if output:
+            Path(output).write_text(content + "\n", encoding="utf-8")
+            self.line(f"Wrote environment markers of {self.env.path} to {output}")
+        else:
+            self.line(content)
+
+        return 0
@@ -1,10 +1,19 @@
 from __future__ import annotations
 
+import contextlib
+import hashlib
 import os
 import shutil
+import stat
+import tempfile
+import time
 import zipfile
+from base64 import urlsafe_b64encode
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from io import StringIO
 from pathlib import Path
-from typing import Optional, List, Dict, cast, ClassVar
+from typing import Optional, List, Dict, cast, ClassVar, Any, Sequence, Deque, Iterator, Set, Tuple, Callable
 
 from cleo.helpers import option
 from cleo.io.inputs.option import Option
@@ -13,13 +22,34 @@ from cleo.io.inputs.option import Option
 from packaging.tags import sys_tags  # noqa
 from poetry.console.application import Application
 from poetry.console.commands.env_command import EnvCommand
+from poetry.core.masonry.builders.builder import BuildIncludeFile
 from poetry.core.masonry.builders.wheel import WheelBuilder, logger
-from poetry.core.poetry import Poetry
+from poetry.core.masonry.utils.helpers import normalize_file_permissions
+from poetry.core.poetry import Poetry as CorePoetry
+from poetry.installation.operations.operation import Operation
 from poetry.packages import Locker
 from poetry.plugins.application_plugin import ApplicationPlugin
+from poetry.poetry import Poetry
 from poetry.utils.env import Env
 
-from poeblix.util import util
+from poeblix.api import BuildResult
+from poeblix.util import buildcache, datafiles, discovery, manifest, targets, util, watch
+from poeblix.util.cache import BlixCache, atomic_copy, atomic_path, fingerprint
+from poeblix.util.compression import CompressionPolicy, CompressionStats
+from poeblix.util.lock import load_locked_repository
+from poeblix.util.markers import snapshot_env
+from poeblix.util.watch import Changes
+from poeblix.util.wheel import (
+    CREATE_SYSTEM_UNIX,
+    LARGE_FILE_SIZE,
+    CompressedFile,
+    Replacement,
+    compress_file,
+    rewrite_wheel,
+    source_date_time,
+    write_compressed,
+    write_file,
+)
 
 """
 This Plugin introduces a new command `poetry blix` that extends upon the regular `poetry build` command,
@@ -42,7 +72,7 @@ class BlixWheelBuilder(WheelBuilder):
 
     def __init__(
         self,
-        poetry: "Poetry",
+        poetry: "CorePoetry",
         env: Env,
         locker: Locker,
         executable: str | Path | None = None,
@@ -50,50 +80,247 @@ class BlixWheelBuilder(WheelBuilder):
         no_lock: bool = False,
         only_lock: bool = False,
         with_groups: Optional[List[str]] = None,
+        resolve_options: Optional[Dict[str, Any]] = None,
+        resolved: Optional[Sequence[Operation]] = None,
+        target_envs: Optional[List[Dict[str, Any]]] = None,
+        workers: int = 1,
+        compression: Optional[Dict[str, Any]] = None,
+        reproducible: bool = False,
+        build_cache: Optional[BlixCache] = None,
+        line: Callable[[str], None] = print,
     ) -> None:
         super().__init__(poetry, executable=executable)  # type: ignore
         self._env = env
         self._locker = locker
         self._data_files = data_files
+        # How data_files are compressed, from [tool.blix.data.compression]
+        self._compression = CompressionPolicy.from_config(compression)
+        self._compression_stats = CompressionStats()
         self._no_lock = no_lock
         self._only_lock = only_lock
         self._with_groups = with_groups
+        # Extra keyword arguments for util.resolve_dependencies, see util.get_resolve_options
+        self._resolve_options = resolve_options or {}
+        # Dependencies already resolved from the lock file, e.g. for several group sets at once
+        self._resolved = resolved
+        # Dependencies resolved for each environment when the metadata was prepared
+        self._resolutions: Optional[List[Sequence[Operation]]] = None
+        # Marker environments of target environments to resolve dependencies for, instead of the current environment
+        self._target_envs = target_envs
+        # Resolution manifest to write into the wheel's .dist-info directory, see util.manifest
+        self._manifest: Optional[Dict[str, Any]] = None
+        # Whether data_files are added to the wheel straight from their sources, instead of staged copies
+        self._stream_data_files = False
+        # Number of threads hashing and compressing files in parallel, 1 to add files one after another
+        self._workers = workers
+        self._executor: Optional[ThreadPoolExecutor] = None
+        # Files being compressed by the executor, written to the wheel in the order they were added
+        self._pending: Deque[Tuple[zipfile.ZipInfo, Future[CompressedFile], Optional[CompressionStats]]] = deque()
+        # Whether to build the same wheel byte for byte from the same inputs, on any platform
+        self._reproducible = reproducible
+        # Timestamp of all members of a reproducible wheel, from SOURCE_DATE_EPOCH
+        self._date_time: Optional[Tuple[int, int, int, int, int, int]] = None
+        # Cache of the index of package sources, see util.discovery
+        self._build_cache = build_cache
+        # Writes progress, e.g. to the command's output
+        self._line = line
+
+    def find_files_to_add(self, exclude_build: bool = True) -> Set[BuildIncludeFile]:
+        """Package sources to add to the wheel, from the index of unchanged source trees in the build cache"""
+        if self._build_cache is None:
+            return super().find_files_to_add(exclude_build)
+        return discovery.find_files_to_add(
+            self,
+            self._build_cache,
+            exclude_build,
+            lambda: super(BlixWheelBuilder, self).find_files_to_add(exclude_build),
+        )
 
-    def _get_abs_path(self, rel_path: str) -> Path:
-        """Transform a relative path to absolute path"""
-        abs_path = Path.joinpath(self._path, rel_path)
-
-        if not abs_path.exists():
-            raise RuntimeError(f"{abs_path} in data_files is not found.")
+    def _data_file_targets(self) -> Dict[Path, Path]:
+        """Maps the wheel relative paths of data_files to their source paths"""
+        expanded = datafiles.expand_data_files(self._path, self._data_files or [])
+        # Reproducible wheels list data files by path rather than in the order they are declared
+        targets = sorted(expanded.items()) if self._reproducible else expanded.items()
+        return {Path(self.wheel_data_folder, "data", target): source for target, source in targets}
+
+    def build(self, target_dir: Optional[Path] = None) -> Path:
+        target_dir = target_dir or self.default_target_dir
+        target_dir.mkdir(parents=True, exist_ok=True)
+        # Unless a PEP 517 front-end prepared the metadata directory, data_files never need to be staged on disk
+        self._stream_data_files = self._metadata_directory is None
+        self._compression_stats = CompressionStats()
+        self._date_time = source_date_time() if self._reproducible else None
+        if self._workers > 1:
+            self._executor = ThreadPoolExecutor(max_workers=self._workers, thread_name_prefix="blix-wheel")
+        try:
+            # The wheel is staged in a private directory and renamed into place, so builds running concurrently into
+            # the same directory never see or overwrite each other's partially written wheels
+            with tempfile.TemporaryDirectory(prefix=".blix-", dir=target_dir) as staging_dir:
+                staged_path = super().build(Path(staging_dir))
+                wheel_path = target_dir / staged_path.name
+                os.replace(staged_path, wheel_path)
+            summary = self._compression_stats.summary()
+            if summary is not None:
+                self._line(summary)
+            return wheel_path
+        finally:
+            self._stream_data_files = False
+            if self._executor is not None:
+                self._executor.shutdown(cancel_futures=True)
+                self._executor = None
+            for _, future, _ in self._pending:
+                if not future.cancelled() and future.exception() is None:
+                    future.result().data.close()
+            self._pending.clear()
+
+    def _zip_info(self, full_path: Path, rel_path: Path) -> zipfile.ZipInfo:
+        """Member info as WheelBuilder._add_file sets it up"""
+        zinfo = zipfile.ZipInfo(rel_path.as_posix(), self._file_date_time())
+
+        # Normalize permission bits to either 755 (executable) or 644
+        st = full_path.stat()
+        new_mode = normalize_file_permissions(st.st_mode)
+        zinfo.external_attr = (new_mode & 0xFFFF) << 16  # Unix attributes
+        if stat.S_ISDIR(st.st_mode):
+            zinfo.external_attr |= 0x10  # MS-DOS directory flag
+        zinfo.compress_type = zipfile.ZIP_DEFLATED
+        # Lets zipfile decide up front whether the member needs Zip64 extensions
+        zinfo.file_size = st.st_size
+        self._normalize_zip_info(zinfo)
+        return zinfo
+
+    def _file_date_time(self) -> Tuple[int, int, int, int, int, int]:
+        """
+        Timestamp WheelBuilder._add_file gives members: the builder's, from SOURCE_DATE_EPOCH, since poetry-core 2.0,
+        and zipfile's default before
+        """
+        return getattr(self, "_zipfile_date_time", (1980, 1, 1, 0, 0, 0))
 
-        if not abs_path.is_file():
-            raise RuntimeError(f"{abs_path} in data_files is not a file.")
+    def _normalize_zip_info(self, zinfo: zipfile.ZipInfo) -> None:
+        """Makes a member's header independent of when and where a reproducible wheel is built"""
+        if self._reproducible:
+            zinfo.create_system = CREATE_SYSTEM_UNIX
+            if self._date_time is not None:
+                zinfo.date_time = self._date_time
 
-        return abs_path
+    def _add_file(
+        self,
+        wheel: zipfile.ZipFile,
+        full_path: Path,
+        rel_path: Path,
+        compress_type: int = zipfile.ZIP_DEFLATED,
+        compress_level: Optional[int] = None,
+        stats: Optional[CompressionStats] = None,
+        zinfo: Optional[zipfile.ZipInfo] = None,
+    ) -> None:
+        """
+        Same as WheelBuilder._add_file, but reads the file once in chunks while hashing and compressing it, so large
+        files are never held in memory.  The archive is byte for byte the same.
 
-    # Hijack _copy_dist_info and also write data folder that we wrote in prepare_metadata()
+        With several workers, the file is hashed and compressed by a thread instead, and written to the wheel once it
+        and all files added before it are done.  Large files are still streamed straight into the wheel, so they are
+        never spooled to temporary files, and memory use stays the same whatever their size.
+        """
+        if zinfo is None:
+            zinfo = self._zip_info(full_path, rel_path)
+        if self._executor is not None and zinfo.file_size >= LARGE_FILE_SIZE:
+            # Files added before it come first
+            self._write_pending(wheel)
+        elif self._executor is not None:
+            future = self._executor.submit(compress_file, full_path, compress_type, compress_level)
+            self._pending.append((zinfo, future, stats))
+            # Bounds the number of compressed files waiting to be written
+            while len(self._pending) > 2 * self._workers:
+                self._write_pending(wheel, 1)
+            return
+
+        zinfo.compress_type = compress_type
+        zinfo._compresslevel = compress_level  # type: ignore
+        start = time.perf_counter()
+        hash_digest, size = write_file(wheel, zinfo, full_path)
+        self._records.append((zinfo.filename, hash_digest, size))
+        if stats is not None:
+            self._track_compression(stats, compress_type, size, zinfo.compress_size, time.perf_counter() - start)
+
+    @staticmethod
+    def _track_compression(
+        stats: CompressionStats, compress_type: int, size: int, compress_size: int, seconds: float
+    ) -> None:
+        if compress_type == zipfile.ZIP_STORED:
+            stats.add_stored(size)
+        else:
+            stats.add_deflated(size, compress_size, seconds)
+
+    def _add_data_file(self, wheel: zipfile.ZipFile, full_path: Path, rel_path: Path) -> None:
+        """Adds a data file with the compression chosen by the project's compression policy"""
+        self._line(f"Copying file from {full_path} to wheel relative {rel_path}")
+        zinfo = self._zip_info(full_path, rel_path)
+        data_path = rel_path.relative_to(Path(self.wheel_data_folder, "data")).as_posix()
+        compress_type, compress_level = self._compression.choose(
+            full_path, data_path, zinfo.file_size, self._compression_stats
+        )
+        self._add_file(wheel, full_path, rel_path, compress_type, compress_level, self._compression_stats, zinfo)
+
+    def _write_pending(self, wheel: zipfile.ZipFile, count: Optional[int] = None) -> None:
+        """Writes the oldest `count` files compressed by the executor to the wheel, or all of them"""
+        for _ in range(len(self._pending) if count is None else count):
+            zinfo, future, stats = self._pending[0]
+            compressed = future.result()
+            self._pending.popleft()
+            write_compressed(wheel, zinfo, compressed)
+            self._records.append((zinfo.filename, compressed.hash_digest, compressed.file_size))
+            if stats is not None:
+                self._track_compression(
+                    stats, compressed.compress_type, compressed.file_size, compressed.compress_size, compressed.seconds
+                )
+
+    @contextlib.contextmanager
+    def _write_to_zip(self, wheel: zipfile.ZipFile, rel_path: str) -> Iterator[StringIO]:
+        # Files still being compressed come first, e.g. before RECORD which lists them
+        self._write_pending(wheel)
+        if not self._reproducible:
+            with super()._write_to_zip(wheel, rel_path) as f:
+                yield f
+            return
+
+        # Same as WheelBuilder._write_to_zip, with the timestamp and system of reproducible wheels
+        sio = StringIO()
+        yield sio
+        zinfo = zipfile.ZipInfo(rel_path, (2016, 1, 1, 0, 0, 0))
+        zinfo.external_attr = (0o644 & 0xFFFF) << 16  # Unix attributes
+        self._normalize_zip_info(zinfo)
+        b = sio.getvalue().encode("utf-8")
+        hash_digest = urlsafe_b64encode(hashlib.sha256(b).digest()).decode("ascii").rstrip("=")
+        wheel.writestr(zinfo, b, compress_type=zipfile.ZIP_DEFLATED)
+        self._records.append((rel_path, hash_digest, len(b)))
+
+    # Hijack _copy_dist_info and also write our data files to the wheel data folder
     def _copy_dist_info(self, wheel: zipfile.ZipFile, source: Path) -> None:
         super()._copy_dist_info(wheel, source)
-        source = source.parent / self.wheel_data_folder
-        wheel_data = Path(self.wheel_data_folder)
-        for file in source.glob("**/*"):
-            if not file.is_file():
-                continue
+        if self._stream_data_files:
+            for target, file in self._data_file_targets().items():
+                self._add_data_file(wheel, file, target)
+        else:
+            # Data files staged by prepare_metadata()
+            data_source = source.parent / self.wheel_data_folder
+            wheel_data = Path(self.wheel_data_folder)
+            for file in sorted(data_source.glob("**/*")):
+                if not file.is_file():
+                    continue
 
-            rel_path = file.relative_to(source)
-            target = wheel_data / rel_path
-            print(f"Copying file from {file} to wheel relative {target}")
-            self._add_file(wheel, file, target)
+                rel_path = file.relative_to(data_source)
+                self._add_data_file(wheel, file, wheel_data / rel_path)
 
-    def prepare_metadata(self, metadata_directory: Path) -> Path:
+        # The metadata directory may be a temporary directory which is removed as soon as this returns, so the files
+        # in it must be read before then
+        self._write_pending(wheel)
+
+    def _add_lock_requires_dist(self) -> None:
         """
-        The below code before super().prepare_metadata() takes locked dependencies from poetry.lock to add as
-        requirements in the wheel file we will build.
+        Takes locked dependencies from poetry.lock to add as requirements in the wheel file we will build.
 
         This can be removed if poetry supports https://github.com/python-poetry/poetry/issues/2778.
         """
-        dist_info = metadata_directory / self.dist_info
-
         if self._no_lock:
             logger.info("Excluding lock dependencies from wheel as --no-lock was specified")
         else:
@@ -104,12 +331,11 @@ class BlixWheelBuilder(WheelBuilder):
             # https://github.com/python-poetry/poetry/issues/2280, the `category` field is not accurate and will be
             # removed.  Instead, we will read ALL packages from the locked repo, then during resolve_dependencies,
             # filter based on dependency group which should be used going forward 1.2.0+
-            locked_repository = self._locker.locked_repository()
-            # logger.info(f"locked repo {locked_repository.packages}")
-            # for package in locked_repository.packages:
-            #     logger.info(f"Package {package.__dict__}")
-            logger.info("Resolving dependencies using poetry's solver to get rid of unneeded packages")
-            ops = util.resolve_dependencies(self._poetry, self._env, locked_repository, self._with_groups)
+            resolved = self._resolve()
+            self._resolutions = resolved
+            self._manifest = manifest.create_manifest(
+                self._poetry, self._with_groups or [], self._marker_envs(), resolved, self._reproducible
+            )
 
             # logger.info(f"dependency groups: {self._poetry.package._dependency_groups}")
 
@@ -126,7 +352,7 @@ class BlixWheelBuilder(WheelBuilder):
             # so no direct dependencies will be missed when the wheel
             # is built. Only package versions may vary.
 
-            in_extras = {}
+            in_extras: Dict[str, Sequence[str]] = {}
             if self._only_lock:
                 # in_extras is backfilled in factory.py:
                 # https://github.com/python-poetry/poetry-core/blob/8097f67d0760bad5989219483c59339e1eed549c/src/poetry/core/factory.py#L176-L187
@@ -135,55 +361,445 @@ class BlixWheelBuilder(WheelBuilder):
                     in_extras[p.pretty_name] = p.in_extras
                 self._meta.requires_dist = []
 
-            requires_dist = self._meta.requires_dist
-            required_packages_names = [p.pretty_name.lower() for p in self._poetry.package.requires]
-            logger.debug(f"Adding to Wheel Requires Dist: {ops}")
-            for op in ops:
-                dep_pack = op.package
-                name = dep_pack.pretty_name
-                # Exclude python version constraints from the wheel file Required-Dist as default
-                # otherwise, most of the deps will have a verbose python version constraint with it
-                dep_pack.python_versions = "*"
-                dependency = dep_pack.to_dependency()
-                # Backfill in_extras
-                if self._only_lock and name in in_extras:
-                    dependency.in_extras.extend(in_extras[name])
-                dep = dependency.to_pep_508()
-                if self._only_lock or name.lower() not in required_packages_names:
-                    requires_dist.append(dep)
-
-        super().prepare_metadata(metadata_directory)
-
-        # After writing the metadata, also write our custom data files to the wheel data folder
+            requires_dist = [self._lock_requires_dist(ops, in_extras) for ops in resolved]
+            if len(requires_dist) == 1:
+                self._meta.requires_dist.extend(requires_dist[0])
+            else:
+                # Requires-Dist of all targets, with pins only needed by some targets annotated with markers
+                self._meta.requires_dist.extend(targets.merge_requires_dist(requires_dist, self._target_envs or []))
+            if self._reproducible:
+                # Poetry sorts Requires-Dist when writing METADATA too, but the order must not depend on it
+                self._meta.requires_dist.sort()
+
+    def _marker_envs(self) -> List[Dict[str, Any]]:
+        """Marker environments the dependencies are resolved for"""
+        if self._target_envs:
+            return self._target_envs
+        marker_env = self._resolve_options.get("marker_env")
+        return [snapshot_env(self._env, marker_env, self._resolve_options.get("marker_cache")).marker_env]
+
+    def _resolve(self) -> List[Sequence[Operation]]:
+        """Resolved dependencies of the current environment, or of each target environment"""
+        if self._resolved is not None:
+            return [self._resolved]
+
+        locked_repository = load_locked_repository(self._locker)
+        # logger.info(f"locked repo {locked_repository.packages}")
+        # for package in locked_repository.packages:
+        #     logger.info(f"Package {package.__dict__}")
+        if self._target_envs:
+            logger.info(f"Resolving dependencies for {len(self._target_envs)} target environment(s)")
+            return targets.resolve_targets(
+                self._poetry,
+                self._env,
+                locked_repository,
+                self._with_groups,
+                self._target_envs,
+                **self._resolve_options,
+            )
+        logger.info("Resolving dependencies using poetry's solver to get rid of unneeded packages")
+        return [
+            util.resolve_dependencies(
+                self._poetry, self._env, locked_repository, self._with_groups, **self._resolve_options
+            )
+        ]
+
+    def _lock_requires_dist(self, ops: Sequence[Operation], in_extras: Dict[str, Sequence[str]]) -> List[str]:
+        requires_dist = []
+        required_packages_names = [p.pretty_name.lower() for p in self._poetry.package.requires]
+        logger.debug(f"Adding to Wheel Requires Dist: {ops}")
+        for op in ops:
+            dep_pack = op.package
+            name = dep_pack.pretty_name
+            # Exclude python version constraints from the wheel file Required-Dist as default
+            # otherwise, most of the deps will have a verbose python version constraint with it
+            dep_pack.python_versions = "*"
+            dependency = dep_pack.to_dependency()
+            # Backfill in_extras
+            if self._only_lock and name in in_extras:
+                cast(List[str], dependency.in_extras).extend(in_extras[name])
+            dep = dependency.to_pep_508()
+            if self._only_lock or name.lower() not in required_packages_names:
+                requires_dist.append(dep)
+        return requires_dist
+
+    def build_key(self, digests: buildcache.FileDigests, options: Dict[str, Any]) -> str:
+        """Fingerprint of everything the wheel is built from, see util.buildcache"""
+        sources = {file.relative_to_target_root().as_posix(): file.path for file in self.find_files_to_add()}
+        data_files = {target.as_posix(): source for target, source in self._data_file_targets().items()}
+        return buildcache.build_key(
+            self._poetry,
+            self.wheel_filename,
+            sources,
+            data_files,
+            self._metadata_sources(),
+            digests,
+            options,
+            self._marker_envs(),
+        )
+
+    def _metadata_sources(self) -> Dict[str, Path]:
+        """
+        Files of the project which end up in the wheel's metadata, by their path relative to the project: the README,
+        which is the description in METADATA, and the license files copied into .dist-info
+        """
+        files = [*self._poetry.package.readmes, *self._get_legal_files()]
+        return {Path(os.path.relpath(path, self._path)).as_posix(): path for path in files if path.is_file()}
+
+    def requires_dist(self) -> List[str]:
+        """Requires-Dist of the wheel's METADATA, including the locked dependencies, in the order Poetry writes them"""
+        self._add_lock_requires_dist()
+        return sorted(self._meta.requires_dist)
+
+    def metadata_content(self) -> str:
+        """Content of the wheel's METADATA file, including the locked dependencies"""
+        self._add_lock_requires_dist()
+        return self.get_metadata_content()
+
+    def resolved(self) -> Optional[Sequence[Operation]]:
+        """
+        Dependencies of the current environment the metadata was prepared with, to build the wheel again without
+        resolving them.  None if they were not resolved, or resolved for several target environments.
+        """
+        if self._resolutions is None or len(self._resolutions) != 1:
+            return None
+        return self._resolutions[0]
+
+    def member_sources(self) -> Dict[str, Path]:
+        """Maps the wheel's members which are copies of the project's files to them"""
+        members = {file.relative_to_target_root().as_posix(): file.path for file in self.find_files_to_add()}
+        members.update((target.as_posix(), source) for target, source in self._data_file_targets().items())
+        for legal_file in self._get_legal_files():
+            if legal_file.is_file():
+                members[f"{self.dist_info}/{legal_file.relative_to(self._path).as_posix()}"] = legal_file
+        return members
+
+    def manifest_content(self) -> Optional[bytes]:
+        """Content of the wheel's resolution manifest, once the metadata is prepared"""
+        return manifest.dump_manifest(self._manifest) if self._manifest is not None else None
+
+    def prepare_metadata(self, metadata_directory: Path) -> Path:
+        """
+        Adds locked dependencies from poetry.lock as requirements before writing the metadata, then writes our custom
+        data files to the wheel data folder.
+        """
+        self._add_lock_requires_dist()
+        dist_info = super().prepare_metadata(metadata_directory)
+        if self._manifest is not None:
+            (dist_info / manifest.MANIFEST_NAME).write_bytes(manifest.dump_manifest(self._manifest))
+
+        # After writing the metadata, also stage our custom data files in the wheel data folder for a PEP 517
+        # front-end.  When building the wheel ourselves, they are added straight from their sources instead.
         if self._data_files:
-            logger.info("Adding data_files to WHEEL data folder")
-            for data_file in self._data_files:
-                destination = data_file["destination"]
-                sources = data_file["from"]
-
-                if Path(destination).is_absolute():
-                    raise ValueError(
-                        f"Destination path in data_files [{destination}] is absolute.  "
-                        f"Please change it to a relative path"
-                    )
-
-                # TODO: Use OS specific separator
-                if destination[-1] != "/":
-                    destination += "/"
-
-                # Note: this assumes destination is suffixed with the directory separator "/"
-                for src in sources:
-                    abs_path = self._get_abs_path(src)
-                    dest = Path.joinpath(
-                        metadata_directory, Path(self.wheel_data_folder), "data", destination + abs_path.name
-                    )
-                    print(f"Copying data files from {abs_path} to {dest}")
+            targets = self._data_file_targets()
+            if not self._stream_data_files:
+                logger.info("Adding data_files to WHEEL data folder")
+                for target, abs_path in targets.items():
+                    dest = metadata_directory / target
+                    self._line(f"Copying data files from {abs_path} to {dest}")
                     os.makedirs(dest.parent, exist_ok=True)
                     shutil.copy(abs_path, dest)
 
         return dist_info
 
 
+class BlixBuild:
+    """
+    Builds the wheels of a project like `poetry blixbuild`, for the command and for poeblix.api.  Options are read with
+    `option`, named like the command's options, and progress is written with `line`.
+    """
+
+    def __init__(
+        self,
+        poetry: "Poetry",
+        env: Env,
+        option: Callable[[str], Any],
+        line: Callable[..., None],
+        line_error: Callable[..., None],
+    ) -> None:
+        self.poetry = poetry
+        self.env = env
+        self.option = option
+        self.line = line
+        self.line_error = line_error
+        # What the wheel was built with by run(), to watch the files it is built from
+        self._with_groups: List[str] = []
+        self._resolve_options: Dict[str, Any] = {}
+        self._build_cache: Optional[BlixCache] = None
+        self._built = False
+        self._output_dir = Path()
+        self._resolved: Optional[Sequence[Operation]] = None
+
+    def run(self) -> BuildResult:
+        """Builds the wheels, or copies them from the build cache if they are up to date"""
+        start = time.perf_counter()
+        util.validate_options_mutually_exclusive(self.option, "no-lock", "only-lock")
+        util.validate_options_mutually_exclusive(self.option, "no-lock", "group-set")
+        util.validate_options_mutually_exclusive(self.option, "with-groups", "group-set")
+        util.validate_options_mutually_exclusive(self.option, "target-env", "marker-env")
+        util.validate_options_mutually_exclusive(self.option, "target-env", "group-set")
+        util.validate_options_mutually_exclusive(self.option, "watch", "group-set")
+        util.validate_options_mutually_exclusive(self.option, "watch", "target-env")
+        with_groups = []
+        for group in self.option("with-groups"):
+            with_groups.extend(group.split(","))
+
+        package = self.poetry.package
+        self.line(f"Building <c1>{package.pretty_name}</c1> (<c2>{package.version}</c2>)")
+
+        # Parse data_files
+        data_files_config = self._data_files_config()
+        if data_files_config is None:
+            self.line(f"[tool.blix.data] section not found in {self.poetry.file}, no data_files to process")
+        elif "data_files" in data_files_config:
+            """
+            List out the data_files when printing as __str__ for tomlkit seems to have a breaking change where
+            it tries to call v.value.value for each item in the Toml Array, but the item may be a string such as
+            the "\r\n" character which will run into an error as there is no value() method on strings.
+            """
+            self.line(f"Adding data_files={[v for v in data_files_config['data_files']]}")
+
+        resolve_options = util.get_resolve_options(self.poetry, self.option)
+        build_cache = None
+        if not self.option("no-build-cache"):
+            build_cache = buildcache.build_cache(self.poetry, self.option("cache-dir"))
+        builder_options = self._builder_options(build_cache)
+
+        # Create our custom wheel builder
+        builder = BlixWheelBuilder(
+            self.poetry,
+            env=self.env,
+            locker=self.poetry.locker,
+            executable=self.env.python,
+            no_lock=self.option("no-lock"),
+            only_lock=self.option("only-lock"),
+            with_groups=with_groups,
+            resolve_options=resolve_options,
+            target_envs=[marker_env for _, marker_env in targets.load_targets(self.option("target-env"))],
+            **builder_options,
+        )
+
+        output_dir = builder.default_target_dir
+        variant = self.option("variant")
+        if variant is not None:
+            if variant in ("", ".", "..") or "/" in variant or os.sep in variant:
+                raise ValueError(f"--variant must be a directory name, got [{variant}]")
+            output_dir = output_dir / variant
+
+        # Skip the build if the build cache has a wheel built from the same inputs
+        build_key = ""
+        if build_cache is not None:
+            digests = buildcache.FileDigests(build_cache, self.poetry.file.path.parent)  # type: ignore
+            options = {name: self.option(name) for name in buildcache.BUILD_OPTIONS}
+            if self.option("reproducible"):
+                options["source-date-epoch"] = os.environ.get("SOURCE_DATE_EPOCH")
+            build_key = builder.build_key(digests, options)
+            digests.save()
+
+        if self.option("group-set"):
+            group_sets = [[group for group in group_set.split(",") if group] for group_set in self.option("group-set")]
+            wheels = [
+                (
+                    fingerprint(build_key, util.group_set_name(with_groups)),
+                    output_dir / util.group_set_name(with_groups) / builder.wheel_filename,
+                )
+                for with_groups in group_sets
+            ]
+            cached = self._restore_cached(wheels, build_cache)
+            if not cached:
+                self._build_group_sets(group_sets, resolve_options, builder_options, output_dir)
+                if build_cache is not None:
+                    for variant_key, wheel_path in wheels:
+                        build_cache.put_file(variant_key, wheel_path, ".whl")
+        else:
+            wheels = [(build_key, output_dir / builder.wheel_filename)]
+            cached = self._restore_cached(wheels, build_cache)
+            if not cached:
+                wheel_path = builder.build(output_dir)
+                if build_cache is not None:
+                    build_cache.put_file(build_key, wheel_path, ".whl")
+        util.report_cache(self.line, resolve_options)
+
+        # Kept to watch the files the wheel is built from
+        self._with_groups = with_groups
+        self._resolve_options = resolve_options
+        self._build_cache = build_cache
+        self._built = True
+        self._output_dir = output_dir
+        self._resolved = builder.resolved()
+        return BuildResult([wheel_path for _, wheel_path in wheels], cached, time.perf_counter() - start)
+
+    def _data_files_config(self) -> Optional[Dict[str, Any]]:
+        """The [tool.blix.data] section of pyproject.toml, or None if there is none"""
+        from tomlkit.exceptions import NonExistentKey
+
+        try:
+            """
+            Cast to dict to avoid these errors after upgrading poetry to 1.2.0b2.  It should be a dict anyways:
+
+            src/poeblix/plugins.py:169:16: error: Unsupported right operand type for in ("Union[Any, Item, Container]")
+            src/poeblix/plugins.py:170:30: error: Value of type "Union[Any, Item, Container]" is not indexable
+            src/poeblix/plugins.py:181:24: error: Argument "data_files" to "BlixWheelBuilder" has incompatible type
+                "Union[Any, Item, Container, None]"; expected "Optional[List[Dict[Any, Any]]]"
+            """
+            return cast(dict, self.poetry.pyproject.data["tool"]["blix"]["data"])  # type: ignore
+        except NonExistentKey:
+            return None
+
+    def _builder_options(self, build_cache: Optional[BlixCache]) -> Dict[str, Any]:
+        """Options shared by the wheel builders of all variants"""
+        data_files_config = self._data_files_config() or {}
+        return {
+            "build_cache": build_cache,
+            "data_files": data_files_config.get("data_files"),
+            "compression": data_files_config.get("compression"),
+            "workers": util.parse_workers(self.option("workers")),
+            "reproducible": self.option("reproducible"),
+            "line": self.line,
+        }
+
+    def watch(self) -> int:
+        """
+        After run(), updates the wheel whenever the files it is built from change, see util.watch.  Dependencies
+        resolved by a previous build are kept until pyproject.toml or poetry.lock change, and the project is loaded
+        again when either of them changes.
+        """
+        from poetry.factory import Factory
+
+        assert self._built, "The wheel must be built by run() first"
+        with_groups = self._with_groups
+        resolve_options = self._resolve_options
+        build_cache = self._build_cache
+        output_dir = self._output_dir
+        resolved = self._resolved
+
+        def create_builder(resolved: Optional[Sequence[Operation]] = None) -> BlixWheelBuilder:
+            return BlixWheelBuilder(
+                self.poetry,
+                env=self.env,
+                locker=self.poetry.locker,
+                executable=self.env.python,
+                no_lock=self.option("no-lock"),
+                only_lock=self.option("only-lock"),
+                with_groups=with_groups,
+                resolve_options=resolve_options,
+                resolved=resolved,
+                **self._builder_options(build_cache),
+            )
+
+        def take_snapshot() -> watch.Snapshot:
+            builder = create_builder()
+            project_file = self.poetry.file.path  # type: ignore
+            return watch.Snapshot(project_file, project_file.parent / "poetry.lock", builder.member_sources())
+
+        def on_error(e: Exception) -> None:
+            self.line_error(f"<error>Cannot read the project, waiting for it to change</error>: {e}")
+
+        snapshot = take_snapshot()
+        self.line(f"Watching {len(snapshot.members)} file(s) for changes, press Ctrl+C to stop")
+        try:
+            while True:
+                changed = watch.wait_for_changes(take_snapshot, snapshot, on_error)
+                changes = Changes(snapshot, changed)
+                snapshot = changed
+                start = time.perf_counter()
+                if changes.project or changes.lock:
+                    self.poetry = Factory().create_poetry(self.poetry.file.path.parent)  # type: ignore
+                    resolved = None
+                builder = create_builder(resolved)
+                try:
+                    if changes.project or changes.rebuild or not (output_dir / builder.wheel_filename).exists():
+                        wheel_path = builder.build(output_dir)
+                    else:
+                        wheel_path = self._update_wheel(builder, output_dir, changes)
+                except Exception as e:
+                    self.line_error(f"<error>Failed to update the wheel after changes to {changes.describe()}</error>")
+                    self.line_error(f"{type(e).__name__}: {e}")
+                    continue
+                resolved = builder.resolved() or resolved
+                self.line(
+                    f"Updated wheel in {time.perf_counter() - start:.2f}s after changes to {changes.describe()}: "
+                    f"{wheel_path}"
+                )
+        except KeyboardInterrupt:
+            return 0
+
+    def _update_wheel(self, builder: BlixWheelBuilder, output_dir: Path, changes: Changes) -> Path:
+        """Replaces the members of the wheel which changed, without building it again"""
+        wheel_path = output_dir / builder.wheel_filename
+        # Changed files are streamed into the new wheel, same as when building it
+        replacements: Dict[str, Optional[Replacement]] = dict(changes.modified)
+        if changes.lock and not self.option("no-lock"):
+            replacements[f"{builder.dist_info}/METADATA"] = builder.metadata_content().encode("utf-8")
+            replacements[f"{builder.dist_info}/{manifest.MANIFEST_NAME}"] = builder.manifest_content()
+        with atomic_path(wheel_path) as temp_path:
+            rewrite_wheel(wheel_path, temp_path, replacements)
+            shutil.copymode(wheel_path, temp_path)
+        return wheel_path
+
+    def _restore_cached(self, wheels: List[Tuple[str, Path]], build_cache: Optional[BlixCache]) -> bool:
+        """
+        Copies wheels from the build cache to their paths in dist/, given their build keys.  Returns False if the build
+        cache is disabled, --force or --full-solve is set or any of them is not cached, in which case they need to be
+        built.  --full-solve checks resolutions against Poetry's solver, which a cached wheel would skip.
+        """
+        if build_cache is None or self.option("force") or self.option("full-solve"):
+            return False
+        cached = [build_cache.get_file(build_key, ".whl") for build_key, _ in wheels]
+        if any(path is None for path in cached):
+            return False
+        for path, (_, wheel_path) in zip(cached, wheels):
+            try:
+                atomic_copy(cast(Path, path), wheel_path)
+            except FileNotFoundError:
+                # Evicted by another process sharing the cache since it was looked up
+                return False
+            self.line(f"Wheel is up to date, reused cached build: {wheel_path}")
+        return True
+
+    def _build_group_sets(
+        self,
+        group_sets: List[List[str]],
+        resolve_options: Dict[str, Any],
+        builder_options: Dict[str, Any],
+        output_dir: Path,
+    ) -> None:
+        """
+        Builds one wheel per set of dependency groups.  Only the first wheel is built from the project sources, the
+        others are copies of it with their own METADATA.
+        """
+        locked_repository = load_locked_repository(self.poetry.locker)
+        resolved = util.resolve_group_sets(self.poetry, self.env, locked_repository, group_sets, **resolve_options)
+
+        first_wheel: Optional[Path] = None
+        for with_groups, ops in zip(group_sets, resolved):
+            builder = BlixWheelBuilder(
+                self.poetry,
+                env=self.env,
+                locker=self.poetry.locker,
+                executable=self.env.python,
+                only_lock=self.option("only-lock"),
+                with_groups=with_groups,
+                resolve_options=resolve_options,
+                resolved=ops,
+                **builder_options,
+            )
+            target_dir = output_dir / util.group_set_name(with_groups)
+            target_dir.mkdir(parents=True, exist_ok=True)
+            wheel_path = target_dir / builder.wheel_filename
+            if first_wheel is None:
+                first_wheel = builder.build(target_dir)
+            else:
+                replacements = {f"{builder.dist_info}/METADATA": builder.metadata_content().encode("utf-8")}
+                manifest_content = builder.manifest_content()
+                if manifest_content is not None:
+                    replacements[f"{builder.dist_info}/{manifest.MANIFEST_NAME}"] = manifest_content
+                with atomic_path(wheel_path) as temp_path:
+                    rewrite_wheel(first_wheel, temp_path, replacements)
+                    shutil.copymode(first_wheel, temp_path)
+            self.line(f"Built <c1>{util.group_set_name(with_groups)}</c1> wheel: {wheel_path}")
+
+
 class BlixBuildCommand(EnvCommand):
     """
     Our custom build command to use with the poetry CLI via `poetry blix`.
@@ -213,58 +829,62 @@ class BlixBuildCommand(EnvCommand):
             flag=False,
             multiple=True,
         ),
+        option(
+            "group-set",
+            None,
+            "Builds one wheel per set of dependency groups into dist/<groups>/, e.g. `--group-set=main "
+            "--group-set=integ,dev` builds dist/main/ and dist/main+dev+integ/.  Each set is a comma delimited list of "
+            "groups on top of required groups from pyproject.toml.  Dependencies of all sets are resolved at once.",
+            flag=False,
+            multiple=True,
+        ),
+        targets.target_env_option(),
+        option(
+            "force",
+            None,
+            "Builds the wheel even if a wheel built from the same inputs is in the build cache.",
+        ),
+        option(
+            "no-build-cache",
+            None,
+            "Disables the build cache: always builds the wheel, and neither stores it nor an index of the package "
+            "sources in the cache, e.g. for wheels too large to be worth copying into it.",
+        ),
+        option(
+            "reproducible",
+            None,
+            "Builds the same wheel byte for byte from the same inputs, on any machine.  Members are timestamped with "
+            "SOURCE_DATE_EPOCH if it is set, and data_files are added sorted by path.",
+        ),
+        option(
+            "variant",
+            None,
+            "Writes the wheel to dist/<variant>/ instead of dist/, so that concurrent builds of the same project with "
+            "different options do not replace each other's wheels.",
+            flag=False,
+        ),
+        option(
+            "watch",
+            None,
+            "Keeps running after building the wheel, and updates it whenever the package sources, data_files, "
+            "pyproject.toml or poetry.lock change, until interrupted.  Only the members of the wheel affected by a "
+            "change are replaced, and dependencies are only resolved again when pyproject.toml or poetry.lock change.",
+        ),
+        util.workers_option(
+            "Number of threads hashing and compressing files into the wheel in parallel.  The wheel is the same as "
+            "when built by a single thread."
+        ),
+        *util.resolve_options(),
     ]
 
     # Pick up Poetry's WheelBuilder logger
-    loggers = ["poetry.core.masonry.builders.wheel"]
+    loggers = ["poetry.core.masonry.builders.wheel", "poeblix"]
 
     def handle(self) -> int:
-        util.validate_options_mutually_exclusive(self.option, "no-lock", "only-lock")
-        with_groups = []
-        for group in self.option("with-groups"):
-            with_groups.extend(group.split(","))
-
-        package = self.poetry.package
-        self.line(f"Building <c1>{package.pretty_name}</c1> (<c2>{package.version}</c2>)")
-
-        # Parse data_files
-        from tomlkit.exceptions import NonExistentKey
-
-        data_files = None
-        try:
-            """
-            Cast to dict to avoid these errors after upgrading poetry to 1.2.0b2.  It should be a dict anyways:
-
-            src/poeblix/plugins.py:169:16: error: Unsupported right operand type for in ("Union[Any, Item, Container]")
-            src/poeblix/plugins.py:170:30: error: Value of type "Union[Any, Item, Container]" is not indexable
-            src/poeblix/plugins.py:181:24: error: Argument "data_files" to "BlixWheelBuilder" has incompatible type
-                "Union[Any, Item, Container, None]"; expected "Optional[List[Dict[Any, Any]]]"
-            """
-            data_files_config = cast(dict, self.poetry.pyproject.data["tool"]["blix"]["data"])  # type: ignore
-            if "data_files" in data_files_config:
-                data_files = data_files_config["data_files"]
-                """
-                List out the data_files when printing as __str__ for tomlkit seems to have a breaking change where
-                it tries to call v.value.value for each item in the Toml Array, but the item may be a string such as
-                the "\r\n" character which will run into an error as there is no value() method on strings.
-                """
-                self.line(f"Adding data_files={[v for v in data_files]}")
-        except NonExistentKey:
-            self.line(f"[tool.blix.data] section not found in {self.poetry.file}, no data_files to process")
-
-        # Create our custom wheel builder
-        builder = BlixWheelBuilder(
-            self.poetry,
-            env=self.env,
-            locker=self.poetry.locker,
-            executable=self.env.python,
-            data_files=data_files,
-            no_lock=self.option("no-lock"),
-            only_lock=self.option("only-lock"),
-            with_groups=with_groups,
-        )
-        builder.build()
-
+        build = BlixBuild(self.poetry, self.env, self.option, self.line, self.line_error)
+        build.run()
+        if self.option("watch"):
+            return build.watch()
         return 0
 
 
@@ -282,3 +902,23 @@ class BlixPlugin(ApplicationPlugin):
         from .validatedocker import ValidateDockerPlugin
 
         application.command_loader.register_factory(ValidateDockerPlugin.name, lambda: ValidateDockerPlugin())
+
+        # Re-pin plugin
+        from .repin import RepinPlugin
+
+        application.command_loader.register_factory(RepinPlugin.name, lambda: RepinPlugin())
+
+        # Workspace plugin
+        from .workspace import WorkspacePlugin
+
+        application.command_loader.register_factory(WorkspacePlugin.name, lambda: WorkspacePlugin())
+
+        # Daemon plugin
+        from .daemon import DaemonPlugin
+
+        application.command_loader.register_factory(DaemonPlugin.name, lambda: DaemonPlugin())
+
+        # Environment marker snapshot plugin
+        from .markerenv import MarkerEnvPlugin
+
+        application.command_loader.register_factory(MarkerEnvPlugin.name, lambda: MarkerEnvPlugin())
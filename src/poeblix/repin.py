@@ -0,0 +1,113 @@
+import shutil
+import time
+from pathlib import Path
+from typing import List, ClassVar
+
+from cleo.helpers import argument, option
+from cleo.io.inputs.option import Option
+
+# For fixing https://github.com/python-poetry/poetry/issues/5216
+from packaging.tags import sys_tags  # noqa
+from poetry.console.commands.env_command import EnvCommand
+
+from poeblix.plugins import BlixWheelBuilder
+from poeblix.util import manifest, targets, util
+from poeblix.util.cache import atomic_path
+from poeblix.util.wheel import WheelReader, replace_requires_dist, rewrite_wheel
+
+
+class RepinPlugin(EnvCommand):
+    """
+    Updates the locked Requires-Dist of a wheel which was already built, e.g. after poetry.lock was updated, without
+    building the wheel again.  Only METADATA, the resolution manifest and RECORD are rewritten, all other members are
+    copied as they are compressed in the wheel.
+    """
+
+    name = "blixrepin"
+    description = (
+        "Updates the Requires-Dist of an existing wheel of the project, built by `poetry blixbuild` or `poetry build`, "
+        "to the dependencies in pyproject.toml and poetry.lock, without rebuilding or recompressing the wheel."
+    )
+
+    arguments = [argument("wheelPath", "Wheel file path")]
+
+    options: ClassVar[List[Option]] = [
+        option(
+            "no-lock",
+            None,
+            "Disables pinning lock file dependencies, leaving only the dependencies in pyproject.toml.",
+        ),
+        option(
+            "only-lock",
+            None,
+            "Uses lock dependencies only which are pinned to exact versions, instead of pyproject.toml",
+        ),
+        option(
+            "with-groups",
+            None,
+            "Specify which dependency groups to pin in the wheel file, on top of required groups from "
+            "pyproject.toml.  Can be specified multiple times or as a comma delimited list.",
+            flag=False,
+            multiple=True,
+        ),
+        targets.target_env_option(),
+        option(
+            "output",
+            "o",
+            "Writes the re-pinned wheel to this path instead of replacing the wheel.",
+            flag=False,
+        ),
+        *util.resolve_options(),
+    ]
+
+    loggers = ["poetry.core.masonry.builders.wheel", "poeblix"]
+
+    def handle(self) -> int:
+        util.validate_options_mutually_exclusive(self.option, "no-lock", "only-lock")
+        util.validate_options_mutually_exclusive(self.option, "target-env", "marker-env")
+        with_groups = []
+        for group in self.option("with-groups"):
+            with_groups.extend(group.split(","))
+
+        start = time.perf_counter()
+        path = Path(self.argument("wheelPath"))
+        resolve_options = util.get_resolve_options(self.poetry, self.option)
+        builder = BlixWheelBuilder(
+            self.poetry,
+            env=self.env,
+            locker=self.poetry.locker,
+            executable=self.env.python,
+            no_lock=self.option("no-lock"),
+            only_lock=self.option("only-lock"),
+            with_groups=with_groups,
+            resolve_options=resolve_options,
+            target_envs=[marker_env for _, marker_env in targets.load_targets(self.option("target-env"))],
+        )
+
+        metadata_name = f"{builder.dist_info}/METADATA"
+        with WheelReader(path) as wheel:
+            if wheel.dist_info != builder.dist_info:
+                raise RuntimeError(f"Wheel at [{path}] is not a wheel of this project, expected [{builder.dist_info}]")
+            metadata = wheel.read(metadata_name).decode("utf-8")
+            old_requires_dist = wheel.requires_dist
+
+        requires_dist = builder.requires_dist()
+        for requirement in sorted(set(old_requires_dist) - set(requires_dist)):
+            self.line(f"  - {requirement}")
+        for requirement in sorted(set(requires_dist) - set(old_requires_dist)):
+            self.line(f"  + {requirement}")
+
+        # A wheel re-pinned without the lock file must not keep a manifest of pins it no longer has
+        replacements = {
+            metadata_name: replace_requires_dist(metadata, requires_dist).encode("utf-8"),
+            f"{builder.dist_info}/{manifest.MANIFEST_NAME}": builder.manifest_content(),
+        }
+
+        output = Path(self.option("output") or path)
+        with atomic_path(output) as temp_path:
+            rewrite_wheel(path, temp_path, replacements)
+            shutil.copymode(path, temp_path)
+
+        util.report_cache(self.line, resolve_options)
+        self.line(f"Re-pinned wheel in {time.perf_counter() - start:.2f}s: {output}")
+        return 0
@@ -0,0 +1,105 @@
+import os
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+from poetry.core.poetry import Poetry as CorePoetry
+
+from poeblix.util import util
+from poeblix.util.cache import (
+    BUILD_CACHE_MAX_SIZE_ENV,
+    DEFAULT_BUILD_CACHE_MAX_SIZE,
+    BlixCache,
+    default_cache_dir,
+    file_digest,
+    fingerprint,
+)
+
+"""
+Build cache which lets `poetry blixbuild` skip building a wheel when none of its inputs changed since a previous build:
+the package sources, pyproject.toml, poetry.lock, data_files, the README and license files, the options and environment
+markers dependencies are resolved for, and the versions of poeblix and Poetry.  Wheels are cached by a fingerprint of
+these inputs, and evicted least recently used first.
+
+File contents are fingerprinted by digest.  Digests are remembered per project along with the size, modification time
+and inode of each file, so only files which changed since the previous build are read again.
+"""
+
+# Options of `blixbuild` which change the wheel it builds
+BUILD_OPTIONS = ("no-lock", "only-lock", "with-groups", "group-set", "fast-resolve", "locked-only", "reproducible")
+
+
+def build_cache(poetry: "CorePoetry", cache_dir: Optional[str] = None) -> BlixCache:
+    max_size = int(os.environ.get(BUILD_CACHE_MAX_SIZE_ENV, DEFAULT_BUILD_CACHE_MAX_SIZE))
+    return BlixCache(default_cache_dir(poetry, cache_dir), "builds", max_size=max_size)
+
+
+class FileDigests:
+    """Digests of a project's files, reused for files whose size, modification time and inode are unchanged"""
+
+    def __init__(self, cache: BlixCache, project_dir: Path) -> None:
+        self._cache = cache
+        self._key = fingerprint("digests", str(project_dir.resolve()))
+        self._digests: Dict[str, List[Any]] = cache.get_json(self._key) or {}
+        self._changed = False
+
+    def digest(self, path: Path) -> str:
+        st = os.stat(path)
+        stamp = [st.st_size, st.st_mtime_ns, st.st_ino]
+        name = str(path)
+        known = self._digests.get(name)
+        if known is not None and known[:3] == stamp:
+            return known[3]
+        digest = file_digest(path)
+        self._digests[name] = stamp + [digest]
+        self._changed = True
+        return digest
+
+    def save(self) -> None:
+        if self._changed:
+            self._cache.put_json(self._key, self._digests)
+            self._changed = False
+
+
+def _versions() -> Dict[str, str]:
+    from importlib.metadata import PackageNotFoundError, version
+
+    from poetry.__version__ import __version__
+
+    versions = {"poetry": __version__}
+    for package in ("poeblix", "poetry-core"):
+        try:
+            versions[package] = version(package)
+        except PackageNotFoundError:
+            versions[package] = "unknown"
+    return versions
+
+
+def build_key(
+    poetry: "CorePoetry",
+    wheel_filename: str,
+    sources: Dict[str, Path],
+    data_files: Dict[str, Path],
+    metadata_sources: Dict[str, Path],
+    digests: FileDigests,
+    options: Dict[str, Any],
+    marker_envs: Iterable[Dict[str, Any]],
+) -> str:
+    """
+    Fingerprint of everything a wheel is built from.  `sources` and `data_files` map the wheel relative paths of the
+    files to add to their source paths, `metadata_sources` the project relative paths of the README and license files
+    written into the metadata to their paths, `options` are the values of BUILD_OPTIONS, and `marker_envs` the
+    environments dependencies are resolved for.
+    """
+    build_script = poetry.package.build_script
+    return fingerprint(
+        _versions(),
+        wheel_filename,
+        digests.digest(poetry.file.path),  # type: ignore
+        util.lock_digest(poetry),
+        sorted((name, digests.digest(path)) for name, path in sources.items()),
+        [(name, digests.digest(path)) for name, path in data_files.items()],
+        sorted((name, digests.digest(path)) for name, path in metadata_sources.items()),
+        digests.digest(poetry.file.path.parent / build_script) if build_script else None,  # type: ignore
+        options,
+        list(marker_envs),
+    )
@@ -0,0 +1,300 @@
+import contextlib
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Iterator, List, Optional, Set, Tuple
+
+"""
+On-disk cache used by the blix commands to persist expensive results (such as resolved dependencies) across
+invocations.  The cache directory can be shared by several processes or CI runners: entries are written atomically
+via rename, and writers/evictors coordinate through advisory file locks.
+"""
+
+logger = logging.getLogger(__name__)
+
+# Environment variables to configure the cache, useful for CI runners that share a cache directory
+CACHE_DIR_ENV = "POEBLIX_CACHE_DIR"
+CACHE_MAX_SIZE_ENV = "POEBLIX_CACHE_MAX_SIZE"
+CACHE_MAX_AGE_ENV = "POEBLIX_CACHE_MAX_AGE"
+BUILD_CACHE_MAX_SIZE_ENV = "POEBLIX_BUILD_CACHE_MAX_SIZE"
+
+# 512 MiB and 30 days
+DEFAULT_MAX_SIZE = 512 * 1024 * 1024
+DEFAULT_MAX_AGE = 30 * 24 * 60 * 60
+
+# Built wheels are larger than other entries, 2 GiB
+DEFAULT_BUILD_CACHE_MAX_SIZE = 2 * 1024 * 1024 * 1024
+
+_LOCK_FILE = ".lock"
+_KEY_LOCKS_DIR = "locks"
+
+
+@contextlib.contextmanager
+def file_lock(path: Path) -> Iterator[None]:
+    """Holds an exclusive advisory lock on the file at `path` for the duration of the context"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "a+b") as f:
+        if os.name == "nt":
+            import msvcrt
+
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)  # type: ignore
+            try:
+                yield
+            finally:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)  # type: ignore
+        else:
+            import fcntl
+
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+def atomic_write(path: Path, data: bytes) -> None:
+    """
+    Writes data to a temporary file next to `path` and renames it into place, so concurrent readers either see the
+    previous content or the complete new content, never a partially written file.
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, path)
+    except BaseException:
+        with contextlib.suppress(FileNotFoundError):
+            os.unlink(temp_path)
+        raise
+
+
+def atomic_copy(source: Path, path: Path) -> None:
+    """Copies a file next to `path` and renames it into place, like atomic_write()"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f, open(source, "rb") as src:
+            shutil.copyfileobj(src, f, 1024 * 1024)
+            f.flush()
+            os.fsync(f.fileno())
+        shutil.copymode(source, temp_path)
+        os.replace(temp_path, path)
+    except BaseException:
+        with contextlib.suppress(FileNotFoundError):
+            os.unlink(temp_path)
+        raise
+
+
+@contextlib.contextmanager
+def atomic_path(path: Path) -> Iterator[Path]:
+    """
+    Yields a temporary path next to `path` to write a file to, which is renamed into place once the block completes
+    successfully, like atomic_write().  The file is removed if the block raises.
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    os.close(fd)
+    try:
+        yield Path(temp_path)
+        os.replace(temp_path, path)
+    except BaseException:
+        with contextlib.suppress(FileNotFoundError):
+            os.unlink(temp_path)
+        raise
+
+
+def fingerprint(*parts: Any) -> str:
+    """Stable sha256 hex digest over JSON serializable parts"""
+    return hashlib.sha256(json.dumps(parts, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+def file_digest(path: Path) -> str:
+    """sha256 hex digest of a file's content"""
+    hashsum = hashlib.sha256()
+    with open(path, "rb") as f:
+        while True:
+            buf = f.read(1024 * 1024)
+            if not buf:
+                break
+            hashsum.update(buf)
+    return hashsum.hexdigest()
+
+
+def default_cache_dir(poetry: Any, cache_dir: Optional[str] = None) -> Path:
+    """
+    Returns the root cache directory, in order of precedence: the given `cache_dir`, the POEBLIX_CACHE_DIR environment
+    variable, or a `blix` folder under Poetry's own cache directory.
+    """
+    if cache_dir:
+        return Path(cache_dir).expanduser()
+    if os.environ.get(CACHE_DIR_ENV):
+        return Path(os.environ[CACHE_DIR_ENV]).expanduser()
+    config = getattr(poetry, "config", None)
+    if config is not None and config.get("cache-dir"):
+        return Path(config.get("cache-dir")) / "blix"
+    return Path(tempfile.gettempdir()) / "poeblix"
+
+
+def _entry_key(path: Path) -> str:
+    """Key of an entry, given its path"""
+    return path.name.partition(".")[0]
+
+
+class BlixCache:
+    """
+    A namespaced directory of cache entries keyed by hex digests.
+
+    Reads are lock-free as entries are only ever replaced atomically.  Reading an entry refreshes its modification
+    time, which eviction uses to drop the least recently used entries once the namespace grows past `max_size` bytes,
+    and entries not used in `max_age` seconds.
+    """
+
+    def __init__(
+        self,
+        root: Path,
+        namespace: str,
+        max_size: Optional[int] = None,
+        max_age: Optional[float] = None,
+    ) -> None:
+        self._dir = root / namespace
+        self._max_size = max_size if max_size is not None else int(os.environ.get(CACHE_MAX_SIZE_ENV, DEFAULT_MAX_SIZE))
+        self._max_age = max_age if max_age is not None else float(os.environ.get(CACHE_MAX_AGE_ENV, DEFAULT_MAX_AGE))
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def directory(self) -> Path:
+        return self._dir
+
+    def path_for(self, key: str, suffix: str = ".json") -> Path:
+        return self._dir / f"{key}{suffix}"
+
+    @contextlib.contextmanager
+    def lock(self, key: str) -> Iterator[None]:
+        """
+        Serializes work on a single key across processes, so concurrent runners computing the same entry wait for the
+        first one instead of all doing the work.  The lock file is removed along with the key's entry on eviction.
+        """
+        path = self._dir / _KEY_LOCKS_DIR / key
+        with file_lock(path):
+            # Refresh the lock's modification time, so eviction can tell stale locks of keys that never got an entry
+            with contextlib.suppress(OSError):
+                os.utime(path)
+            yield
+
+    def get_json(self, key: str) -> Optional[Any]:
+        path = self.path_for(key)
+        try:
+            value = json.loads(path.read_bytes())
+        except FileNotFoundError:
+            self.misses += 1
+            logger.info(f"Cache miss in {self._dir.name} for {key}")
+            return None
+        except ValueError:
+            # Should not happen with atomic writes, but treat a corrupted entry as a miss
+            self.misses += 1
+            logger.info(f"Discarding corrupted cache entry {path}")
+            return None
+
+        with contextlib.suppress(OSError):
+            os.utime(path)
+        self.hits += 1
+        logger.info(f"Cache hit in {self._dir.name} for {key}")
+        return value
+
+    def put_json(self, key: str, value: Any) -> None:
+        atomic_write(self.path_for(key), json.dumps(value).encode("utf-8"))
+        self.evict()
+
+    def get_file(self, key: str, suffix: str) -> Optional[Path]:
+        """Path of a file entry, or None if there is none"""
+        path = self.path_for(key, suffix)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            self.misses += 1
+            logger.info(f"Cache miss in {self._dir.name} for {key}")
+            return None
+        self.hits += 1
+        logger.info(f"Cache hit in {self._dir.name} for {key}")
+        return path
+
+    def put_file(self, key: str, source: Path, suffix: str) -> None:
+        """Stores a copy of a file as an entry, unless it is larger than max_size and would be evicted right away"""
+        size = source.stat().st_size
+        if size > self._max_size:
+            logger.info(
+                f"Not caching {source} in {self._dir.name}, as its {size} bytes exceed the cache's maximum size"
+            )
+            return
+        atomic_copy(source, self.path_for(key, suffix))
+        self.evict()
+
+    def delete(self, key: str) -> None:
+        with contextlib.suppress(FileNotFoundError):
+            self.path_for(key).unlink()
+
+    def _entries(self) -> List[Tuple[float, int, Path]]:
+        entries = []
+        with os.scandir(self._dir) as it:
+            for entry in it:
+                if entry.name.startswith(".") or not entry.is_file(follow_symlinks=False):
+                    continue
+                st = entry.stat(follow_symlinks=False)
+                entries.append((st.st_mtime, st.st_size, Path(entry.path)))
+        return entries
+
+    def evict(self) -> None:
+        """
+        Removes entries older than max_age, then least recently used entries until under max_size, along with the lock
+        files of their keys
+        """
+        if not self._dir.exists():
+            return
+        with file_lock(self._dir / _LOCK_FILE):
+            now = time.time()
+            entries = sorted(self._entries())
+            total = sum(size for _, size, _ in entries)
+            evicted = 0
+            for mtime, size, path in entries:
+                if now - mtime <= self._max_age and total <= self._max_size:
+                    break
+                with contextlib.suppress(FileNotFoundError):
+                    path.unlink()
+                total -= size
+                evicted += 1
+                logger.debug(f"Evicted cache entry {path}")
+            self._evict_key_locks(
+                {_entry_key(path) for _, _, path in entries[:evicted]},
+                {_entry_key(path) for _, _, path in entries[evicted:]},
+                now,
+            )
+
+    def _evict_key_locks(self, evicted: Set[str], kept: Set[str], now: float) -> None:
+        """
+        Removes the lock files of evicted keys, and those of keys without an entry that were not used within max_age,
+        such as keys whose computation failed.  A runner still waiting on a removed lock file only risks computing the
+        same entry twice, which atomic writes make harmless.
+        """
+        try:
+            it = os.scandir(self._dir / _KEY_LOCKS_DIR)
+        except FileNotFoundError:
+            return
+        with it:
+            for entry in it:
+                if entry.name in kept:
+                    continue
+                with contextlib.suppress(FileNotFoundError):
+                    if entry.name in evicted or now - entry.stat(follow_symlinks=False).st_mtime > self._max_age:
+                        os.unlink(entry.path)
+                        logger.debug(f"Evicted cache lock {entry.path}")
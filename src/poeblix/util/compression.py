@@ -0,0 +1,143 @@
+import time
+import zipfile
+import zlib
+from pathlib import Path, PurePosixPath
+from typing import Any, Dict, List, Optional, Tuple
+
+"""
+Compression policy for data_files, configured under [tool.blix.data.compression] in pyproject.toml.  Data files which
+are already compressed (images, fonts, archives, parquet files, etc.) gain nothing from being deflated again in the
+wheel, so they can be stored as-is: either by listing patterns of them, or automatically by deflating samples of each
+file to estimate whether deflating it would pay off.
+"""
+
+# Bytes sampled at the start, middle and end of a file to estimate its compressibility
+SAMPLE_SIZE = 64 * 1024
+
+# Files are stored when deflating their samples saves less than this share of their size
+AUTO_MIN_SAVING = 0.05
+
+
+def _deflate_seconds(data: bytes, level: int) -> Tuple[int, float]:
+    """Deflates data the way zipfile does, returning the compressed size and how long it took"""
+    start = time.perf_counter()
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -15)
+    size = len(compressor.compress(data)) + len(compressor.flush())
+    return size, time.perf_counter() - start
+
+
+def _sample(path: Path, size: int) -> bytes:
+    with path.open("rb") as f:
+        if size <= 3 * SAMPLE_SIZE:
+            return f.read()
+        samples = []
+        for offset in (0, (size - SAMPLE_SIZE) // 2, size - SAMPLE_SIZE):
+            f.seek(offset)
+            samples.append(f.read(SAMPLE_SIZE))
+        return b"".join(samples)
+
+
+class CompressionStats:
+    """Tallies how data_files were added to a wheel, to summarize the time and bytes saved"""
+
+    def __init__(self) -> None:
+        self.deflated_files = 0
+        self.deflated_size = 0
+        self.deflated_compress_size = 0
+        self.stored_files = 0
+        self.stored_size = 0
+        # Bytes deflated and the time it took, including samples, to estimate the time saved by storing files
+        self._deflate_bytes = 0
+        self._deflate_seconds = 0.0
+
+    def add_deflated(self, size: int, compress_size: int, seconds: float) -> None:
+        self.deflated_files += 1
+        self.deflated_size += size
+        self.deflated_compress_size += compress_size
+        self.add_timing(size, seconds)
+
+    def add_stored(self, size: int) -> None:
+        self.stored_files += 1
+        self.stored_size += size
+
+    def add_timing(self, size: int, seconds: float) -> None:
+        self._deflate_bytes += size
+        self._deflate_seconds += seconds
+
+    def summary(self) -> Optional[str]:
+        if not self.deflated_files and not self.stored_files:
+            return None
+        mib = 1024 * 1024
+        lines = [
+            f"{self.deflated_files} data file(s) deflated: {self.deflated_size / mib:.1f} MiB -> "
+            f"{self.deflated_compress_size / mib:.1f} MiB, "
+            f"{(self.deflated_size - self.deflated_compress_size) / mib:.1f} MiB saved",
+            f"{self.stored_files} data file(s) stored without compression: {self.stored_size / mib:.1f} MiB",
+        ]
+        if self.stored_size and self._deflate_seconds > 0:
+            saved = self.stored_size * self._deflate_seconds / self._deflate_bytes
+            lines[-1] += f", ~{saved:.2f}s of deflating saved"
+        return "\n".join(lines)
+
+
+class CompressionPolicy:
+    """
+    Decides how each data file is compressed in the wheel:
+
+        [tool.blix.data.compression]
+        # Glob patterns or extensions of data files to store without compression
+        store = ["*.gz", ".png", "share/models/*"]
+        # Store other data files too when deflating samples of them barely reduces their size
+        auto = true
+        # Deflate level of data files, from 0 to 9
+        level = 6
+    """
+
+    __slots__ = ("store", "auto", "level")
+
+    def __init__(self, store: Optional[List[str]] = None, auto: bool = False, level: Optional[int] = None) -> None:
+        # Extensions are shorthands for glob patterns
+        self.store = [
+            (f"*{pattern}" if pattern.startswith(".") and "*" not in pattern else pattern).lower()
+            for pattern in store or []
+        ]
+        self.auto = auto
+        self.level = level
+
+    @classmethod
+    def from_config(cls, config: Optional[Dict[str, Any]]) -> "CompressionPolicy":
+        """Policy from the [tool.blix.data.compression] section, which compresses all data files by default"""
+        if config is None:
+            return cls()
+        unknown = sorted(set(config) - {"store", "auto", "level"})
+        if unknown:
+            raise ValueError(f"Unknown keys in [tool.blix.data.compression]: {unknown}")
+        store = config.get("store", [])
+        if not isinstance(store, list) or not all(isinstance(pattern, str) for pattern in store):
+            raise ValueError(f"[tool.blix.data.compression] store must be a list of patterns, got [{store}]")
+        auto = config.get("auto", False)
+        if not isinstance(auto, bool):
+            raise ValueError(f"[tool.blix.data.compression] auto must be true or false, got [{auto}]")
+        level = config.get("level")
+        if level is not None and (isinstance(level, bool) or not isinstance(level, int) or not 0 <= level <= 9):
+            raise ValueError(f"[tool.blix.data.compression] level must be an integer from 0 to 9, got [{level}]")
+        return cls(list(store), auto, level)
+
+    def choose(self, path: Path, data_path: str, size: int, stats: CompressionStats) -> Tuple[int, Optional[int]]:
+        """
+        Compression type and level for a data file of `size` bytes, given its path relative to the wheel's data
+        folder.  Sampling the file in auto mode is accounted in the stats.
+        """
+        pure_path = PurePosixPath(data_path.lower())
+        if any(pure_path.match(pattern) for pattern in self.store):
+            return zipfile.ZIP_STORED, None
+
+        if self.auto and size:
+            sample = _sample(path, size)
+            level = zlib.Z_DEFAULT_COMPRESSION if self.level is None else self.level
+            compress_size, seconds = _deflate_seconds(sample, level)
+            stats.add_timing(len(sample), seconds)
+            if compress_size > len(sample) * (1 - AUTO_MIN_SAVING):
+                return zipfile.ZIP_STORED, None
+
+        return zipfile.ZIP_DEFLATED, self.level
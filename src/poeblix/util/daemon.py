@@ -0,0 +1,305 @@
+import json
+import multiprocessing
+import os
+import socket
+import socketserver
+import struct
+import tempfile
+import threading
+import time
+from multiprocessing.connection import Connection
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+"""
+Daemon which runs blix commands for clients connecting over a Unix socket, see `poetry blixdaemon` and
+`python -m poeblix.client`.  Each project gets a worker process of its own, which loads Poetry once and keeps the
+project loaded between commands, so commands only pay for Poetry's startup the first time they run for a project.  A
+project is loaded again when its pyproject.toml, poetry.lock or poetry.toml change.
+
+Commands of the same project run one after another in its worker, commands of different projects run in parallel up to
+a limit.  The daemon stops once no command ran for a while.
+
+This module is imported by the client, so it must not import Poetry or poeblix modules which do at the top level.
+"""
+
+# Environment variable of the daemon's socket path, if not given on the command line
+SOCKET_ENV = "POEBLIX_DAEMON_SOCKET"
+
+# Commands clients can run through the daemon
+COMMANDS = ("blixbuild", "blixvalidatewheel", "blixvalidatedocker", "blixrepin", "blixmarkerenv")
+
+# Files of a project which are loaded with it
+PROJECT_FILES = ("pyproject.toml", "poetry.lock", "poetry.toml")
+
+_LENGTH = struct.Struct("!I")
+
+
+def default_socket_path() -> Path:
+    """Socket path from POEBLIX_DAEMON_SOCKET, or a socket of the current user in the runtime or temporary directory"""
+    if os.environ.get(SOCKET_ENV):
+        return Path(os.environ[SOCKET_ENV]).expanduser()
+    runtime_dir = os.environ.get("XDG_RUNTIME_DIR") or tempfile.gettempdir()
+    return Path(runtime_dir) / f"poeblix-{os.getuid()}.sock"
+
+
+def send_message(sock: socket.socket, message: Dict[str, Any]) -> None:
+    data = json.dumps(message).encode("utf-8")
+    sock.sendall(_LENGTH.pack(len(data)) + data)
+
+
+def _recv_exactly(sock: socket.socket, size: int) -> bytes:
+    chunks = []
+    while size:
+        chunk = sock.recv(min(size, 1 << 20))
+        if not chunk:
+            raise ConnectionError("Connection closed before the whole message was received")
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b"".join(chunks)
+
+
+def recv_message(sock: socket.socket) -> Dict[str, Any]:
+    (size,) = _LENGTH.unpack(_recv_exactly(sock, _LENGTH.size))
+    return json.loads(_recv_exactly(sock, size).decode("utf-8"))
+
+
+def request(socket_path: Path, message: Dict[str, Any], timeout: Optional[float] = None) -> Dict[str, Any]:
+    """Sends a request to the daemon listening on a socket, and returns its response"""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(timeout)
+        sock.connect(str(socket_path))
+        send_message(sock, message)
+        return recv_message(sock)
+
+
+def find_project(cwd: Path) -> Path:
+    """Directory of the project Poetry finds from a working directory"""
+    for directory in [cwd, *cwd.parents]:
+        if (directory / "pyproject.toml").is_file():
+            return directory
+    raise RuntimeError(f"Poetry could not find a pyproject.toml file in {cwd} or its parents")
+
+
+def project_stamps(project: str) -> List[Optional[Tuple[int, int, int]]]:
+    """Modification times, sizes and inodes of the PROJECT_FILES of a project, None for those which do not exist"""
+    stamps: List[Optional[Tuple[int, int, int]]] = []
+    for name in PROJECT_FILES:
+        try:
+            st = os.stat(os.path.join(project, name))
+            stamps.append((st.st_mtime_ns, st.st_size, st.st_ino))
+        except FileNotFoundError:
+            stamps.append(None)
+    return stamps
+
+
+def _serve_project(project: str, conn: Connection) -> None:
+    """
+    Worker process of one project, which runs the commands it receives with the same Poetry application until it
+    receives None.  Commands run in the working directory and with the environment variables of the client which sent
+    them: os.environ is replaced by the client's environment for the duration of the command, and the worker's previous
+    environment restored after it, so no variable of one command is seen by the next.
+    """
+    from poeblix.util.workspace import new_application, run_command
+
+    application = None
+    stamps = None
+    while True:
+        command = conn.recv()
+        if command is None:
+            return
+        cwd, argv, environ = command
+        current = project_stamps(project)
+        if application is None or current != stamps:
+            application = new_application()
+            stamps = current
+        saved = dict(os.environ)
+        os.environ.clear()
+        os.environ.update(environ)
+        try:
+            conn.send(run_command(application, cwd, argv))
+        finally:
+            os.environ.clear()
+            os.environ.update(saved)
+
+
+class _ProjectWorker:
+    """Worker process of one project, which runs one command at a time"""
+
+    def __init__(self, project: Path) -> None:
+        self.project = project
+        self.lock = threading.Lock()
+        self.last_used = time.monotonic()
+        self.stopped = False
+        # Spawned rather than forked, as the daemon's threads may hold locks while it forks
+        context = multiprocessing.get_context("spawn")
+        self._conn, child_conn = context.Pipe()
+        self._process = context.Process(target=_serve_project, args=(str(project), child_conn), daemon=True)
+        self._process.start()
+        child_conn.close()
+
+    def is_alive(self) -> bool:
+        return self._process.is_alive()
+
+    def run(self, cwd: str, argv: List[str], environ: Dict[str, str]) -> Tuple[int, str]:
+        self._conn.send((cwd, argv, environ))
+        try:
+            return self._conn.recv()
+        except EOFError:
+            return 1, f"The worker process of {self.project} exited with code {self._process.exitcode}\n"
+        finally:
+            self.last_used = time.monotonic()
+
+    def stop(self) -> None:
+        """Stops the worker once it finished running its current command"""
+        with self.lock:
+            self.stopped = True
+            try:
+                self._conn.send(None)
+            except OSError:
+                pass
+            self._process.join(timeout=10)
+            if self._process.is_alive():
+                self._process.kill()
+            self._conn.close()
+
+
+class BlixDaemon:
+    """
+    Serves blix commands of clients on a Unix socket.  At most `jobs` commands run at once, and at most `max_projects`
+    projects are kept loaded, unloading the least recently used project first.  Stops after no command ran for
+    `idle_timeout` seconds, or when a client asks it to.
+    """
+
+    def __init__(self, socket_path: Path, jobs: int, max_projects: int, idle_timeout: float) -> None:
+        self.socket_path = socket_path
+        self.idle_timeout = idle_timeout
+        self._max_projects = max(max_projects, jobs)
+        self._jobs = threading.BoundedSemaphore(jobs)
+        self._workers: Dict[Path, _ProjectWorker] = {}
+        self._lock = threading.Lock()
+        self._active = 0
+        self._last_activity = time.monotonic()
+        self._server: Optional[socketserver.ThreadingUnixStreamServer] = None
+
+    def serve(self, on_command: Callable[[Path, List[str], int, float], None]) -> None:
+        """Serves clients until stopped, reporting each command run to `on_command`"""
+        if self.socket_path.exists():
+            try:
+                request(self.socket_path, {"status": True}, timeout=5)
+            except OSError:
+                # Left behind by a daemon which did not stop cleanly
+                self.socket_path.unlink()
+            else:
+                raise RuntimeError(f"A blix daemon is already listening on {self.socket_path}")
+        self.socket_path.parent.mkdir(parents=True, exist_ok=True)
+
+        daemon = self
+
+        class Handler(socketserver.BaseRequestHandler):
+            def handle(self) -> None:
+                try:
+                    message = recv_message(self.request)
+                    if not isinstance(message, dict):
+                        raise ValueError(f"expected an object, got {type(message).__name__}")
+                    response = daemon._handle(message, on_command)
+                except (ValueError, KeyError) as e:
+                    # Malformed JSON or a message missing a field
+                    response = {"exit_code": 1, "output": f"Invalid request to the blix daemon: {e!r}\n"}
+                send_message(self.request, response)
+
+        # Only the current user may connect
+        umask = os.umask(0o077)
+        try:
+            self._server = socketserver.ThreadingUnixStreamServer(str(self.socket_path), Handler)
+        finally:
+            os.umask(umask)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._stop_when_idle, daemon=True).start()
+        try:
+            self._server.serve_forever(poll_interval=0.5)
+        finally:
+            self._server.server_close()
+            with self._lock:
+                workers = list(self._workers.values())
+                self._workers.clear()
+            for worker in workers:
+                worker.stop()
+            try:
+                self.socket_path.unlink()
+            except FileNotFoundError:
+                pass
+
+    def stop(self) -> None:
+        if self._server is not None:
+            # Stops serve_forever() from another thread than the one serving
+            threading.Thread(target=self._server.shutdown, daemon=True).start()
+
+    def _stop_when_idle(self) -> None:
+        while True:
+            time.sleep(min(1.0, self.idle_timeout))
+            with self._lock:
+                idle = self._active == 0 and time.monotonic() - self._last_activity >= self.idle_timeout
+            if idle:
+                self.stop()
+                return
+
+    def _handle(
+        self, message: Dict[str, Any], on_command: Callable[[Path, List[str], int, float], None]
+    ) -> Dict[str, Any]:
+        if message.get("status"):
+            with self._lock:
+                return {"exit_code": 0, "projects": [str(project) for project in self._workers]}
+        if message.get("stop"):
+            self.stop()
+            return {"exit_code": 0, "output": f"Stopping the blix daemon listening on {self.socket_path}\n"}
+
+        argv = message["argv"]
+        if not argv or argv[0] not in COMMANDS:
+            return {"exit_code": 1, "output": f"The blix daemon only runs these commands: {', '.join(COMMANDS)}\n"}
+        if argv[0] == "blixbuild" and "--watch" in argv:
+            return {"exit_code": 1, "output": "blixbuild --watch never finishes, run it without the daemon\n"}
+        try:
+            project = find_project(Path(message["cwd"]))
+        except RuntimeError as e:
+            return {"exit_code": 1, "output": f"{e}\n"}
+
+        with self._lock:
+            self._active += 1
+        start = time.perf_counter()
+        try:
+            while True:
+                worker = self._worker(project)
+                # The project's lock comes first, so commands queued on a busy project don't hold job slots that
+                # commands of other projects could run in
+                with worker.lock:
+                    # The worker may have been stopped to unload its project while waiting for it
+                    if not worker.stopped:
+                        with self._jobs:
+                            exit_code, output = worker.run(message["cwd"], argv, message["env"])
+                        break
+        finally:
+            with self._lock:
+                self._active -= 1
+                self._last_activity = time.monotonic()
+        on_command(project, argv, exit_code, time.perf_counter() - start)
+        return {"exit_code": exit_code, "output": output}
+
+    def _worker(self, project: Path) -> _ProjectWorker:
+        """The worker process of a project, started if the project is not loaded yet"""
+        evicted = None
+        with self._lock:
+            worker = self._workers.get(project)
+            if worker is not None and not worker.is_alive():
+                del self._workers[project]
+                worker = None
+            if worker is None:
+                if len(self._workers) >= self._max_projects:
+                    idle = [w for w in self._workers.values() if not w.lock.locked()]
+                    if idle:
+                        evicted = min(idle, key=lambda w: w.last_used)
+                        del self._workers[evicted.project]
+                worker = self._workers[project] = _ProjectWorker(project)
+        if evicted is not None:
+            evicted.stop()
+        return worker
@@ -0,0 +1,151 @@
+import os
+import re
+import stat
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple
+
+"""
+Expands data_files entries of [tool.blix.data] into the files they add to a wheel's data folder.  Besides files, the
+`from` list of an entry accepts directories, whose files are added recursively, and glob patterns such as
+"assets/**/*.js".  Files are added under the entry's destination by name, or with their directory structure when the
+entry sets `preserve_structure = true`.
+
+Directory trees are discovered with os.scandir(), which provides file types without stat() calls, by a pool of threads
+which each scan one directory at a time.  The expansion is shared by `blixbuild` and `blixvalidatewheel`.
+"""
+
+_GLOB_CHARS = re.compile(r"[*?\[]")
+
+
+def _scan_dir(path: str) -> Tuple[List[str], List[str]]:
+    """Files and subdirectories directly in a directory.  Like os.walk(), symlinks to directories are not followed."""
+    files, dirs = [], []
+    with os.scandir(path) as entries:
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                dirs.append(entry.path)
+            elif entry.is_file():
+                files.append(entry.path)
+    return files, dirs
+
+
+def scan_tree(root: Path, executor: ThreadPoolExecutor) -> List[str]:
+    """Sorted paths, relative to root and "/" separated, of all files under a directory"""
+    prefix = len(str(root)) + 1
+    files: List[str] = []
+    pending: Set[Future] = {executor.submit(_scan_dir, str(root))}
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            dir_files, subdirs = future.result()
+            files.extend(path[prefix:].replace(os.sep, "/") for path in dir_files)
+            pending.update(executor.submit(_scan_dir, subdir) for subdir in subdirs)
+    return sorted(files)
+
+
+def glob_regex(pattern: str) -> "re.Pattern[str]":
+    """
+    Regex matching "/" separated paths against a glob pattern, where "**" matches any number of directories, "*" and
+    "?" match within a path component and "[...]" matches a character set.
+    """
+    regex = ""
+    i = 0
+    while i < len(pattern):
+        if pattern.startswith("**/", i):
+            regex += "(?:.*/)?"
+            i += 3
+        elif pattern.startswith("**", i):
+            regex += ".*"
+            i += 2
+        elif pattern[i] == "*":
+            regex += "[^/]*"
+            i += 1
+        elif pattern[i] == "?":
+            regex += "[^/]"
+            i += 1
+        elif pattern[i] == "[" and pattern.find("]", i + 2) != -1:
+            start, end = i + 1, pattern.find("]", i + 2)
+            chars = pattern[start:end].replace("\\", "\\\\")
+            regex += "[^" + chars[1:] + "]" if chars[0] == "!" else "[" + chars + "]"
+            i = end + 1
+        else:
+            regex += re.escape(pattern[i])
+            i += 1
+    return re.compile(regex + r"\Z")
+
+
+def _split_glob(source: str) -> Tuple[str, str]:
+    """Splits a glob pattern into the directory before its first wildcard, and the pattern relative to it"""
+    parts = source.split("/")
+    base = next(i for i, part in enumerate(parts) if _GLOB_CHARS.search(part))
+    return "/".join(parts[:base]), "/".join(parts[base:])
+
+
+def _expand_source(
+    project_dir: Path, source: str, preserve_structure: bool, require_files: bool, executor: ThreadPoolExecutor
+) -> List[Tuple[str, Path]]:
+    """Files a `from` entry adds, as (path under the destination, source path)"""
+    if _GLOB_CHARS.search(source):
+        base, pattern = _split_glob(source)
+        root = project_dir / base
+        if not root.is_dir():
+            raise RuntimeError(f"{root} of glob [{source}] in data_files is not a directory.")
+        regex = glob_regex(pattern)
+        files = [path for path in scan_tree(root, executor) if regex.match(path)]
+        if not files:
+            raise RuntimeError(f"Glob [{source}] in data_files does not match any files.")
+        return [(path if preserve_structure else path.rsplit("/", 1)[-1], root / path) for path in files]
+
+    abs_path = project_dir / source
+    try:
+        st = abs_path.stat()
+    except FileNotFoundError:
+        if not require_files:
+            return [(abs_path.name, abs_path)]
+        raise RuntimeError(f"{abs_path} in data_files is not found.")
+    if stat.S_ISDIR(st.st_mode):
+        # Files under the directory, or under a folder named after it when keeping the directory structure
+        prefix = f"{abs_path.name}/" if preserve_structure else ""
+        return [
+            (prefix + path if preserve_structure else path.rsplit("/", 1)[-1], abs_path / path)
+            for path in scan_tree(abs_path, executor)
+        ]
+    if not stat.S_ISREG(st.st_mode):
+        raise RuntimeError(f"{abs_path} in data_files is not a file.")
+    return [(abs_path.name, abs_path)]
+
+
+def expand_data_files(
+    project_dir: Path, data_files: Sequence[Dict[str, Any]], require_files: bool = True, workers: Optional[int] = None
+) -> Dict[str, Path]:
+    """
+    Maps paths under the wheel's data folder to the source files of all data_files entries, in the order they are
+    listed.  Raises if several sources would be added as the same file.
+
+    Without `require_files`, files listed by name which are missing are still mapped, e.g. to validate a wheel
+    without the data files it was built from.  Directories and globs are always expanded from the project.
+    """
+    targets: Dict[str, Path] = {}
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="blix-scan") as executor:
+        for data_file in data_files:
+            destination = data_file["destination"]
+            if Path(destination).is_absolute():
+                raise ValueError(
+                    f"Destination path in data_files [{destination}] is absolute.  Please change it to a relative path"
+                )
+
+            # TODO: Use OS specific separator
+            if destination[-1] != "/":
+                destination += "/"
+
+            preserve_structure = bool(data_file.get("preserve_structure", False))
+            for source in data_file["from"]:
+                for path, abs_path in _expand_source(project_dir, source, preserve_structure, require_files, executor):
+                    target = destination + path
+                    if target in targets and targets[target] != abs_path:
+                        raise ValueError(
+                            f"data_files [{targets[target]}] and [{abs_path}] would both be added as [{target}]"
+                        )
+                    targets[target] = abs_path
+    return targets
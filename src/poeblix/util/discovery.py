@@ -0,0 +1,213 @@
+import glob
+import logging
+import os
+import stat
+import time
+from pathlib import Path, PurePosixPath
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from poetry.core.masonry.builders.builder import BuildIncludeFile
+from poetry.core.masonry.builders.wheel import WheelBuilder
+
+from poeblix.util.cache import BlixCache, fingerprint
+
+"""
+Index of the package sources a wheel builder adds to the wheel, kept in the build cache.  Finding them means globbing
+the package's includes, walking every package directory, and asking git which files it ignores, which takes a while
+for packages with tens of thousands of modules.  The files found by the builder's find_files_to_add() are what is
+indexed, so the index always matches what Poetry finds.
+
+The index records the modification time and inode of each directory it was built from, along with the files that
+decide which files are ignored: .gitignore files, git's index and exclude files, and pyproject.toml.  Files are only
+added to, removed from or renamed within a directory by changing its modification time, so as long as none of these
+changed, the same files are found again and the index is used instead.
+
+The roots of the package's includes and the fields of BuildIncludeFile are internals of poetry-core.  With a version of
+poetry-core where they differ, sources are always found by the builder and never indexed.
+"""
+
+logger = logging.getLogger(__name__)
+
+# Bump when the format of the index changes
+INDEX_VERSION = 1
+
+# Directories modified this shortly before they were indexed may be modified again within the precision of their
+# timestamps.  Two seconds covers file systems which only store timestamps in whole seconds.
+RACY_NS = 50 * 1000 * 1000
+COARSE_RACY_NS = 2 * 1000 * 1000 * 1000
+
+
+def _stamp(path: str) -> Optional[List[int]]:
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return [st.st_mtime_ns, st.st_ino, st.st_size]
+
+
+def _walk(root: str, stamps: Dict[str, Optional[List[int]]]) -> None:
+    """Stamps a directory, its subdirectories and their .gitignore files.  Follows symlinks like Path.glob()."""
+    visited = set()
+    pending = [root]
+    while pending:
+        path = pending.pop()
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            stamps[path] = None
+            continue
+        if (st.st_dev, st.st_ino) in visited:
+            continue
+        visited.add((st.st_dev, st.st_ino))
+        stamps[path] = [st.st_mtime_ns, st.st_ino, st.st_size]
+        if not stat.S_ISDIR(st.st_mode):
+            continue
+        with os.scandir(path) as entries:
+            for entry in entries:
+                if entry.is_dir():
+                    pending.append(entry.path)
+                elif entry.name == ".gitignore":
+                    stamps[entry.path] = _stamp(entry.path)
+
+
+def _glob_root(base: Path, pattern: str) -> Path:
+    """The directory under which all matches of a glob pattern are"""
+    parts = PurePosixPath(pattern).parts
+    prefix = []
+    for part in parts:
+        if glob.has_magic(part):
+            break
+        prefix.append(part)
+    return base.joinpath(*prefix)
+
+
+def _git_dirs(project_dir: Path) -> Optional[Tuple[Path, Path]]:
+    """
+    Git directory of the repository the project is in and its common directory, which differ for worktrees, or None if
+    it is not in one.  Found the same way git does, without running it.
+    """
+    for directory in [project_dir, *project_dir.parents]:
+        dot_git = directory / ".git"
+        if dot_git.is_dir():
+            return dot_git, dot_git
+        if dot_git.is_file():
+            # Worktrees and submodules have a file pointing to their git directory
+            prefix, _, target = dot_git.read_text(errors="replace").partition(":")
+            if prefix != "gitdir":
+                return None
+            git_dir = directory / target.strip()
+            try:
+                common_dir = git_dir / (git_dir / "commondir").read_text().strip()
+            except OSError:
+                common_dir = git_dir
+            return git_dir, common_dir
+    return None
+
+
+def _include_roots(builder: WheelBuilder) -> Optional[List[Path]]:
+    """Directories under which all matches of each of the package's includes are, or None if poetry-core changed"""
+    try:
+        return [_glob_root(include.base, include._include) for include in builder._module.includes]
+    except AttributeError:
+        return None
+
+
+def _stamps(project_dir: Path, include_roots: List[Path]) -> Tuple[Dict[str, Optional[List[int]]], Dict[str, bool]]:
+    """
+    Stamps of everything the package sources are found from, and paths whose existence matters.  Stamps of paths
+    which may not exist, like .gitignore files of parent directories, are None while they don't.
+    """
+    stamps: Dict[str, Optional[List[int]]] = {}
+    exists: Dict[str, bool] = {}
+    for root in include_roots:
+        # The directory matches appear in or disappear from, and everything under it
+        stamps[str(root.parent)] = _stamp(str(root.parent))
+        _walk(str(root), stamps)
+
+    # Ignore rules of git from the project directory up, whether the project is in a repository, and what it tracks
+    for directory in [project_dir, *project_dir.parents]:
+        stamps[str(directory / ".gitignore")] = _stamp(str(directory / ".gitignore"))
+        # Only whether there is a repository, as git modifies its directory all the time
+        exists[str(directory / ".git")] = (directory / ".git").exists()
+    git_dirs = _git_dirs(project_dir)
+    if git_dirs is not None:
+        git_dir, common_dir = git_dirs
+        stamps[str(git_dir / "index")] = _stamp(str(git_dir / "index"))
+        stamps[str(common_dir / "info" / "exclude")] = _stamp(str(common_dir / "info" / "exclude"))
+    config_home = os.environ.get("XDG_CONFIG_HOME") or os.path.join(os.path.expanduser("~"), ".config")
+    for path in (os.path.join(config_home, "git", "ignore"), os.path.expanduser("~/.gitconfig")):
+        stamps[path] = _stamp(path)
+    pyproject = str(project_dir / "pyproject.toml")
+    stamps[pyproject] = _stamp(pyproject)
+    return stamps, exists
+
+
+def _is_racy(stamp: Optional[List[int]], start_ns: int) -> bool:
+    if stamp is None:
+        return False
+    mtime_ns = stamp[0]
+    return mtime_ns >= start_ns - (COARSE_RACY_NS if mtime_ns % 1000000000 == 0 else RACY_NS)
+
+
+# Fields of BuildIncludeFile set by _include_file()
+_INCLUDE_FILE_FIELDS = {"path", "project_root", "source_root", "target_dir"}
+
+
+def _include_file(path: str, project_root: Path, source_root: str, target_dir: Optional[str]) -> BuildIncludeFile:
+    """
+    A BuildIncludeFile from paths which were already resolved when indexed, without resolving them again, which is
+    most of the time spent creating tens of thousands of them
+    """
+    include_file = BuildIncludeFile.__new__(BuildIncludeFile)
+    include_file.path = Path(path)
+    include_file.project_root = project_root
+    include_file.source_root = Path(source_root)
+    include_file.target_dir = Path(target_dir) if target_dir else None
+    return include_file
+
+
+def _dump(files: Iterable[BuildIncludeFile]) -> List[List[Any]]:
+    return sorted(
+        [
+            str(file.path),
+            str(file.source_root),
+            str(file.target_dir) if getattr(file, "target_dir", None) else None,
+        ]
+        for file in files
+    )
+
+
+def find_files_to_add(
+    builder: WheelBuilder, cache: BlixCache, exclude_build: bool, find: Callable[[], Set[BuildIncludeFile]]
+) -> Set[BuildIncludeFile]:
+    """
+    Package sources of a wheel builder from the index in the cache, if nothing they are found from changed since it was
+    indexed.  Otherwise finds them with `find` and indexes them.
+    """
+    from poetry.core import __version__
+
+    project_root = builder._path.resolve()
+    key = fingerprint("discovery", INDEX_VERSION, __version__, str(project_root), builder.format, exclude_build)
+    index = cache.get_json(key)
+    if (
+        index is not None
+        and all(_stamp(path) == stamp for path, stamp in index["stamps"].items())
+        and all(os.path.exists(path) == exists for path, exists in index["exists"].items())
+    ):
+        logger.debug(f"Reusing the index of {len(index['files'])} package source(s)")
+        return {_include_file(path, project_root, source_root, target) for path, source_root, target in index["files"]}
+
+    include_roots = _include_roots(builder)
+    if include_roots is None:
+        logger.debug("Not indexing package sources, as this version of poetry-core finds them differently")
+        return find()
+
+    # Stamped before finding the files, so changes while they are found are detected the next time
+    start_ns = time.time_ns()
+    stamps, exists = _stamps(project_root, include_roots)
+    files = find()
+    if any(set(vars(file)) != _INCLUDE_FILE_FIELDS for file in files):
+        logger.debug("Not indexing package sources, as this version of poetry-core finds them differently")
+    elif not any(_is_racy(stamp, start_ns) for stamp in stamps.values()):
+        cache.put_json(key, {"stamps": stamps, "exists": exists, "files": _dump(files)})
+    return files
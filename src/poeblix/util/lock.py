@@ -0,0 +1,298 @@
+import hashlib
+import re
+import sys
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+from packaging.utils import canonicalize_name
+from poetry.core.packages.dependency import Dependency
+from poetry.core.packages.package import Package
+from poetry.core.version.markers import BaseMarker, parse_marker, union
+
+from poeblix.util.cache import fingerprint
+
+if sys.version_info >= (3, 11):
+    import tomllib
+else:
+    try:
+        import tomli as tomllib
+    except ImportError:
+        tomllib = None  # type: ignore
+
+try:
+    from poetry.core.version.requirements import InvalidRequirement  # type: ignore
+except ImportError:
+    from poetry.core.version.requirements import InvalidRequirementError as InvalidRequirement  # type: ignore
+
+"""
+Read-only loader for poetry.lock.
+
+Poetry's Locker builds a full Package object, including all file hashes, for every locked package up front.  blix
+never writes the lock file and usually only needs a fraction of the locked packages, so this parses the lock file with
+the stdlib `tomllib` (or `tomli`), keeps each entry in a compact slotted LockedPackage without its file hashes, and only
+creates Poetry Package objects for the entries a consumer actually looks up.
+"""
+
+# Source tuple layout: (type, url, reference, resolved_reference, subdirectory)
+Source = Tuple[Optional[str], Optional[str], Optional[str], Optional[str], Optional[str]]
+
+# `markers` of a Poetry 2 lock file entry: one marker for all groups, or (group, marker) pairs
+LockMarkers = Union[str, Tuple[Tuple[str, str], ...]]
+
+
+class LockedPackage:
+    """A single [[package]] entry of poetry.lock"""
+
+    __slots__ = (
+        "name",
+        "pretty_name",
+        "version",
+        "optional",
+        "python_versions",
+        "marker",
+        "markers",
+        "requirements",
+        "develop",
+        "source",
+        "dependencies",
+        "extras",
+        "_package",
+        "_environment_marker",
+    )
+
+    def __init__(self, info: Dict[str, Any]) -> None:
+        self.pretty_name: str = info["name"]
+        self.name: str = canonicalize_name(info["name"])
+        self.version: str = info["version"]
+        self.optional: bool = info.get("optional", False)
+        self.python_versions: str = info.get("python-versions", "*")
+        self.marker: Optional[str] = info.get("marker")
+        # Environments the package is locked for, per dependency group if they differ, since Poetry 2
+        markers = info.get("markers")
+        self.markers: Optional[LockMarkers] = tuple(sorted(markers.items())) if isinstance(markers, dict) else markers
+        # Compatibility for old locks
+        self.requirements: Optional[Tuple[Tuple[str, str], ...]] = (
+            tuple(info["requirements"].items()) if "requirements" in info else None
+        )
+        self.develop: Optional[bool] = info.get("develop")
+        source = info.get("source")
+        self.source: Optional[Source] = (
+            (
+                source.get("type"),
+                source.get("url"),
+                source.get("reference"),
+                source.get("resolved_reference"),
+                source.get("subdirectory"),
+            )
+            if source
+            else None
+        )
+        self.dependencies: Tuple[Tuple[str, Any], ...] = tuple(info.get("dependencies", {}).items())
+        self.extras: Tuple[Tuple[str, Tuple[str, ...]], ...] = tuple(
+            (name, tuple(deps)) for name, deps in info.get("extras", {}).items()
+        )
+        self._package: Optional[Package] = None
+        self._environment_marker: Optional[BaseMarker] = None
+
+    def fingerprint(self) -> str:
+        """Digest of everything in the entry that affects dependency resolution"""
+        return fingerprint(*(getattr(self, field) for field in self.__slots__ if not field.startswith("_")))
+
+    def environment_marker(self, lock_dir: Path) -> BaseMarker:
+        """
+        Marker of the environments the package is locked for: from `markers` of Poetry 2 lock files, where a package
+        locked with different markers per group applies if any of them does, otherwise the package's own marker of
+        older lock files.  Poetry 1.x lock files have neither, and the package applies to any environment.
+
+        Not set as the Package's marker, which Package.to_dependency() would add to the wheel's Requires-Dist.
+        """
+        if self._environment_marker is None:
+            if isinstance(self.markers, str):
+                self._environment_marker = parse_marker(self.markers)
+            elif self.markers:
+                self._environment_marker = union(*(parse_marker(marker) for _, marker in self.markers))
+            else:
+                self._environment_marker = self.to_package(lock_dir).marker
+        return self._environment_marker
+
+    def to_package(self, lock_dir: Path) -> Package:
+        """
+        Creates the Poetry Package for this entry once, the same way as Poetry's Locker.locked_repository(), except
+        that file hashes are not loaded.
+        """
+        if self._package is None:
+            self._package = self._create_package(lock_dir)
+        return self._package
+
+    def _create_package(self, lock_dir: Path) -> Package:
+        from poetry.factory import Factory
+
+        source_type, url, reference, resolved_reference, subdirectory = self.source or (None,) * 5
+        if source_type in ["directory", "file"]:
+            url = lock_dir.joinpath(url).resolve().as_posix()  # type: ignore
+
+        package = Package(
+            self.pretty_name,
+            self.version,
+            source_type=source_type,
+            source_url=url,
+            source_reference=reference,
+            source_resolved_reference=resolved_reference,
+            source_subdirectory=subdirectory,
+        )
+        package.optional = self.optional
+        package.python_versions = self.python_versions
+
+        package_extras: Dict[str, List[Dependency]] = {}
+        for extra, deps in self.extras:
+            extra_name = canonicalize_name(extra)
+            package_extras[extra_name] = []
+            for dep in deps:
+                try:
+                    dependency = Dependency.create_from_pep_508(dep)
+                except InvalidRequirement:
+                    # handle lock files with invalid PEP 508
+                    m = re.match(r"^(.+?)(?:\[(.+?)])?(?:\s+\((.+)\))?$", dep)
+                    if not m:
+                        raise
+                    dependency = Dependency(m.group(1), m.group(3) or "*", extras=(m.group(2) or "").split(","))
+                package_extras[extra_name].append(dependency)
+        package.extras = package_extras  # type: ignore
+
+        if self.marker is not None:
+            package.marker = parse_marker(self.marker)
+        elif self.requirements is not None:
+            requirement = Dependency("foo", "0.0.0")
+            for name, value in self.requirements:
+                if name == "python":
+                    requirement.python_versions = value
+                elif name == "platform":
+                    requirement.platform = value  # type: ignore
+            split_dep = requirement.to_pep_508(False).split(";")
+            if len(split_dep) > 1:
+                package.marker = parse_marker(split_dep[1].strip())
+
+        root_dir = lock_dir
+        if package.source_type == "directory":
+            # root dir should be the source of the package relative to the lock path
+            root_dir = Path(package.source_url)  # type: ignore
+        for dep_name, constraint in self.dependencies:
+            for c in constraint if isinstance(constraint, list) else [constraint]:
+                package.add_dependency(Factory.create_dependency(dep_name, c, root_dir=root_dir))
+
+        if self.develop is not None:
+            package.develop = self.develop
+        return package
+
+
+class LockedRepository:
+    """
+    Read-only view of the packages in poetry.lock.  Offers the `packages` property of Poetry's Repository, but also
+    lookups by name which only create Package objects for the matching entries.
+    """
+
+    def __init__(self, lock_dir: Path, entries: Sequence[LockedPackage] = ()) -> None:
+        self._lock_dir = lock_dir
+        self._entries = entries
+        self._by_name: Dict[str, List[LockedPackage]] = defaultdict(list)
+        for entry in entries:
+            self._by_name[entry.name].append(entry)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __iter__(self) -> Iterator[LockedPackage]:
+        return iter(self._entries)
+
+    @property
+    def packages(self) -> List[Package]:
+        return [entry.to_package(self._lock_dir) for entry in self._entries]
+
+    def packages_named(self, name: str) -> List[Package]:
+        return [entry.to_package(self._lock_dir) for entry in self._by_name.get(canonicalize_name(name), [])]
+
+    def locked_marker(self, package: Package) -> BaseMarker:
+        """Marker of the environments a package returned by packages_named() is locked for"""
+        for entry in self._by_name.get(package.name, []):
+            if entry._package is package:
+                return entry.environment_marker(self._lock_dir)
+        return package.marker
+
+    def fingerprints(self) -> Dict[str, str]:
+        """Per package name fingerprints of the locked entries, to tell which packages changed between two locks"""
+        return {name: fingerprint(*(e.fingerprint() for e in entries)) for name, entries in self._by_name.items()}
+
+
+def parse_toml(content: bytes) -> Dict[str, Any]:
+    if tomllib is not None:
+        return tomllib.loads(content.decode("utf-8"))
+    # Fall back to tomlkit, which Poetry always depends on
+    import tomlkit
+
+    return tomlkit.parse(content.decode("utf-8")).unwrap()
+
+
+# Lock file path to the modification time, size and inode it was parsed at, the digest of its content, and its data.
+# Only the latest version of each lock file is kept, so long-lived processes like the daemon hold one per project.
+_parsed_locks: Dict[Path, Tuple[Optional[Tuple[int, int, int]], str, Dict[str, Any]]] = {}
+
+# Lock files modified this shortly before they were parsed may be modified again within the precision of their
+# timestamps, so their content is compared the next time instead
+_RACY_NS = 2 * 1000 * 1000 * 1000
+
+
+def _parse_lock(lock_path: Path) -> Dict[str, Any]:
+    """
+    Parsed lock file, kept until the file changes.  Projects of a workspace with identical lock files in the same
+    process share the same data.
+    """
+    st = lock_path.stat()
+    stamp = (st.st_mtime_ns, st.st_size, st.st_ino)
+    parsed = _parsed_locks.get(lock_path)
+    if parsed is not None and parsed[0] == stamp:
+        return parsed[2]
+
+    content = lock_path.read_bytes()
+    digest = hashlib.sha256(content).hexdigest()
+    data = next((data for _, other, data in _parsed_locks.values() if other == digest), None)
+    if data is None:
+        data = parse_toml(content)
+    racy = stamp[0] >= time.time_ns() - _RACY_NS
+    _parsed_locks[lock_path] = (None if racy else stamp, digest, data)
+    return data
+
+
+def load_locked_repository(locker: Any) -> LockedRepository:
+    """Loads the locked packages of a Poetry Locker, as a replacement for `locker.locked_repository()`"""
+    lock = locker.lock
+    # Poetry < 1.3 wraps the lock path in a TOMLFile
+    lock_path = Path(getattr(lock, "path", lock))
+    if not lock_path.exists():
+        return LockedRepository(lock_path.parent)
+
+    lock_data = _parse_lock(lock_path.resolve())
+    if "metadata" not in lock_data:
+        raise RuntimeError(
+            "The lock file does not have a metadata entry.\nRegenerate the lock file with the `poetry lock` command."
+        )
+    return LockedRepository(lock_path.parent, [LockedPackage(info) for info in lock_data.get("package", [])])
+
+
+def locked_packages_lookup(locked_repository: Any) -> Callable[[str], List[Package]]:
+    """Returns a function looking up locked packages by name, for a LockedRepository or any Poetry Repository"""
+    if isinstance(locked_repository, LockedRepository):
+        return locked_repository.packages_named
+
+    by_name: Dict[str, List[Package]] = defaultdict(list)
+    for package in locked_repository.packages:
+        by_name[package.name].append(package)
+    return lambda name: by_name.get(canonicalize_name(name), [])
+
+
+def locked_marker_lookup(locked_repository: Any) -> Callable[[Package], BaseMarker]:
+    """Returns a function giving the marker of the environments a package from locked_packages_lookup applies to"""
+    if isinstance(locked_repository, LockedRepository):
+        return locked_repository.locked_marker
+    return lambda package: package.marker
@@ -0,0 +1,106 @@
+import json
+from typing import Any, Dict, List, Optional, Sequence, Union
+
+from poetry.core.poetry import Poetry as CorePoetry
+from poetry.installation.operations.operation import Operation
+from poetry.repositories import Repository
+
+from poeblix.util import util
+from poeblix.util.cache import fingerprint
+from poeblix.util.lock import LockedRepository
+from poeblix.util.wheel import WheelReader
+
+"""
+Resolution manifest written by `poetry blixbuild` into the wheel's .dist-info directory.  It records what the locked
+dependencies in the wheel were resolved from: a fingerprint of poetry.lock and pyproject.toml, the dependency groups and
+the marker environments, along with the resolved pins.  As long as none of these changed, `poetry blixvalidatewheel`
+can validate the wheel against the pins in the manifest instead of resolving the lock file again.
+"""
+
+MANIFEST_NAME = "blix.json"
+
+# Bump when the format of the manifest changes
+MANIFEST_VERSION = 1
+
+
+# Markers of the build host's kernel, which vary between machines building the same reproducible wheel
+HOST_MARKERS = ("platform_release", "platform_version")
+
+
+def resolution_inputs(
+    poetry: "CorePoetry", groups: List[str], marker_envs: Sequence[Dict[str, Any]], reproducible: bool = False
+) -> Dict[str, Any]:
+    """
+    Everything the locked dependencies of a wheel are resolved from.  For reproducible wheels, the Poetry version and
+    HOST_MARKERS are left out, so that the manifest is the same on any machine.
+    """
+    from poetry.__version__ import __version__
+
+    if reproducible:
+        marker_envs = [{k: v for k, v in env.items() if k not in HOST_MARKERS} for env in marker_envs]
+    inputs = {
+        "poetry": __version__,
+        "lock": util.lock_digest(poetry),
+        "pyproject": fingerprint(*util.dependency_sections(poetry)),
+        "groups": util.dependency_groups(groups),
+        "marker_envs": list(marker_envs),
+    }
+    if reproducible:
+        del inputs["poetry"]
+    return inputs
+
+
+def create_manifest(
+    poetry: "CorePoetry",
+    groups: List[str],
+    marker_envs: Sequence[Dict[str, Any]],
+    resolved: Sequence[Sequence[Operation]],
+    reproducible: bool = False,
+) -> Dict[str, Any]:
+    return {
+        "version": MANIFEST_VERSION,
+        "reproducible": reproducible,
+        "inputs": resolution_inputs(poetry, groups, marker_envs, reproducible),
+        # Sorted, as the order packages are resolved in can vary while the wheel should not
+        "resolved": [
+            sorted((util.dump_package(op.package) for op in ops), key=lambda p: (p["name"], p["version"]))
+            for ops in resolved
+        ],
+    }
+
+
+def dump_manifest(manifest: Dict[str, Any]) -> bytes:
+    return (json.dumps(manifest, indent=2, sort_keys=True) + "\n").encode("utf-8")
+
+
+def read_manifest(wheel: WheelReader) -> Optional[Dict[str, Any]]:
+    """Reads the resolution manifest of a wheel, or None if it has none or it was written by another format version"""
+    content = wheel.read_dist_info(MANIFEST_NAME)
+    if content is None:
+        return None
+    manifest = json.loads(content)
+    return manifest if manifest.get("version") == MANIFEST_VERSION else None
+
+
+def manifest_resolution(
+    manifest: Dict[str, Any],
+    poetry: "CorePoetry",
+    groups: List[str],
+    marker_envs: Sequence[Dict[str, Any]],
+    locked_repository: Union[Repository, LockedRepository],
+) -> Optional[List[List[Operation]]]:
+    """
+    Returns the resolved dependencies recorded in the manifest, if they were resolved from the same inputs as the
+    project currently has.  Otherwise returns None, and dependencies need to be resolved again.  The inputs of
+    reproducible wheels are compared without what they leave out.
+    """
+    inputs = resolution_inputs(poetry, groups, marker_envs, manifest.get("reproducible", False))
+    if manifest["inputs"] != json.loads(json.dumps(inputs)):
+        return None
+    resolved = []
+    for dumped in manifest["resolved"]:
+        ops = util.load_operations(dumped, locked_repository)
+        if ops is None:
+            return None
+        resolved.append(ops)
+    return resolved
@@ -0,0 +1,109 @@
+import json
+import os
+from pathlib import Path
+from typing import Any, Dict, Optional, cast
+
+from poetry.utils.env import Env
+
+from poeblix.util.cache import BlixCache, fingerprint
+
+"""
+Snapshots of environment markers (python version, platform, implementation, etc.), which Poetry otherwise gets by
+spawning the environment's interpreter.  Snapshots are cached per interpreter, and can be saved to a file with
+`poetry blixmarkerenv` to resolve dependencies for a target environment without its interpreter being present.
+"""
+
+# Markers defined by PEP 508, which a snapshot must provide
+REQUIRED_MARKERS = (
+    "implementation_name",
+    "implementation_version",
+    "os_name",
+    "platform_machine",
+    "platform_release",
+    "platform_system",
+    "platform_version",
+    "python_full_version",
+    "platform_python_implementation",
+    "python_version",
+    "sys_platform",
+)
+
+
+class SnapshotEnv:
+    """
+    Stands in for an environment whose markers come from a snapshot instead of probing its interpreter.  Poetry's
+    solver only reads the markers and path of the environment it resolves for, anything else is read from the wrapped
+    environment, if there is one.
+
+    This wraps the environment rather than subclassing Env, which is abstract since Poetry 2.0 and cannot be created
+    without an interpreter, e.g. in the worker processes resolving for target environments.
+    """
+
+    def __init__(self, path: Path, marker_env: Dict[str, Any], env: Optional[Env] = None) -> None:
+        self.path = path
+        self._marker_env = marker_env
+        self._env = env
+
+    @property
+    def marker_env(self) -> Dict[str, Any]:
+        return self._marker_env
+
+    def get_marker_env(self) -> Dict[str, Any]:
+        return self._marker_env
+
+    def __getattr__(self, name: str) -> Any:
+        # Looked up without __getattr__, which would recurse before __init__ set it, e.g. while copying
+        env = self.__dict__.get("_env")
+        if env is None:
+            raise AttributeError(f"Environment snapshot has no attribute [{name}]")
+        return getattr(env, name)
+
+
+def load_marker_env(path: str) -> Dict[str, Any]:
+    """Loads a marker snapshot file as written by `poetry blixmarkerenv`"""
+    snapshot_path = Path(path)
+    if not snapshot_path.is_file():
+        raise ValueError(f"Marker environment file [{path}] does not exist")
+    marker_env = json.loads(snapshot_path.read_text(encoding="utf-8"))
+    missing = [marker for marker in REQUIRED_MARKERS if marker not in marker_env]
+    if missing:
+        raise ValueError(f"Marker environment file [{path}] is missing markers: {missing}")
+    return marker_env
+
+
+def snapshot_key(env: Env) -> str:
+    """Identifies an environment's interpreter by its resolved path and modification time"""
+    python = Path(env.python).resolve()
+    st = os.stat(python)
+    return fingerprint(str(env.path), str(python), st.st_mtime_ns, st.st_size)
+
+
+# Snapshots already read in this process, e.g. by the projects of a workspace sharing an interpreter
+_snapshots: Dict[str, Dict[str, Any]] = {}
+
+
+def get_marker_env(env: Env, cache: Optional[BlixCache] = None) -> Dict[str, Any]:
+    """Returns the environment's markers, reusing a cached snapshot for the same interpreter if available"""
+    if cache is None:
+        return env.marker_env
+    key = snapshot_key(env)
+    marker_env = _snapshots.get(key)
+    if marker_env is None:
+        marker_env = cache.get_json(key)
+    if marker_env is None:
+        marker_env = env.marker_env
+        cache.put_json(key, marker_env)
+    _snapshots[key] = marker_env
+    return marker_env
+
+
+def snapshot_env(env: Env, marker_env: Optional[Dict[str, Any]] = None, cache: Optional[BlixCache] = None) -> Env:
+    """
+    Returns an environment to resolve dependencies for: one with the given marker snapshot, or the given environment
+    with its markers taken from the snapshot cache.
+    """
+    if marker_env is not None:
+        return cast(Env, SnapshotEnv(env.path, marker_env, env))
+    if cache is not None:
+        return cast(Env, SnapshotEnv(env.path, get_marker_env(env, cache), env))
+    return env
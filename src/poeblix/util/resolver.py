@@ -0,0 +1,241 @@
+import logging
+from typing import Callable, Dict, FrozenSet, List, Optional, Sequence, Set, Tuple
+
+from poetry.core.packages.dependency import Dependency
+from poetry.core.packages.package import Package
+from poetry.core.packages.project_package import ProjectPackage
+from poetry.installation.operations import Install
+from poetry.installation.operations.operation import Operation
+from poetry.core.version.markers import BaseMarker
+from poetry.puzzle.provider import Provider
+
+try:
+    from poetry.core.constraints.version import Version
+except ImportError:
+    from poetry.core.semver.version import Version  # type: ignore
+
+"""
+Resolves dependencies of a locked project by walking the dependency graph recorded in poetry.lock, instead of running
+Poetry's version solver.
+
+Versions in a lock file are already solved, so all the solver effectively does for blix is drop packages whose markers
+do not apply to the environment, and packages only needed by groups or extras that were not requested.  Walking the
+locked graph from the root requirements does the same in time linear to the size of the lock file.
+"""
+
+logger = logging.getLogger(__name__)
+
+# A package in the walk is identified by its name and the extras it was requested with
+NodeID = Tuple[str, FrozenSet[str]]
+
+# Dependencies of a locked package that apply to the environment, as (name, extras, constraint) lists keyed by
+# node_key().  JSON serializable, so they can be stored and reused for packages whose lock entries did not change.
+Expansions = Dict[str, List[List]]
+
+# Looks up the marker of the environments a locked package applies to, see util.lock.locked_marker_lookup
+LockedMarker = Callable[[Package], BaseMarker]
+
+
+class FallbackToSolver(Exception):
+    """Raised when the locked graph cannot be resolved without Poetry's solver"""
+
+
+def node_key(package: Package, extras: FrozenSet[str]) -> str:
+    key = f"{package.name}=={package.version.text}"
+    return f"{key}[{','.join(sorted(extras))}]" if extras else key
+
+
+def node_name(key: str) -> str:
+    """Name of the package of a node_key()"""
+    return key.split("==", 1)[0]
+
+
+class LockGraphResolver:
+    """
+    Mirrors the filtering poetry.puzzle.provider.Provider.complete_package applies to dependencies when solving for a
+    specific environment, but picks versions straight from the locked packages.
+    """
+
+    def __init__(
+        self,
+        root: ProjectPackage,
+        find_locked: Callable[[str], List[Package]],
+        marker_env: Dict[str, str],
+        previous: Optional[Expansions] = None,
+        locked_marker: Optional[LockedMarker] = None,
+    ) -> None:
+        self._root = root
+        # Looks up locked packages by name, so only packages reachable from the root are ever loaded
+        self._find_locked = find_locked
+        self._marker_env = marker_env
+        self._locked_marker: LockedMarker = locked_marker or (lambda package: package.marker)
+        self._python_version = Version.parse(marker_env["python_full_version"])
+        # Expansions of a previous walk to reuse, and the expansions of the nodes visited by this walk
+        self._previous = previous or {}
+        self.expansions: Expansions = {}
+
+    def _accepts(self, dep: Dependency, is_root: bool, extras: FrozenSet[str], optional_names: Set[str]) -> bool:
+        if not self._python_version.allows_any(dep.python_constraint):
+            return False
+        if dep.name in Provider.UNSAFE_PACKAGES:
+            return False
+        if not dep.marker.validate(self._marker_env):
+            return False
+        if not is_root and (
+            (dep.is_optional() and dep.name not in optional_names)
+            or (dep.in_extras and not set(dep.in_extras).intersection(extras))
+        ):
+            return False
+        return True
+
+    def dependencies(self, package: Package, extras: FrozenSet[str]) -> List[Dependency]:
+        """Dependencies of a package that apply to the environment, given the extras it was requested with"""
+        is_root = package is self._root
+        optional_names: Set[str] = set()
+        for extra in extras:
+            optional_names.update(d.name for d in package.extras.get(extra, []))  # type: ignore
+        requires = package.all_requires if is_root else package.requires
+        return [dep for dep in requires if self._accepts(dep, is_root, extras, optional_names)]
+
+    def _expand(self, package: Package, extras: FrozenSet[str]) -> List[Dependency]:
+        if package is self._root:
+            return self.dependencies(package, extras)
+
+        key = node_key(package, extras)
+        previous = self._previous.get(key)
+        if previous is not None:
+            self.expansions[key] = previous
+            return [Dependency(name, constraint, extras=dep_extras) for name, dep_extras, constraint in previous]
+
+        deps = self.dependencies(package, extras)
+        self.expansions[key] = [[dep.name, sorted(dep.extras), dep.pretty_constraint] for dep in deps]
+        return deps
+
+    def _choose(self, dep: Dependency, chosen: Dict[str, Package]) -> Package:
+        if dep.is_direct_origin():
+            raise FallbackToSolver(f"{dep.name} is a direct origin dependency")
+
+        package = chosen.get(dep.name)
+        if package is not None:
+            if not dep.constraint.allows(package.version):
+                raise FallbackToSolver(f"Conflicting requirements for {dep.name}")
+            return package
+
+        candidates = []
+        for package in self._find_locked(dep.name):
+            if package.is_direct_origin():
+                raise FallbackToSolver(f"{dep.name} is locked to a direct origin package")
+            # Packages locked for other environments, e.g. one version per python version, do not apply
+            if dep.constraint.allows(package.version) and self._locked_marker(package).validate(self._marker_env):
+                candidates.append(package)
+        if not candidates:
+            raise FallbackToSolver(f"No locked package satisfies {dep.to_pep_508()}")
+        if len(candidates) > 1:
+            # Which one applies depends on the markers of the paths to the package, which only the solver tracks
+            raise FallbackToSolver(f"Several locked packages satisfy {dep.to_pep_508()}")
+        chosen[dep.name] = candidates[0]
+        return candidates[0]
+
+    def resolve(self) -> List[Package]:
+        chosen: Dict[str, Package] = {}
+        visited: Set[NodeID] = set()
+        stack: List[Tuple[Package, FrozenSet[str]]] = [(self._root, frozenset())]
+        while stack:
+            package, extras = stack.pop()
+            for dep in self._expand(package, extras):
+                child = self._choose(dep, chosen)
+                node = (child.name, frozenset(dep.extras))
+                if node not in visited:
+                    visited.add(node)
+                    stack.append((child, node[1]))
+        return list(chosen.values())
+
+
+def resolve_locked(
+    root: ProjectPackage,
+    find_locked: Callable[[str], List[Package]],
+    marker_env: Dict[str, str],
+    expansions: Optional[Expansions] = None,
+    locked_marker: Optional[LockedMarker] = None,
+) -> Optional[List[Operation]]:
+    """
+    Resolves the operations for the root package's dependencies from the locked packages alone.  Returns None if the
+    graph contains dependencies only Poetry's solver can handle, such as VCS, path or URL dependencies.
+
+    If expansions are given, the dependencies of nodes found in them are reused instead of being recomputed from the
+    locked packages, and on success they are replaced with the expansions of all nodes visited by the walk.
+
+    `locked_marker` gives the environments each locked package applies to, by default its marker.
+    """
+    resolver = LockGraphResolver(root, find_locked, marker_env, expansions, locked_marker)
+    try:
+        packages = resolver.resolve()
+    except FallbackToSolver as e:
+        logger.info(f"Cannot resolve from the locked dependency graph ({e}), falling back to Poetry's solver")
+        return None
+    if expansions is not None:
+        expansions.clear()
+        expansions.update(resolver.expansions)
+    return [Install(package) for package in sorted(packages, key=lambda p: (p.name, p.version))]
+
+
+def group_closures(
+    package: ProjectPackage,
+    groups: Sequence[str],
+    find_locked: Callable[[str], List[Package]],
+    marker_env: Dict[str, str],
+    locked_marker: Optional[LockedMarker] = None,
+) -> Tuple[List[Package], Dict[str, int]]:
+    """
+    Walks the locked graph reachable from each dependency group once.  Returns the packages of all groups, and for
+    each group a bitset of the indices of the packages it needs, so the packages of any combination of groups are the
+    union of the groups' bitsets.  Expansions are shared between the walks, so every locked package is only expanded
+    once no matter how many groups reach it.
+    """
+    packages: List[Package] = []
+    index: Dict[str, int] = {}
+    closures: Dict[str, int] = {}
+    expansions: Expansions = {}
+    for group in groups:
+        root = package.with_dependency_groups([group], only=True)
+        resolver = LockGraphResolver(root, find_locked, marker_env, expansions, locked_marker)
+        closure = 0
+        for locked in resolver.resolve():
+            bit = index.setdefault(locked.name, len(packages))
+            if bit == len(packages):
+                packages.append(locked)
+            elif packages[bit] != locked:
+                # The union of the closures would not be a valid resolution
+                raise FallbackToSolver(f"Dependency groups need different versions of {locked.name}")
+            closure |= 1 << bit
+        expansions.update(resolver.expansions)
+        closures[group] = closure
+    return packages, closures
+
+
+def resolve_locked_group_sets(
+    package: ProjectPackage,
+    group_sets: Sequence[Sequence[str]],
+    find_locked: Callable[[str], List[Package]],
+    marker_env: Dict[str, str],
+    locked_marker: Optional[LockedMarker] = None,
+) -> Optional[List[List[Operation]]]:
+    """
+    Resolves the operations for several combinations of dependency groups from one walk of the locked graph per group.
+    Returns None if the graph contains dependencies only Poetry's solver can handle.
+    """
+    groups = sorted({group for group_set in group_sets for group in group_set})
+    try:
+        packages, closures = group_closures(package, groups, find_locked, marker_env, locked_marker)
+    except FallbackToSolver as e:
+        logger.info(f"Cannot resolve from the locked dependency graph ({e}), falling back to Poetry's solver")
+        return None
+
+    results: List[List[Operation]] = []
+    for group_set in group_sets:
+        closure = 0
+        for group in group_set:
+            closure |= closures[group]
+        selected = [locked for bit, locked in enumerate(packages) if closure >> bit & 1]
+        results.append([Install(locked) for locked in sorted(selected, key=lambda p: (p.name, p.version))])
+    return results
@@ -0,0 +1,164 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple, cast
+
+from cleo.helpers import option
+from cleo.io.inputs.option import Option
+from poetry.core.poetry import Poetry as CorePoetry
+from poetry.core.version.markers import parse_marker
+from poetry.installation.operations.operation import Operation
+from poetry.utils.env import Env
+
+from poeblix.util import util
+from poeblix.util.lock import LockedRepository, load_locked_repository
+from poeblix.util.markers import SnapshotEnv, load_marker_env
+
+"""
+Resolves dependencies for several target environments in one run, such as other Python versions and platforms, each
+described by a marker snapshot written by `poetry blixmarkerenv`.  Targets are resolved in parallel processes, and
+their Requires-Dist can be merged into one list where pins needed by only some targets are annotated with markers.
+"""
+
+# Markers to tell targets apart by, in order of preference
+TARGET_MARKERS = (
+    "python_version",
+    "sys_platform",
+    "platform_machine",
+    "platform_python_implementation",
+    "python_full_version",
+    "implementation_name",
+    "os_name",
+    "platform_system",
+    "platform_release",
+    "platform_version",
+    "implementation_version",
+)
+
+
+def target_env_option() -> Option:
+    return option(
+        "target-env",
+        None,
+        "Path to an environment marker snapshot written by `poetry blixmarkerenv` to resolve dependencies for.  Can "
+        "be specified multiple times to resolve for several targets in parallel, in which case Requires-Dist of all "
+        "targets are merged, with pins only needed by some targets annotated with environment markers.",
+        flag=False,
+        multiple=True,
+    )
+
+
+def load_targets(paths: Sequence[str]) -> List[Tuple[str, Dict[str, Any]]]:
+    """Loads target marker snapshots, named after their file names"""
+    return [(Path(path).stem, load_marker_env(path)) for path in paths]
+
+
+def target_markers(marker_envs: Sequence[Dict[str, Any]]) -> List[str]:
+    """
+    PEP 508 markers matching each target environment but none of the others, using as few markers as possible.  Empty
+    if there is only one distinct target.
+    """
+    keys: List[str] = []
+    for key in TARGET_MARKERS:
+        if len({tuple(env[k] for k in keys) for env in marker_envs}) == len({_identity(env) for env in marker_envs}):
+            break
+        if len({env[key] for env in marker_envs}) > 1:
+            keys.append(key)
+    return [" and ".join(f'{key} == "{env[key]}"' for key in keys) for env in marker_envs]
+
+
+def _identity(marker_env: Dict[str, Any]) -> Tuple:
+    return tuple(marker_env[key] for key in TARGET_MARKERS)
+
+
+def merge_requires_dist(requires_dist: Sequence[Sequence[str]], marker_envs: Sequence[Dict[str, Any]]) -> List[str]:
+    """
+    Merges the Requires-Dist of several targets into one list.  Requirements of all targets are kept as-is, the others
+    get a marker for the targets that need them.
+    """
+    markers = target_markers(marker_envs)
+    needed_by: Dict[str, List[int]] = {}
+    for target, requirements in enumerate(requires_dist):
+        for requirement in requirements:
+            needed_by.setdefault(requirement, []).append(target)
+
+    merged = []
+    for requirement, targets in needed_by.items():
+        target_marker = " or ".join(_group(markers[target], len(targets)) for target in targets)
+        if len(targets) == len(requires_dist) or not target_marker:
+            merged.append(requirement)
+            continue
+        name, _, marker = requirement.partition(";")
+        if marker.strip():
+            target_marker = f"({marker.strip()}) and ({target_marker})"
+        merged.append(f"{name.strip()} ; {target_marker}")
+    return merged
+
+
+def _group(marker: str, count: int) -> str:
+    return f"({marker})" if count > 1 and " and " in marker else marker
+
+
+def marker_applies(marker: str, marker_env: Dict[str, Any]) -> bool:
+    """Whether a Requires-Dist marker applies to a target environment"""
+    return not marker.strip() or parse_marker(marker.strip()).validate(marker_env)
+
+
+def resolve_targets(
+    poetry: "CorePoetry",
+    env: Env,
+    locked_repository: LockedRepository,
+    with_groups: Optional[List[str]],
+    marker_envs: Sequence[Dict[str, Any]],
+    **resolve_options: Any,
+) -> List[Sequence[Operation]]:
+    """
+    Resolves dependencies for each target marker environment, with the same options as util.resolve_dependencies().
+    Several targets are resolved in parallel processes, which load the project again and send back the resolved
+    packages to look up in the locked repository.
+    """
+    resolve_options = {key: value for key, value in resolve_options.items() if key != "marker_env"}
+    if len(marker_envs) == 1:
+        return [
+            util.resolve_dependencies(
+                poetry, env, locked_repository, with_groups, marker_env=marker_envs[0], **resolve_options
+            )
+        ]
+
+    project_dir = str(poetry.file.path.parent)  # type: ignore
+    with ProcessPoolExecutor(max_workers=min(len(marker_envs), os.cpu_count() or 1)) as executor:
+        futures = [
+            executor.submit(_resolve_target, project_dir, str(env.path), with_groups, marker_env, resolve_options)
+            for marker_env in marker_envs
+        ]
+        dumps = [future.result() for future in futures]
+
+    results: List[Sequence[Operation]] = []
+    for dumped in dumps:
+        ops = util.load_operations(dumped, locked_repository)
+        if ops is None:
+            raise RuntimeError("poetry.lock changed while resolving dependencies for target environments")
+        results.append(ops)
+    return results
+
+
+def _resolve_target(
+    project_dir: str,
+    env_path: str,
+    with_groups: Optional[List[str]],
+    marker_env: Dict[str, Any],
+    resolve_options: Dict[str, Any],
+) -> List[Dict[str, Any]]:
+    """
+    Resolves dependencies for one target in a worker process.  The solver only needs the target's markers, so it
+    resolves for a snapshot of them instead of an environment with an interpreter.
+    """
+    from poetry.factory import Factory
+
+    poetry = Factory().create_poetry(Path(project_dir))
+    env = cast(Env, SnapshotEnv(Path(env_path), marker_env))
+    locked_repository = load_locked_repository(poetry.locker)
+    ops = util.resolve_dependencies(
+        poetry, env, locked_repository, with_groups, marker_env=marker_env, **resolve_options
+    )
+    return [util.dump_package(op.package) for op in ops]
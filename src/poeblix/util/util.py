@@ -1,26 +1,449 @@
-from typing import Sequence, Callable, List, Optional
+import logging
+import os
+from typing import Sequence, Callable, List, Optional, Dict, Any, Union
 
+from cleo.helpers import option
+from cleo.io.inputs.option import Option
 from cleo.io.null_io import NullIO
 
 # For fixing https://github.com/python-poetry/poetry/issues/5216
 from packaging.tags import sys_tags  # noqa
 from poetry.core.poetry import Poetry as CorePoetry
+from poetry.installation.operations import Install
 from poetry.installation.operations.operation import Operation
 from poetry.poetry import Poetry
 from poetry.puzzle import Solver
+from poetry.puzzle.exceptions import SolverProblemError
 from poetry.repositories import RepositoryPool
 from poetry.repositories import Repository
-from poetry.repositories.installed_repository import InstalledRepository
 from poetry.utils.env import Env
 
+from poeblix.util.cache import BlixCache, default_cache_dir, file_digest, fingerprint
+from poeblix.util.lock import LockedRepository, locked_marker_lookup, locked_packages_lookup
+from poeblix.util.markers import load_marker_env, snapshot_env
+from poeblix.util.resolver import Expansions, node_name, resolve_locked, resolve_locked_group_sets
+
+logger = logging.getLogger(__name__)
+
+# Bump when the format of cached resolutions changes
+RESOLUTION_CACHE_VERSION = 1
+
+
+def resolve_options() -> List[Option]:
+    """Options shared by all blix commands that resolve dependencies from the lock file"""
+    return [
+        option(
+            "cache-dir",
+            None,
+            "Directory of the resolution cache, which can be shared between CI runners.  Defaults to the "
+            "POEBLIX_CACHE_DIR environment variable, or a 'blix' folder under Poetry's cache directory.",
+            flag=False,
+        ),
+        option(
+            "no-resolution-cache",
+            None,
+            "Disables reading and writing resolved dependencies from/to the resolution cache.",
+        ),
+        option(
+            "fast-resolve",
+            None,
+            "Resolves dependencies by walking the locked dependency graph instead of running Poetry's solver.  Falls "
+            "back to the solver for VCS, path and URL dependencies.",
+        ),
+        option(
+            "locked-only",
+            None,
+            "Never consults remote package sources, and only resolves dependencies from packages in poetry.lock.  "
+            "Fails if the lock file does not cover the project's dependencies.",
+        ),
+        option(
+            "marker-env",
+            None,
+            "Path to an environment marker snapshot written by `poetry blixmarkerenv`, to resolve dependencies for "
+            "that environment instead of the current one.",
+            flag=False,
+        ),
+        option(
+            "full-solve",
+            None,
+            "Ignores cached and previous resolutions, and resolves the whole dependency graph with Poetry's solver.  "
+            "Useful to check that incremental re-resolution after lock file changes gives the same result.",
+        ),
+    ]
+
+
+def get_resolve_options(poetry: "CorePoetry", option_func: Callable) -> Dict[str, Any]:
+    """Translates the options from resolve_options() into keyword arguments for resolve_dependencies()"""
+    cache = None
+    marker_cache = None
+    incremental_cache = None
+    if not option_func("no-resolution-cache"):
+        cache_dir = default_cache_dir(poetry, option_func("cache-dir"))
+        cache = BlixCache(cache_dir, "resolution")
+        marker_cache = BlixCache(cache_dir, "markers")
+        incremental_cache = BlixCache(cache_dir, "incremental")
+    marker_env = load_marker_env(option_func("marker-env")) if option_func("marker-env") else None
+    return {
+        "cache": cache,
+        "fast": option_func("fast-resolve"),
+        "locked_only": option_func("locked-only"),
+        "marker_env": marker_env,
+        "marker_cache": marker_cache,
+        "incremental_cache": incremental_cache,
+        "full_solve": option_func("full-solve"),
+    }
+
+
+def report_cache(line: Callable, resolve_options: Dict[str, Any]) -> None:
+    """Reports hits and misses of the resolution cache through a command's `line` function, if it was used"""
+    cache = resolve_options.get("cache")
+    if cache is not None and cache.hits + cache.misses:
+        line(f"Resolution cache {cache.directory}: {cache.hits} hit(s), {cache.misses} miss(es)")
+
+
+def _lock_path(poetry: "CorePoetry"):
+    lock = poetry.locker.lock  # type: ignore
+    # Poetry < 1.3 wraps the lock path in a TOMLFile
+    return getattr(lock, "path", lock)
+
+
+def lock_digest(poetry: "CorePoetry") -> Optional[str]:
+    """Digest of poetry.lock, or None if the project has no lock file"""
+    lock_path = _lock_path(poetry)
+    return file_digest(lock_path) if lock_path.exists() else None
+
+
+def dependency_sections(poetry: "CorePoetry") -> List[Dict[str, Any]]:
+    """The sections of pyproject.toml which affect the resolved dependencies"""
+    tool_poetry = poetry.pyproject.data.get("tool", {}).get("poetry", {})
+    project = poetry.pyproject.data.get("project", {})
+    return [
+        {key: tool_poetry.get(key) for key in ("dependencies", "dev-dependencies", "group", "extras")},
+        {key: project.get(key) for key in ("dependencies", "optional-dependencies")},
+    ]
+
+
+def resolution_key(
+    poetry: "CorePoetry", env: Env, groups: List[str], fast: bool = False, with_lock: bool = True
+) -> str:
+    """
+    Cache key of a resolution: the content of poetry.lock, the dependency sections of pyproject.toml, the requested
+    dependency groups and the marker environment the packages are resolved for.  Without the lock, this identifies
+    the previous resolution to incrementally re-resolve from when poetry.lock changes.
+    """
+    from poetry.__version__ import __version__
+
+    return fingerprint(
+        RESOLUTION_CACHE_VERSION,
+        __version__,
+        lock_digest(poetry) if with_lock else None,
+        *dependency_sections(poetry),
+        sorted(groups),
+        env.marker_env,
+        fast,
+    )
+
+
+def dump_package(package) -> Dict[str, Any]:
+    return {
+        "name": package.name,
+        "version": package.version.text,
+        "source_type": package.source_type,
+        "source_url": package.source_url,
+        "source_reference": package.source_reference,
+    }
+
+
+def load_operations(
+    cached: List[Dict[str, Any]], locked_repository: Union[Repository, LockedRepository]
+) -> Optional[List[Operation]]:
+    """Maps cached package entries back onto the locked packages, or None if any of them cannot be found"""
+    find_locked = locked_packages_lookup(locked_repository)
+    ops: List[Operation] = []
+    for entry in cached:
+        package = next((p for p in find_locked(entry["name"]) if dump_package(p) == entry), None)
+        if package is None:
+            return None
+        ops.append(Install(package))
+    return ops
+
 
 def resolve_dependencies(
-    poetry: "CorePoetry", env: Env, locked_repository: Repository, with_groups: Optional[List[str]] = None
+    poetry: "CorePoetry",
+    env: Env,
+    locked_repository: Union[Repository, LockedRepository],
+    with_groups: Optional[List[str]] = None,
+    cache: Optional[BlixCache] = None,
+    fast: bool = False,
+    locked_only: bool = False,
+    marker_env: Optional[Dict[str, Any]] = None,
+    marker_cache: Optional[BlixCache] = None,
+    incremental_cache: Optional[BlixCache] = None,
+    full_solve: bool = False,
 ) -> Sequence[Operation]:
     """
     This uses poetry's solver to resolve dependencies and filters out packages from the lock file which are not
     needed, such as packages that are not for our OS environment using markers (e.g. pywin32 is for Windows).
+
+    If a cache is given, resolutions are persisted to it and reused as long as the lock file, pyproject.toml
+    dependencies, groups and environment markers are unchanged.
+
+    If fast is set, dependencies are resolved by walking the locked dependency graph instead, see util.resolver.
+
+    If locked_only is set, only packages in the lock file are considered, and remote package sources are never
+    consulted.
+
+    Environment markers are taken from the marker_env snapshot if given, otherwise from the env's interpreter, cached
+    in marker_cache.
+
+    If fast is set and an incremental_cache is given, the locked dependency graph of each resolution is kept in it.
+    When only some packages in poetry.lock change, only the parts of the graph reached through the changed packages
+    are re-resolved, see _resolve_incremental.  Without fast, dependencies are always those resolved by the solver.
+
+    If full_solve is set, cached and previous resolutions are ignored, and Poetry's solver resolves the whole graph.
     """
+    env = snapshot_env(env, marker_env, marker_cache)
+    groups = dependency_groups(with_groups)
+    if not fast:
+        # Re-resolving incrementally walks the locked graph, same as fast
+        incremental_cache = None
+    if locked_only:
+        _validate_lock_covers_dependencies(poetry, locked_repository, groups)
+    if full_solve:
+        logger.info("Resolving the whole dependency graph with Poetry's solver as --full-solve was specified")
+        ops = _resolve(poetry, env, locked_repository, groups, False, locked_only)
+        if cache is not None:
+            cache.put_json(resolution_key(poetry, env, groups, fast), [dump_package(op.package) for op in ops])
+        if incremental_cache is not None:
+            # Only record the locked graph if walking it resolves to the same packages as the solver
+            expansions: Expansions = {}
+            walked = _walk_lock(poetry, env, locked_repository, groups, expansions)
+            if walked is None or _dump_operations(walked) != _dump_operations(ops):
+                logger.info(
+                    "Dependencies cannot be re-resolved incrementally, as the locked graph differs from the solver's"
+                )
+                _save_incremental_state(poetry, env, locked_repository, groups, fast, None, incremental_cache)
+            else:
+                _save_incremental_state(poetry, env, locked_repository, groups, fast, expansions, incremental_cache)
+        return ops
+    if cache is None:
+        return _resolve(poetry, env, locked_repository, groups, fast, locked_only)
+
+    key = resolution_key(poetry, env, groups, fast)
+    # Lock on the key so concurrent runners sharing the cache solve only once
+    with cache.lock(key):
+        cached = cache.get_json(key)
+        if cached is not None:
+            cached_ops = load_operations(cached, locked_repository)
+            if cached_ops is not None:
+                return cached_ops
+        incremental_ops = None
+        if incremental_cache is not None:
+            incremental_ops = _resolve_incremental(poetry, env, locked_repository, groups, fast, incremental_cache)
+        if incremental_ops is not None:
+            ops = incremental_ops
+        elif incremental_cache is not None:
+            # Record the locked graph of the walk itself, which only falls back to the solver if the walk fails
+            expansions = {}
+            walked = _walk_lock(poetry, env, locked_repository, groups, expansions)
+            ops = walked if walked is not None else _resolve(poetry, env, locked_repository, groups, False, locked_only)
+            _save_incremental_state(
+                poetry,
+                env,
+                locked_repository,
+                groups,
+                fast,
+                expansions if walked is not None else None,
+                incremental_cache,
+            )
+        else:
+            ops = _resolve(poetry, env, locked_repository, groups, fast, locked_only)
+        cache.put_json(key, [dump_package(op.package) for op in ops])
+    return ops
+
+
+def _resolve_incremental(
+    poetry: "CorePoetry",
+    env: Env,
+    locked_repository: Union[Repository, LockedRepository],
+    groups: List[str],
+    fast: bool,
+    incremental_cache: BlixCache,
+) -> Optional[Sequence[Operation]]:
+    """
+    Re-resolves dependencies from the previous resolution with the same pyproject.toml dependencies, groups and
+    environment markers.  The dependencies each locked package contributes to the graph are kept from the previous
+    resolution, except for the packages whose entries in poetry.lock changed, so only the parts of the graph reached
+    through changed packages are re-resolved.  Returns None if there is no previous resolution to start from.
+    """
+    if not isinstance(locked_repository, LockedRepository):
+        return None
+    state_key = resolution_key(poetry, env, groups, fast, with_lock=False)
+    state = incremental_cache.get_json(state_key)
+    if state is None:
+        return None
+
+    fingerprints = locked_repository.fingerprints()
+    previous = state["lock"]
+    changed = {name for name in fingerprints.keys() | previous.keys() if fingerprints.get(name) != previous.get(name)}
+    expansions: Expansions = {
+        node: deps for node, deps in state["expansions"].items() if node_name(node) not in changed
+    }
+    logger.info(f"Re-resolving from the previous resolution, with changed packages in poetry.lock: {sorted(changed)}")
+
+    root = poetry.package.with_dependency_groups(groups=groups, only=True)
+    ops = resolve_locked(
+        root, locked_repository.packages_named, env.marker_env, expansions, locked_repository.locked_marker
+    )
+    if ops is not None:
+        incremental_cache.put_json(state_key, {"lock": fingerprints, "expansions": expansions})
+    return ops
+
+
+def _save_incremental_state(
+    poetry: "CorePoetry",
+    env: Env,
+    locked_repository: Union[Repository, LockedRepository],
+    groups: List[str],
+    fast: bool,
+    expansions: Optional[Expansions],
+    incremental_cache: BlixCache,
+) -> None:
+    """
+    Records the expansions of the walk of the locked dependency graph that resolved the dependencies, for
+    _resolve_incremental.  If they are None, the graph cannot be resolved from the lock alone, and any previous record
+    is dropped.
+    """
+    if not isinstance(locked_repository, LockedRepository):
+        return
+    state_key = resolution_key(poetry, env, groups, fast, with_lock=False)
+    if expansions is None:
+        incremental_cache.delete(state_key)
+        return
+    incremental_cache.put_json(state_key, {"lock": locked_repository.fingerprints(), "expansions": expansions})
+
+
+def _dump_operations(ops: Sequence[Operation]) -> List[Dict[str, Any]]:
+    return sorted((dump_package(op.package) for op in ops), key=lambda p: (p["name"], p["version"]))
+
+
+def dependency_groups(with_groups: Optional[List[str]] = None) -> List[str]:
+    """The groups to resolve: the required default/main groups, plus any other groups requested"""
+    return sorted(set(["default", "main"] + (with_groups if with_groups else [])))
+
+
+def group_set_name(with_groups: List[str]) -> str:
+    """Name of a set of dependency groups, e.g. `main+integ`, used as the dist/ subdirectory of its wheel"""
+    return "+".join(["main"] + sorted(set(with_groups) - {"default", "main"}))
+
+
+def resolve_group_sets(
+    poetry: "CorePoetry",
+    env: Env,
+    locked_repository: Union[Repository, LockedRepository],
+    group_sets: List[List[str]],
+    **resolve_options: Any,
+) -> List[Sequence[Operation]]:
+    """
+    Resolves dependencies for several sets of dependency groups at once, with the same options as
+    resolve_dependencies().
+
+    If fast is set, the closure of every group is computed once from the locked dependency graph, and the dependencies
+    of each set are the union of its groups' closures, see util.resolver.group_closures.  Otherwise, or if the graph
+    cannot be walked from the lock alone, or --full-solve was specified, each set is resolved on its own with
+    resolve_dependencies(), reusing cached and previous resolutions.
+    """
+    sets = [dependency_groups(with_groups) for with_groups in group_sets]
+    if resolve_options.get("fast") and not resolve_options.get("full_solve"):
+        snapshot = snapshot_env(env, resolve_options.get("marker_env"), resolve_options.get("marker_cache"))
+        if resolve_options.get("locked_only"):
+            for groups in sets:
+                _validate_lock_covers_dependencies(poetry, locked_repository, groups)
+        results = resolve_locked_group_sets(
+            poetry.package,
+            sets,
+            locked_packages_lookup(locked_repository),
+            snapshot.marker_env,
+            locked_marker_lookup(locked_repository),
+        )
+        if results is not None:
+            return list(results)
+    return [
+        resolve_dependencies(poetry, env, locked_repository, with_groups, **resolve_options)
+        for with_groups in group_sets
+    ]
+
+
+def _validate_lock_covers_dependencies(
+    poetry: "CorePoetry", locked_repository: Union[Repository, LockedRepository], groups: List[str]
+) -> None:
+    """Fails fast if the lock file is missing, or has no locked package for any of the root dependencies"""
+    lock_path = _lock_path(poetry)
+    if not lock_path.exists():
+        raise RuntimeError(f"--locked-only was specified, but the lock file {lock_path} does not exist")
+
+    root = poetry.package.with_dependency_groups(groups=groups, only=True)
+    find_locked = locked_packages_lookup(locked_repository)
+    missing = [
+        dep.to_pep_508()
+        for dep in root.all_requires
+        if not any(package.satisfies(dep) for package in find_locked(dep.name))
+    ]
+    if missing:
+        raise RuntimeError(
+            f"--locked-only was specified, but {lock_path} does not contain packages satisfying: {missing}.  "
+            f"Run `poetry lock` to update the lock file."
+        )
+
+
+def _walk_lock(
+    poetry: "CorePoetry",
+    env: Env,
+    locked_repository: Union[Repository, LockedRepository],
+    groups: List[str],
+    expansions: Optional[Expansions] = None,
+) -> Optional[Sequence[Operation]]:
+    """Resolves dependencies by walking the locked dependency graph, see util.resolver.resolve_locked"""
+    root = poetry.package.with_dependency_groups(groups=groups, only=True)
+    return resolve_locked(
+        root,
+        locked_packages_lookup(locked_repository),
+        env.marker_env,
+        expansions,
+        locked_marker_lookup(locked_repository),
+    )
+
+
+def _resolve(
+    poetry: "CorePoetry",
+    env: Env,
+    locked_repository: Union[Repository, LockedRepository],
+    groups: List[str],
+    fast: bool,
+    locked_only: bool,
+) -> Sequence[Operation]:
+    if fast:
+        ops = _walk_lock(poetry, env, locked_repository, groups)
+        if ops is not None:
+            return ops
+    if not locked_only:
+        return _solve(poetry, env, locked_repository, groups, locked_only)
+    try:
+        return _solve(poetry, env, locked_repository, groups, locked_only)
+    except SolverProblemError as e:
+        raise RuntimeError(
+            f"--locked-only was specified, but dependencies cannot be resolved from {_lock_path(poetry)} alone.  "
+            f"Run `poetry lock` to update the lock file.\n{e}"
+        ) from e
+
+
+def _solve(
+    poetry: "CorePoetry",
+    env: Env,
+    locked_repository: Union[Repository, LockedRepository],
+    groups: List[str],
+    locked_only: bool = False,
+) -> Sequence[Operation]:
     # Making a new repo containing the packages
     # newly resolved and the ones from the current lock file
     repo = Repository(name="poetry-locked")
@@ -28,24 +451,24 @@ def resolve_dependencies(
         if not package.is_direct_origin() and not repo.has_package(package):
             repo.add_package(package)
 
+    # In locked-only mode the pool only contains the locked repository, so remote sources are never consulted
     base_repositories = None
-    if isinstance(poetry, Poetry):
+    if isinstance(poetry, Poetry) and not locked_only:
         base_repositories = poetry.pool.all_repositories
     pool = RepositoryPool(repositories=base_repositories)
     pool.add_repository(repo)
 
-    # Run through poetry's dependency resolver.  Only uses the default/main `dependencies` in pyproject.toml, not
-    # dev dependencies or other groups.  If we want to support more groups in the wheel file, we can expand on the
-    # CLI with more options.
+    # Run through poetry's dependency resolver.  Uses the default/main `dependencies` in pyproject.toml, plus any
+    # other dependency groups requested via --with-groups.
     # See https://github.com/python-poetry/poetry/blob/master/src/poetry/installation/installer.py#L34 for poetry's
     # usage of this
-    # TODO: Add support for adding more groups
-    groups = set(["default", "main"] + (with_groups if with_groups else []))
-
+    # Unlike the installer, we do not pass the packages installed in the environment: scanning the environment is
+    # expensive, and they only decide whether each resolved package becomes an Install or Update operation.  We only
+    # look at the resolved package of each operation.
     solver = Solver(
         poetry.package.with_dependency_groups(groups=groups, only=True),
         pool,
-        InstalledRepository.load(env).packages,
+        [],
         locked_repository.packages,
         NullIO(),
     )
@@ -65,3 +488,24 @@ def resolve_dependencies(
 def validate_options_mutually_exclusive(option_func: Callable, option1: str, option2: str) -> None:
     if option_func(option1) and option_func(option2):
         raise RuntimeError(f"'{option1}' and '{option2}' options are incompatible")
+
+
+def workers_option(description: str) -> Option:
+    return option(
+        "workers",
+        None,
+        f"{description}  Defaults to 1, use 0 for one per CPU.",
+        flag=False,
+        default="1",
+    )
+
+
+def parse_workers(value: Optional[str]) -> int:
+    """Parses a --workers option, where 0 stands for one worker per CPU"""
+    try:
+        workers = int(value or 1)
+    except ValueError:
+        raise ValueError(f"--workers must be an integer, got [{value}]")
+    if workers < 0:
+        raise ValueError(f"--workers must not be negative, got [{value}]")
+    return workers or os.cpu_count() or 1
@@ -0,0 +1,112 @@
+import os
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Mapping, Optional, Tuple
+
+"""
+Watches the files a wheel is built from for `poetry blixbuild --watch`, by polling their modification times, sizes,
+inodes and modes.  Changes are told apart by what they affect, so that the wheel is only built again as far as needed:
+
+- Changed contents of package sources, data_files or license files only replace those members of the wheel
+- A changed poetry.lock resolves the dependencies again, and only replaces METADATA and the resolution manifest
+- Files added to or removed from the wheel, or whose modes changed, build the whole wheel again with the dependencies
+  resolved before
+- A changed pyproject.toml loads the project again, and builds the whole wheel again
+"""
+
+# Seconds between polls of the watched files
+POLL_INTERVAL = 0.5
+
+
+def _stamp(path: Path) -> Optional[Tuple[int, int, int, int]]:
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return st.st_mtime_ns, st.st_size, st.st_ino, st.st_mode
+
+
+class Snapshot:
+    """Stamps of pyproject.toml, poetry.lock and the sources of a wheel's members, at one point in time"""
+
+    __slots__ = ("project", "lock", "members")
+
+    def __init__(self, project_file: Path, lock_file: Path, member_sources: Mapping[str, Path]) -> None:
+        self.project = _stamp(project_file)
+        self.lock = _stamp(lock_file)
+        # Member name to the path of its source and the source's stamp
+        self.members: Dict[str, Tuple[Path, Optional[Tuple[int, int, int, int]]]] = {
+            name: (path, _stamp(path)) for name, path in member_sources.items()
+        }
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, Snapshot):
+            return NotImplemented
+        return (self.project, self.lock, self.members) == (other.project, other.lock, other.members)
+
+
+class Changes:
+    """What changed between two snapshots of the files a wheel is built from"""
+
+    __slots__ = ("project", "lock", "modified", "rebuild")
+
+    def __init__(self, before: Snapshot, after: Snapshot) -> None:
+        self.project = before.project != after.project
+        self.lock = before.lock != after.lock
+        # Members whose content changed, and their new sources
+        self.modified: Dict[str, Path] = {}
+        # Whether members were added or removed, or changed in some other way than their content
+        self.rebuild = before.members.keys() != after.members.keys()
+        for name, (path, stamp) in after.members.items():
+            previous = before.members.get(name)
+            if previous is None or previous == (path, stamp):
+                continue
+            if stamp is None or previous[1] is None or previous[1][3] != stamp[3]:
+                self.rebuild = True
+            else:
+                self.modified[name] = path
+
+    def __bool__(self) -> bool:
+        return self.project or self.lock or self.rebuild or bool(self.modified)
+
+    def describe(self) -> str:
+        changed: List[str] = []
+        if self.project:
+            changed.append("pyproject.toml")
+        if self.lock:
+            changed.append("poetry.lock")
+        if self.rebuild:
+            changed.append("files added to or removed from the wheel")
+        if self.modified:
+            changed.append(f"{len(self.modified)} modified file(s)")
+        return ", ".join(changed)
+
+
+def wait_for_changes(
+    take_snapshot: Callable[[], Snapshot],
+    snapshot: Snapshot,
+    on_error: Callable[[Exception], None],
+    interval: float = POLL_INTERVAL,
+) -> Snapshot:
+    """
+    Polls the watched files until they differ from a snapshot, and then until they stop changing, so that a change
+    saved over several files is picked up at once.  Returns a snapshot of the changed files.
+
+    Snapshots which fail, e.g. while pyproject.toml is saved half way, are reported to `on_error` once and retried.
+    """
+    failed = False
+    changed: Optional[Snapshot] = None
+    while True:
+        time.sleep(interval)
+        try:
+            current = take_snapshot()
+        except Exception as e:
+            if not failed:
+                on_error(e)
+                failed = True
+            changed = None
+            continue
+        failed = False
+        if changed is not None and current == changed:
+            return current
+        changed = None if current == snapshot else current
@@ -0,0 +1,380 @@
+import csv
+import email.parser
+import hashlib
+import io
+import os
+import struct
+import tempfile
+import time
+import zipfile
+import zlib
+from base64 import urlsafe_b64encode
+from pathlib import Path
+from email.message import Message
+from typing import IO, Dict, List, Mapping, Optional, Tuple, Union
+
+"""
+Helpers to write zip members that are already compressed: members deflated ahead of time, e.g. by several threads, and
+members of an existing wheel copied to a variant of it without decompressing and recompressing them.  Also reads the
+members and metadata of existing wheels with a single pass over their central directory.
+"""
+
+# Files are read and written in chunks of this many bytes
+CHUNK_SIZE = 1024 * 1024
+
+# Compressed members larger than this are spooled to a temporary file instead of held in memory
+SPOOL_SIZE = 8 * 1024 * 1024
+
+# Files at least this large are streamed straight into the wheel instead of compressed ahead of time, which bounds the
+# temporary disk space used by members waiting to be written
+LARGE_FILE_SIZE = 64 * 1024 * 1024
+
+# Earliest timestamp zip files can represent, 1980-01-01
+ZIP_EPOCH = 315532800
+
+# Unix, as the "made by" system of members in reproducible wheels regardless of the platform they are built on
+CREATE_SYSTEM_UNIX = 3
+
+
+def source_date_time() -> Optional[Tuple[int, int, int, int, int, int]]:
+    """
+    Timestamp of wheel members from the SOURCE_DATE_EPOCH environment variable, as specified by
+    https://reproducible-builds.org/specs/source-date-epoch/, or None if it is not set.  Timestamps before 1980 are
+    clamped as zip files cannot represent them.
+    """
+    value = os.environ.get("SOURCE_DATE_EPOCH")
+    if not value:
+        return None
+    try:
+        epoch = int(value)
+    except ValueError:
+        raise ValueError(f"SOURCE_DATE_EPOCH must be an integer number of seconds, got [{value}]")
+    return time.gmtime(max(epoch, ZIP_EPOCH))[:6]  # type: ignore
+
+
+def needs_zip64(file_size: int) -> bool:
+    """
+    Whether a member of this uncompressed size needs Zip64 extensions in its local header.  Same rule as zipfile, as
+    compressed data can be slightly larger than the uncompressed data.
+    """
+    return file_size * 1.05 > zipfile.ZIP64_LIMIT
+
+
+def record_digest(data: bytes) -> str:
+    """Hash of a member in the RECORD format of wheel files"""
+    return "sha256=" + urlsafe_b64encode(hashlib.sha256(data).digest()).decode("ascii").rstrip("=")
+
+
+class CompressedFile:
+    """A file compressed the same way zipfile does, ready to be written to a zip file with write_compressed()"""
+
+    __slots__ = ("data", "compress_type", "crc", "file_size", "compress_size", "hash_digest", "seconds")
+
+    def __init__(
+        self,
+        data: IO[bytes],
+        compress_type: int,
+        crc: int,
+        file_size: int,
+        compress_size: int,
+        hash_digest: str,
+        seconds: float,
+    ) -> None:
+        self.data = data
+        self.compress_type = compress_type
+        self.crc = crc
+        self.file_size = file_size
+        self.compress_size = compress_size
+        # sha256 of the uncompressed content in the RECORD format, without the "sha256=" prefix
+        self.hash_digest = hash_digest
+        # Time it took to read, hash and compress the file
+        self.seconds = seconds
+
+
+def compress_file(
+    path: Path, compress_type: int = zipfile.ZIP_DEFLATED, compress_level: Optional[int] = None
+) -> CompressedFile:
+    """
+    Reads a file in chunks, hashing and deflating (or storing) it in one pass.  zlib and hashlib release the GIL, so
+    several files can be compressed by threads in parallel.
+    """
+    start = time.perf_counter()
+    data = tempfile.SpooledTemporaryFile(max_size=SPOOL_SIZE)
+    # Same compressor as zipfile uses for ZIP_DEFLATED, so the compressed bytes are identical
+    compressor = None
+    if compress_type == zipfile.ZIP_DEFLATED:
+        level = zlib.Z_DEFAULT_COMPRESSION if compress_level is None else compress_level
+        compressor = zlib.compressobj(level, zlib.DEFLATED, -15)
+    elif compress_type != zipfile.ZIP_STORED:
+        raise ValueError(f"Unsupported compression type [{compress_type}]")
+    hashsum = hashlib.sha256()
+    crc = 0
+    file_size = 0
+    with path.open("rb") as src:
+        while True:
+            buf = src.read(CHUNK_SIZE)
+            if not buf:
+                break
+            hashsum.update(buf)
+            crc = zlib.crc32(buf, crc)
+            file_size += len(buf)
+            data.write(compressor.compress(buf) if compressor is not None else buf)
+    if compressor is not None:
+        data.write(compressor.flush())
+    compress_size = data.tell()
+    data.seek(0)
+    hash_digest = urlsafe_b64encode(hashsum.digest()).decode("ascii").rstrip("=")
+    return CompressedFile(data, compress_type, crc, file_size, compress_size, hash_digest, time.perf_counter() - start)
+
+
+def write_compressed(target: zipfile.ZipFile, zinfo: zipfile.ZipInfo, compressed: CompressedFile) -> None:
+    """
+    Writes a compressed file to a zip file as `zinfo`, with the same bytes as `target.open(zinfo, "w")` would produce
+    when zinfo.file_size is set up front.
+    """
+    zinfo.compress_type = compressed.compress_type
+    zinfo.CRC = compressed.crc
+    zinfo.file_size = compressed.file_size
+    zinfo.compress_size = compressed.compress_size
+    zinfo.flag_bits = 0
+    zip64 = needs_zip64(compressed.file_size)
+    if not zip64 and compressed.compress_size > zipfile.ZIP64_LIMIT:
+        raise RuntimeError(f"Compressed size of {zinfo.filename} unexpectedly exceeded ZIP64_LIMIT")
+    _write_member(target, zinfo, compressed.data, zip64)
+    compressed.data.close()
+
+
+def _write_member(target: zipfile.ZipFile, zinfo: zipfile.ZipInfo, data: IO[bytes], zip64: bool) -> None:
+    """
+    Writes the local header of a member whose sizes and CRC are already set, followed by its zinfo.compress_size
+    compressed bytes read from `data` in chunks.
+
+    zipfile has no public API to write data which is already compressed, so this does what ZipFile.open(zinfo, "w")
+    and closing the member do, with these internals of CPython's zipfile, unchanged from 3.9 through 3.13:
+    ZipFile._lock, _writecheck(), _didModify, fp and start_dir, and ZipInfo.FileHeader(zip64).  Members written by it
+    are checked to be byte for byte the same as zipfile's by test_positive_raw_zip_members on the oldest and newest
+    Python the tests run on.
+    """
+    with target._lock:  # type: ignore
+        target._writecheck(zinfo)  # type: ignore
+        target._didModify = True  # type: ignore
+        assert target.fp is not None, "Target zip file is closed"
+        target.fp.seek(target.start_dir)  # type: ignore
+        zinfo.header_offset = target.fp.tell()
+        target.fp.write(zinfo.FileHeader(zip64))
+        remaining = zinfo.compress_size
+        while remaining:
+            buf = data.read(min(remaining, CHUNK_SIZE))
+            if not buf:
+                raise zipfile.BadZipFile(f"Truncated data for {zinfo.filename}")
+            target.fp.write(buf)
+            remaining -= len(buf)
+        target.filelist.append(zinfo)
+        target.NameToInfo[zinfo.filename] = zinfo
+        target.start_dir = target.fp.tell()  # type: ignore
+
+
+def copy_member_raw(source: zipfile.ZipFile, info: zipfile.ZipInfo, target: zipfile.ZipFile) -> None:
+    """
+    Copies a member's compressed bytes from one zip file to another as-is.  Skips the member's local header of the
+    source with zipfile's structFileHeader, sizeFileHeader, stringFileHeader and _FH_* constants, and reads from the
+    source's fp, which are internals of CPython's zipfile like those _write_member() uses.
+    """
+    fp = source.fp
+    assert fp is not None, "Source zip file is closed"
+    fp.seek(info.header_offset)
+    header = struct.unpack(zipfile.structFileHeader, fp.read(zipfile.sizeFileHeader))  # type: ignore
+    if header[zipfile._FH_SIGNATURE] != zipfile.stringFileHeader:  # type: ignore
+        raise zipfile.BadZipFile(f"Bad local file header for {info.filename}")
+    fp.seek(header[zipfile._FH_FILENAME_LENGTH] + header[zipfile._FH_EXTRA_FIELD_LENGTH], 1)  # type: ignore
+
+    zinfo = zipfile.ZipInfo(info.filename, info.date_time)
+    zinfo.compress_type = info.compress_type
+    zinfo.create_system = info.create_system
+    zinfo.external_attr = info.external_attr
+    zinfo.CRC = info.CRC
+    zinfo.compress_size = info.compress_size
+    zinfo.file_size = info.file_size
+    # Sizes are known up front, so no data descriptor follows the member
+    zinfo.flag_bits = info.flag_bits & ~0x08
+
+    zip64 = zinfo.file_size > zipfile.ZIP64_LIMIT or zinfo.compress_size > zipfile.ZIP64_LIMIT
+    # Streams the member from the source, which must be another file than the target
+    _write_member(target, zinfo, fp, zip64)
+
+
+def write_file(target: zipfile.ZipFile, zinfo: zipfile.ZipInfo, path: Path) -> Tuple[str, int]:
+    """
+    Writes a file to a zip file as `zinfo`, compressed as zinfo.compress_type.  The file is read once in chunks while
+    hashing and compressing it, so it is never held in memory.  zinfo.file_size must be set up front, as it decides
+    whether the member needs Zip64 extensions.  Returns the file's hash in the RECORD format, without the "sha256="
+    prefix, and its size.
+    """
+    hashsum = hashlib.sha256()
+    size = 0
+    with path.open("rb") as src, target.open(zinfo, mode="w", force_zip64=needs_zip64(zinfo.file_size)) as dest:
+        while True:
+            buf = src.read(CHUNK_SIZE)
+            if not buf:
+                break
+            hashsum.update(buf)
+            dest.write(buf)
+            size += len(buf)
+    return urlsafe_b64encode(hashsum.digest()).decode("ascii").rstrip("="), size
+
+
+# New content of a wheel member: the bytes, or a file which is streamed into the wheel
+Replacement = Union[bytes, Path]
+
+
+def rewrite_wheel(source_path: Path, target_path: Path, replacements: Mapping[str, Optional[Replacement]]) -> None:
+    """
+    Writes a copy of a wheel with the content of some members replaced, and its RECORD updated to match.  Replaced
+    members keep their compression method, replacements of members the wheel does not have are deflated and added next
+    to RECORD, and members replaced by None are removed.  All other members are copied without recompressing them.
+    """
+    with zipfile.ZipFile(source_path) as source, zipfile.ZipFile(
+        target_path, mode="w", compression=zipfile.ZIP_DEFLATED
+    ) as target:
+        record_info = next(info for info in source.infolist() if info.filename.endswith(".dist-info/RECORD"))
+        added = [name for name, data in replacements.items() if data is not None and name not in source.NameToInfo]
+        # RECORD rows of the replaced members, as written
+        rows: Dict[str, List[str]] = {}
+        for info in source.infolist():
+            if info.filename == record_info.filename:
+                continue
+            if info.filename in replacements:
+                _write_replacement(target, info, replacements[info.filename], rows)
+            else:
+                copy_member_raw(source, info, target)
+        for name in added:
+            info = zipfile.ZipInfo(name, record_info.date_time)
+            info.create_system = record_info.create_system
+            info.external_attr = (0o644 & 0xFFFF) << 16  # Unix attributes
+            info.compress_type = zipfile.ZIP_DEFLATED
+            _write_replacement(target, info, replacements[name], rows)
+
+        record = io.StringIO()
+        writer = csv.writer(record, delimiter=csv.excel.delimiter, quotechar=csv.excel.quotechar, lineterminator="\n")
+        for row in csv.reader(io.StringIO(source.read(record_info).decode("utf-8"))):
+            if row and row[0] == record_info.filename:
+                # RECORD lists itself last
+                for name in added:
+                    writer.writerow(rows[name])
+            elif row and row[0] in replacements:
+                if replacements[row[0]] is None:
+                    continue
+                row = rows[row[0]]
+            writer.writerow(row)
+        _write_replacement(target, record_info, record.getvalue().encode("utf-8"), {})
+
+
+def _write_replacement(
+    target: zipfile.ZipFile, info: zipfile.ZipInfo, data: Optional[Replacement], rows: Dict[str, List[str]]
+) -> None:
+    """Writes the new content of a member, and adds its RECORD row to `rows`"""
+    if data is None:
+        return
+    zinfo = zipfile.ZipInfo(info.filename, info.date_time)
+    zinfo.create_system = info.create_system
+    zinfo.external_attr = info.external_attr
+    if isinstance(data, Path):
+        zinfo.compress_type = info.compress_type
+        zinfo.file_size = data.stat().st_size
+        hash_digest, size = write_file(target, zinfo, data)
+        rows[info.filename] = [info.filename, f"sha256={hash_digest}", str(size)]
+    else:
+        target.writestr(zinfo, data, compress_type=info.compress_type)
+        rows[info.filename] = [info.filename, record_digest(data), str(len(data))]
+
+
+def replace_requires_dist(metadata: str, requires_dist: List[str]) -> str:
+    """
+    Replaces the Requires-Dist fields of a METADATA file, keeping all other fields and the description as they are.
+    The new fields take the place of the first Requires-Dist field, or follow the fields they come after in METADATA
+    written by Poetry.
+    """
+    header, separator, body = metadata.partition("\n\n")
+    lines = header.split("\n")
+    fields = [f"Requires-Dist: {requirement}" for requirement in requires_dist]
+    existing = [i for i, line in enumerate(lines) if line.startswith("Requires-Dist:")]
+    if existing:
+        position = existing[0]
+    else:
+        preceding = [
+            i for i, line in enumerate(lines) if line.startswith(("Requires-Python:", "Classifier:", "Provides-Extra:"))
+        ]
+        position = preceding[-1] + 1 if preceding else len(lines) - (lines[-1] == "")
+    kept = [line for i, line in enumerate(lines) if i not in existing]
+    kept[position:position] = fields
+    return "\n".join(kept) + separator + body
+
+
+class WheelReader:
+    """
+    Reads a wheel's central directory once, and looks its members up by name.  The wheel stays open until the reader
+    is closed, and the members of its .dist-info folder, such as METADATA, are read at most once.
+    """
+
+    def __init__(self, path: Union[str, Path]) -> None:
+        self.path = Path(path)
+        self._zip = zipfile.ZipFile(path)
+        self._read: Dict[str, bytes] = {}
+        self._metadata: Optional[Message] = None
+        try:
+            # Member name to its info, in the order of the central directory
+            self.members: Dict[str, zipfile.ZipInfo] = self._zip.NameToInfo
+            dist_infos = [
+                name[: -len("/RECORD")]
+                for name in self.members
+                if name.endswith(".dist-info/RECORD") and name.count("/") == 1
+            ]
+            if len(dist_infos) != 1:
+                raise ValueError(f"Wheel at [{path}] must have exactly one .dist-info folder, found {dist_infos}")
+        except BaseException:
+            self._zip.close()
+            raise
+        # e.g. "blixexample-0.1.0.dist-info"
+        self.dist_info = dist_infos[0]
+        # e.g. "blixexample-0.1.0.data", the folder of the wheel's data_files, scripts and headers
+        self.data_dir = self.dist_info[: -len(".dist-info")] + ".data"
+
+    def __enter__(self) -> "WheelReader":
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self._zip.close()
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.members
+
+    def read(self, name: str) -> bytes:
+        """Content of a member, kept for further reads if it is in the .dist-info folder"""
+        data = self._read.get(name)
+        if data is None:
+            data = self._zip.read(self.members[name])
+            if name.startswith(f"{self.dist_info}/"):
+                self._read[name] = data
+        return data
+
+    def read_dist_info(self, name: str) -> Optional[bytes]:
+        """Content of a file in the .dist-info folder, or None if the wheel does not have it"""
+        member = f"{self.dist_info}/{name}"
+        return self.read(member) if member in self.members else None
+
+    @property
+    def metadata(self) -> Message:
+        """Fields of METADATA"""
+        if self._metadata is None:
+            content = self.read_dist_info("METADATA")
+            if content is None:
+                raise ValueError(f"Wheel at [{self.path}] has no {self.dist_info}/METADATA")
+            self._metadata = email.parser.HeaderParser().parsestr(content.decode("utf-8"))
+        return self._metadata
+
+    @property
+    def requires_dist(self) -> List[str]:
+        return self.metadata.get_all("Requires-Dist") or []
@@ -0,0 +1,221 @@
+import contextlib
+import glob
+import io
+import logging
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Set, Tuple
+
+from poeblix.util.lock import parse_toml
+
+"""
+Builds the wheels of many Poetry projects, e.g. of a monorepo, in one run.  Projects are built in dependency order of
+their path dependencies on each other, by a pool of worker processes which each run `poetry blixbuild` in-process for
+one project after another.  Startup of Poetry and the plugin is paid once per worker instead of once per project, and
+state shared between projects, like identical lock files and environment markers, is only parsed once per worker.
+"""
+
+
+class ProjectResult:
+    """Outcome of building one project of a workspace"""
+
+    __slots__ = ("project", "status", "seconds", "output")
+
+    # Statuses of a project
+    BUILT = "built"
+    FAILED = "failed"
+    SKIPPED = "skipped"
+
+    def __init__(self, project: Path, status: str, seconds: float = 0.0, output: str = "") -> None:
+        self.project = project
+        self.status = status
+        self.seconds = seconds
+        self.output = output
+
+
+def find_projects(base_dir: Path, patterns: Sequence[str]) -> List[Path]:
+    """
+    Resolved directories of the projects matching a list of project directories or glob patterns, relative to
+    base_dir.  Glob patterns skip directories without a pyproject.toml.
+    """
+    projects: Dict[Path, None] = {}
+    for pattern in patterns:
+        if glob.has_magic(pattern):
+            matches = sorted(glob.glob(str(base_dir / pattern), recursive=True))
+            found = [Path(match).resolve() for match in matches if (Path(match) / "pyproject.toml").is_file()]
+            if not found:
+                raise ValueError(f"Glob [{pattern}] does not match any project directories with a pyproject.toml")
+            projects.update(dict.fromkeys(found))
+        else:
+            project = (base_dir / pattern).resolve()
+            if not (project / "pyproject.toml").is_file():
+                raise ValueError(f"Project directory [{project}] does not have a pyproject.toml")
+            projects[project] = None
+    return list(projects)
+
+
+def _dependency_tables(poetry_config: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+    yield poetry_config.get("dependencies", {})
+    yield poetry_config.get("dev-dependencies", {})
+    for group in poetry_config.get("group", {}).values():
+        yield group.get("dependencies", {})
+
+
+def path_dependencies(project: Path) -> Set[Path]:
+    """Resolved directories of the path dependencies of a project, in all of its dependency groups"""
+    pyproject = parse_toml((project / "pyproject.toml").read_bytes())
+    paths = set()
+    for dependencies in _dependency_tables(pyproject.get("tool", {}).get("poetry", {})):
+        for constraint in dependencies.values():
+            for c in constraint if isinstance(constraint, list) else [constraint]:
+                if isinstance(c, dict) and "path" in c:
+                    paths.add((project / c["path"]).resolve())
+    return paths
+
+
+def dependency_graph(projects: Sequence[Path]) -> Dict[Path, Set[Path]]:
+    """Maps each project to the projects of the workspace it has path dependencies on"""
+    in_workspace = set(projects)
+    return {project: path_dependencies(project) & in_workspace for project in projects}
+
+
+def build_order(graph: Dict[Path, Set[Path]]) -> List[Path]:
+    """
+    Projects ordered so that each comes after the projects it depends on.  Raises if they depend on each other in a
+    cycle.
+    """
+    remaining = {project: len(dependencies) for project, dependencies in graph.items()}
+    dependents = _dependents(graph)
+    order = [project for project, count in remaining.items() if count == 0]
+    for project in order:
+        for dependent in dependents[project]:
+            remaining[dependent] -= 1
+            if remaining[dependent] == 0:
+                order.append(dependent)
+    if len(order) < len(graph):
+        cycle = [str(project) for project, count in remaining.items() if count > 0]
+        raise ValueError(f"Path dependencies between these projects form a cycle: {cycle}")
+    return order
+
+
+def _dependents(graph: Dict[Path, Set[Path]]) -> Dict[Path, List[Path]]:
+    dependents: Dict[Path, List[Path]] = {project: [] for project in graph}
+    for project, dependencies in graph.items():
+        for dependency in sorted(dependencies):
+            dependents[dependency].append(project)
+    return dependents
+
+
+def run_command(application: Any, cwd: str, argv: List[str]) -> Tuple[int, str]:
+    """
+    Runs a Poetry command in a directory with a Poetry console Application, in the current process.  Returns its exit
+    code and output, including what the command prints.  The application may be reused to run further commands.
+    """
+    from cleo.io.inputs.argv_input import ArgvInput
+    from cleo.io.outputs.buffered_output import BufferedOutput
+
+    output = BufferedOutput()
+    printed = io.StringIO()
+    previous_cwd = os.getcwd()
+    try:
+        # Poetry finds the project from the working directory, which belongs to this worker process alone
+        os.chdir(cwd)
+        # Poetry only sets up logging to the command's output if no handlers are set up yet, e.g. by a previous project
+        # or inherited from the parent process
+        for handler in logging.root.handlers[:]:
+            logging.root.removeHandler(handler)
+        with contextlib.redirect_stdout(printed):
+            exit_code = application.run(ArgvInput(["poetry", *argv]), output, output)
+    except Exception as e:
+        exit_code = 1
+        output.write_line(f"{type(e).__name__}: {e}")
+    finally:
+        os.chdir(previous_cwd)
+    return exit_code, printed.getvalue() + output.fetch()
+
+
+def new_application() -> Any:
+    """A Poetry console Application to run commands with run_command"""
+    from poetry.console.application import Application
+
+    application = Application()
+    application.auto_exits(False)
+    return application
+
+
+def build_project(project: str, args: List[str]) -> ProjectResult:
+    """Runs `poetry blixbuild` with the given arguments for one project, in the current process"""
+    start = time.perf_counter()
+    exit_code, output = run_command(new_application(), project, ["blixbuild", *args])
+    status = ProjectResult.BUILT if exit_code == 0 else ProjectResult.FAILED
+    return ProjectResult(Path(project), status, time.perf_counter() - start, output)
+
+
+def build_workspace(
+    projects: Sequence[Path],
+    args: List[str],
+    workers: int,
+    on_result: Callable[[ProjectResult], None],
+) -> List[ProjectResult]:
+    """
+    Builds all projects with `poetry blixbuild <args>` on a pool of worker processes.  A project is only built once
+    the projects it has path dependencies on are built, and skipped if any of them failed.  Results are passed to
+    `on_result` as projects finish, and returned in the order of the projects.
+    """
+    graph = dependency_graph(projects)
+    order = build_order(graph)
+    dependents = _dependents(graph)
+    remaining = {project: len(dependencies) for project, dependencies in graph.items()}
+    results: Dict[Path, ProjectResult] = {}
+
+    def skip(project: Path, reason: Path) -> None:
+        if project in results:
+            return
+        results[project] = ProjectResult(project, ProjectResult.SKIPPED, output=f"Path dependency {reason} failed")
+        on_result(results[project])
+        for dependent in dependents[project]:
+            skip(dependent, reason)
+
+    with ProcessPoolExecutor(max_workers=min(workers, len(projects)) or 1) as executor:
+        running: Dict[Future, Path] = {}
+
+        def submit_ready(candidates: Sequence[Path]) -> None:
+            for project in candidates:
+                if remaining[project] == 0 and project not in results:
+                    running[executor.submit(build_project, str(project), args)] = project
+
+        submit_ready(order)
+        while running:
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                project = running.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    # The worker process itself failed, e.g. it was killed
+                    result = ProjectResult(project, ProjectResult.FAILED, output=f"{type(e).__name__}: {e}")
+                results[project] = result
+                on_result(result)
+                for dependent in dependents[project]:
+                    if result.status == ProjectResult.BUILT:
+                        remaining[dependent] -= 1
+                    else:
+                        skip(dependent, project)
+                submit_ready(dependents[project])
+    return [results[project] for project in projects]
+
+
+def failure_report(results: Sequence[ProjectResult], tail: Optional[int] = 20) -> str:
+    """Combined report of the projects which failed or were skipped, with the last lines of output of failed builds"""
+    sections = []
+    for result in results:
+        if result.status == ProjectResult.FAILED:
+            lines = result.output.rstrip().splitlines()
+            if tail is not None:
+                lines = lines[-tail:]
+            sections.append(f"{result.project} failed after {result.seconds:.2f}s:\n" + "\n".join(lines))
+        elif result.status == ProjectResult.SKIPPED:
+            sections.append(f"{result.project} skipped: {result.output}")
+    return "\n\n".join(sections)
@@ -10,6 +10,7 @@ from poetry.console.commands.env_command import EnvCommand
 from poetry.core.packages.package import Package
 
 from poeblix.util import util
+from poeblix.util.lock import load_locked_repository
 
 
 class ValidateDockerPlugin(EnvCommand):
@@ -41,9 +42,10 @@ class ValidateDockerPlugin(EnvCommand):
             flag=False,
             multiple=True,
         ),
+        *util.resolve_options(),
     ]
 
-    loggers = ["poetry.core.masonry.builders.wheel"]
+    loggers = ["poetry.core.masonry.builders.wheel", "poeblix"]
 
     def _validate_pyproject_toml(self, docker_deps: dict):
         cid = self.argument("containerId")
@@ -70,8 +72,10 @@ class ValidateDockerPlugin(EnvCommand):
             with_groups.extend(group.split(","))
 
         cid = self.argument("containerId")
-        locked_repo = self.poetry.locker.locked_repository()
-        ops = util.resolve_dependencies(self.poetry, self.env, locked_repo, with_groups)
+        locked_repo = load_locked_repository(self.poetry.locker)
+        resolve_options = util.get_resolve_options(self.poetry, self.option)
+        ops = util.resolve_dependencies(self.poetry, self.env, locked_repo, with_groups, **resolve_options)
+        util.report_cache(self.line, resolve_options)
         for op in ops:
             dependency_package = op.package
             name = dependency_package.pretty_name
@@ -1,76 +1,53 @@
-import re
 from pathlib import Path
-from typing import List, Dict, ClassVar
-from zipfile import ZipFile
+from typing import List, Dict, ClassVar, Tuple, Optional, Any, Sequence, Callable
 
-import pkginfo
 from cleo.helpers import argument, option
 from cleo.io.inputs.option import Option
 from cleo.io.outputs.output import Verbosity
 
 # For fixing https://github.com/python-poetry/poetry/issues/5216
 from packaging.tags import sys_tags  # noqa
+from packaging.requirements import InvalidRequirement, Requirement
 from poetry.console.commands.env_command import EnvCommand
+from poetry.installation.operations.operation import Operation
+from poetry.poetry import Poetry
+from poetry.utils.env import Env
 
 try:
     from poetry.core.version.helpers import parse_constraint
 except ImportError:
     from poetry.core.semver.helpers import parse_constraint  # type: ignore
 
-# e.g. "nemoize (>=0.1.0,<0.2.0)"
 from tomlkit.exceptions import NonExistentKey
 
-from poeblix.util import util
+from poeblix.util import datafiles, manifest, targets, util
+from poeblix.util.lock import load_locked_repository
+from poeblix.util.markers import snapshot_env
+from poeblix.util.wheel import WheelReader
 
-package_regex = r"(.*) \((.*)\)"
 
-
-class ValidateWheelPlugin(EnvCommand):
+class WheelValidator:
     """
-    Validates a wheel file contains Requires Dist as specified in pyproject.toml and poetry.lock files in the project
-    this command is run.
+    Validates a wheel against the project like `poetry blixvalidatewheel`, for the command and for poeblix.api.
+    Options are read with `option`, named like the command's options, and progress is written with `line`.
     """
 
-    name = "blixvalidatewheel"
-    description = (
-        "Validates a wheel file contains Requires Dist that satisfies constraints in pyproject.toml and poetry.lock "
-        "files in the project this command is ran.  This by default validates in both directions, as in "
-        "it validates the wheel file's Requires Dist is specified in the project and vice versa."
-    )
-
-    arguments = [argument("wheelPath", "Wheel file path")]
+    def __init__(self, poetry: Poetry, env: Env, option: Callable[[str], Any], line: Callable[..., None]) -> None:
+        self.poetry = poetry
+        self.env = env
+        self.option = option
+        self.line = line
 
-    # TODO: Add groups to options
-    options: ClassVar[List[Option]] = [
-        option(
-            "no-lock",
-            None,
-            "Disables validating lock file dependencies.",
-        ),
-        option(
-            "with-groups",
-            None,
-            "Specify which dependency groups to use to validate the wheel file, on top of required groups from "
-            "pyproject.toml.  Can be specified multiple times or as a comma delimited list.",
-            flag=False,
-            multiple=True,
-        ),
-    ]
-
-    loggers = ["poetry.core.masonry.builders.wheel"]
-
-    def _validate_data_files(self, path):
+    def _validate_data_files(self, wheel: WheelReader):
         """
         Validates wheel archive contains data_files as specified in pyproject.toml, if exists.
         """
+        path = wheel.path
         self.line("Validating data_files in wheel file contain those specified in pyproject.toml")
-        # Get files in wheel
-        wheel = pkginfo.Wheel(path)
-        wheel_files = ZipFile(path).namelist()
-        self.line(f"Wheel files: {wheel_files}", verbosity=Verbosity.DEBUG)
-        data_file_prefix = f"{wheel.name}-{wheel.version}.data/data/"
+        self.line(f"Wheel files: {list(wheel.members)}", verbosity=Verbosity.DEBUG)
+        data_file_prefix = f"{wheel.data_dir}/data/"
 
-        wheel_data_files = [fname for fname in wheel_files if data_file_prefix in fname]
+        wheel_data_files = [fname for fname in wheel.members if fname.startswith(data_file_prefix)]
         self.line(f"Wheel data files: {wheel_data_files}", verbosity=Verbosity.DEBUG)
 
         try:
@@ -78,24 +55,17 @@ class ValidateWheelPlugin(EnvCommand):
             if "data_files" in data_files_config:
                 data_files = data_files_config["data_files"]
 
-                for data_file in list(data_files):
-                    destination = data_file["destination"]
-                    sources = data_file["from"]
-
-                    # TODO: Use OS specific separator
-                    if destination[-1] != "/":
-                        destination += "/"
+                project_dir = self.poetry.file.path.parent  # type: ignore
+                # Data directories and globs can expand to many files, so look them up by name
+                unmatched = dict.fromkeys(wheel_data_files)
+                for target in datafiles.expand_data_files(project_dir, list(data_files), require_files=False):
+                    data_file_path = data_file_prefix + target
 
-                    for src in sources:
-                        filename = src.rsplit("/", 1)[1]
-                        data_file_path = data_file_prefix + destination + filename
-
-                        if data_file_path not in wheel_data_files:
-                            raise RuntimeError(
-                                f"Wheel at [{path}] does not contain expected data_file [{data_file_path}]"
-                            )
-                        else:
-                            wheel_data_files.remove(data_file_path)
+                    if data_file_path not in unmatched:
+                        raise RuntimeError(f"Wheel at [{path}] does not contain expected data_file [{data_file_path}]")
+                    else:
+                        del unmatched[data_file_path]
+                wheel_data_files = list(unmatched)
         except NonExistentKey:
             self.line(f"[tool.blix.data] section not found in {self.poetry.file}")
         # If any wheel data files leftover, raise error
@@ -129,8 +99,18 @@ class ValidateWheelPlugin(EnvCommand):
                 f"Packages in pyproject.toml are not present in the Wheel file: {list(leftover_pyproject_packages)}"
             )
 
-    def _validate_poetry_lock(self, requires_dist: Dict[str, str], leftover_wheel_packages: set):
-        """Validates that dependencies in poetry.lock are exactly reflected in the wheel file's requires_dist"""
+    def _validate_poetry_lock(
+        self,
+        requires_dist: Dict[str, str],
+        leftover_wheel_packages: set,
+        requires_dist_entries: List[Tuple[str, str, str]],
+        wheel_manifest: Optional[Dict[str, Any]] = None,
+    ):
+        """
+        Validates that dependencies in poetry.lock are exactly reflected in the wheel file's requires_dist.  If the
+        wheel has a resolution manifest from the same poetry.lock, pyproject.toml, groups and environment markers, its
+        resolved dependencies are used instead of resolving the lock file again.
+        """
         if self.option("no-lock"):
             self.line("Skipping poetry.lock validation as --no-lock was specified")
             return
@@ -140,8 +120,32 @@ class ValidateWheelPlugin(EnvCommand):
             with_groups.extend(group.split(","))
 
         self.line("Validating against poetry.lock...")
-        locked_repo = self.poetry.locker.locked_repository()
-        ops = util.resolve_dependencies(self.poetry, self.env, locked_repo, with_groups)
+        locked_repo = load_locked_repository(self.poetry.locker)
+        resolve_options = util.get_resolve_options(self.poetry, self.option)
+        loaded = targets.load_targets(self.option("target-env"))
+        resolved: Optional[Sequence[Sequence[Operation]]] = None
+        if wheel_manifest is not None:
+            marker_envs = [marker_env for _, marker_env in loaded] or [
+                snapshot_env(self.env, resolve_options["marker_env"], resolve_options["marker_cache"]).marker_env
+            ]
+            resolved = manifest.manifest_resolution(wheel_manifest, self.poetry, with_groups, marker_envs, locked_repo)
+            if resolved is not None:
+                self.line("Using the wheel's resolution manifest, as the project is unchanged since it was built")
+            else:
+                self.line("Resolution manifest of the wheel does not match the project, resolving dependencies")
+        if loaded:
+            if resolved is None:
+                resolved = targets.resolve_targets(
+                    self.poetry, self.env, locked_repo, with_groups, [env for _, env in loaded], **resolve_options
+                )
+            util.report_cache(self.line, resolve_options)
+            self._validate_targets(requires_dist_entries, leftover_wheel_packages, loaded, resolved)
+            return
+        if resolved is None:
+            ops = util.resolve_dependencies(self.poetry, self.env, locked_repo, with_groups, **resolve_options)
+        else:
+            ops = resolved[0]
+        util.report_cache(self.line, resolve_options)
         leftover_lock_packages = set([p.package.pretty_name for p in ops])
         for op in ops:
             dependency_package = op.package
@@ -162,33 +166,120 @@ class ValidateWheelPlugin(EnvCommand):
                 f"Packages in poetry.lock are not present in the Wheel file: {sorted(list(leftover_lock_packages))}"
             )
 
-    def handle(self) -> int:
-        path = self.argument("wheelPath")
+    def _validate_targets(
+        self,
+        requires_dist_entries: List[Tuple[str, str, str]],
+        leftover_wheel_packages: set,
+        loaded: List[Tuple[str, Dict[str, Any]]],
+        resolved: Sequence[Sequence[Operation]],
+    ):
+        """
+        Validates that the wheel file's requires_dist install the locked dependencies of each target environment,
+        taking their environment markers into account
+        """
+        for (target, marker_env), ops in zip(loaded, resolved):
+            self.line(f"Validating target environment [{target}] with {len(ops)} locked dependencies")
+            for op in ops:
+                dependency_package = op.package
+                name = dependency_package.pretty_name.lower()
+                applicable = [
+                    parse_constraint(constraint)
+                    for entry_name, constraint, marker in requires_dist_entries
+                    if entry_name == name and targets.marker_applies(marker, marker_env)
+                ]
+                if not applicable:
+                    raise RuntimeError(
+                        f"Package in poetry.lock is not present in the Wheel file for target [{target}]: {name}"
+                    )
+                if not any(wheel_version.allows(dependency_package.version) for wheel_version in applicable):
+                    raise RuntimeError(
+                        f"Wheel file has different version constraints for Package(name={name}, "
+                        f"version={applicable}) compared to poetry.lock Package(name={name}, "
+                        f"version={dependency_package.version}) for target [{target}]"
+                    )
+                leftover_wheel_packages.discard(name)
+
+    def validate(self, path: str) -> None:
+        """Validates a wheel, raising a RuntimeError describing the first mismatch with the project"""
+        util.validate_options_mutually_exclusive(self.option, "target-env", "marker-env")
         if not Path(path).is_file():
             raise ValueError(f"Path [{path}] does not point to a valid file")
         self.line(f"Validating Requires Dist for wheel [{path}] against pyproject.toml/poetry.lock")
-        metadata = pkginfo.get_metadata(path)
-        assert metadata is not None, f"Could not get metadata at path [{path}]"
-        self.line(f"Wheel Requires Dist: {metadata.requires_dist}", verbosity=Verbosity.DEBUG)
-        packages = {}
-        for package in metadata.requires_dist:
-            parsed = re.search(package_regex, package)
-            if not parsed:
-                raise ValueError(f"Could not parse Requires Dist package [{package}].  Please submit an Issue!")
-            packages[parsed.group(1)] = parsed.group(2)
-        self.line(f"Parsed Requires Dist: {packages}", verbosity=Verbosity.DEBUG)
-        # Case insensitive checking: https://github.com/spoorn/poeblix/issues/11
-        packages_lower = {key.lower(): val for key, val in packages.items()}
-        # Keep track of wheel files we've scanned over to validate wheel does not contain extra dependencies not
-        # specified in the project
-        leftover_wheel_packages = set(packages_lower.keys())
-        self._validate_pyproject_toml(packages_lower, leftover_wheel_packages)
-        self._validate_poetry_lock(packages_lower, leftover_wheel_packages)
-        if leftover_wheel_packages:
-            raise RuntimeError(
-                f"Packages in Wheel file are not present in pyproject.toml/poetry.lock: {list(leftover_wheel_packages)}"
-            )
-        self._validate_data_files(path)
+        # Every step reads the wheel through the same reader, which reads its central directory once
+        with WheelReader(path) as wheel:
+            self.line(f"Wheel Requires Dist: {wheel.requires_dist}", verbosity=Verbosity.DEBUG)
+            packages = {}
+            requires_dist_entries = []
+            for package in wheel.requires_dist:
+                try:
+                    requirement = Requirement(package)
+                except InvalidRequirement:
+                    raise ValueError(f"Could not parse Requires Dist package [{package}].  Please submit an Issue!")
+                constraint = str(requirement.specifier) or "*"
+                packages[requirement.name] = constraint
+                # Environment markers are only compared when validating for target environments
+                marker = str(requirement.marker) if requirement.marker is not None else ""
+                requires_dist_entries.append((requirement.name.lower(), constraint, marker))
+            self.line(f"Parsed Requires Dist: {packages}", verbosity=Verbosity.DEBUG)
+            # Case insensitive checking: https://github.com/spoorn/poeblix/issues/11
+            packages_lower = {key.lower(): val for key, val in packages.items()}
+            # Keep track of wheel files we've scanned over to validate wheel does not contain extra dependencies not
+            # specified in the project
+            leftover_wheel_packages = set(packages_lower.keys())
+            self._validate_pyproject_toml(packages_lower, leftover_wheel_packages)
+            wheel_manifest = None if self.option("ignore-manifest") else manifest.read_manifest(wheel)
+            self._validate_poetry_lock(packages_lower, leftover_wheel_packages, requires_dist_entries, wheel_manifest)
+            if leftover_wheel_packages:
+                raise RuntimeError(
+                    "Packages in Wheel file are not present in pyproject.toml/poetry.lock: "
+                    f"{list(leftover_wheel_packages)}"
+                )
+            self._validate_data_files(wheel)
         self.line("Validation succeeded!")
 
+
+class ValidateWheelPlugin(EnvCommand):
+    """
+    Validates a wheel file contains Requires Dist as specified in pyproject.toml and poetry.lock files in the project
+    this command is run.
+    """
+
+    name = "blixvalidatewheel"
+    description = (
+        "Validates a wheel file contains Requires Dist that satisfies constraints in pyproject.toml and poetry.lock "
+        "files in the project this command is ran.  This by default validates in both directions, as in "
+        "it validates the wheel file's Requires Dist is specified in the project and vice versa."
+    )
+
+    arguments = [argument("wheelPath", "Wheel file path")]
+
+    # TODO: Add groups to options
+    options: ClassVar[List[Option]] = [
+        option(
+            "no-lock",
+            None,
+            "Disables validating lock file dependencies.",
+        ),
+        option(
+            "with-groups",
+            None,
+            "Specify which dependency groups to use to validate the wheel file, on top of required groups from "
+            "pyproject.toml.  Can be specified multiple times or as a comma delimited list.",
+            flag=False,
+            multiple=True,
+        ),
+        targets.target_env_option(),
+        option(
+            "ignore-manifest",
+            None,
+            "Always resolves dependencies from poetry.lock, even if the wheel's resolution manifest shows the project "
+            "is unchanged since the wheel was built.",
+        ),
+        *util.resolve_options(),
+    ]
+
+    loggers = ["poetry.core.masonry.builders.wheel", "poeblix"]
+
+    def handle(self) -> int:
+        WheelValidator(self.poetry, self.env, self.option, self.line).validate(self.argument("wheelPath"))
         return 0
@@ -0,0 +1,118 @@
+import os
+import time
+from pathlib import Path
+from typing import List, ClassVar
+
+from cleo.helpers import argument, option
+from cleo.io.inputs.option import Option
+from cleo.io.outputs.output import Verbosity
+
+# For fixing https://github.com/python-poetry/poetry/issues/5216
+from packaging.tags import sys_tags  # noqa
+from poetry.console.commands.command import Command
+
+from poeblix.util import util, workspace
+from poeblix.util.workspace import ProjectResult
+
+# Flags of `blixbuild` passed on to the build of each project
+BUILD_FLAGS = (
+    "no-lock",
+    "only-lock",
+    "force",
+    "reproducible",
+    "no-resolution-cache",
+    "fast-resolve",
+    "locked-only",
+    "full-solve",
+)
+
+# Paths passed on to the build of each project, which runs in the project's directory
+BUILD_PATHS = ("cache-dir", "marker-env")
+
+
+class WorkspacePlugin(Command):
+    """
+    Builds the wheels of many projects, e.g. of a monorepo, with `poetry blixbuild` in one run.  Unlike the other blix
+    commands, it does not need to be run in a project.
+    """
+
+    name = "blixworkspace"
+    description = (
+        "Builds the wheels of several projects with `poetry blixbuild` in parallel processes, in dependency order of "
+        "their path dependencies on each other, and reports the build time of each project and all failures at once."
+    )
+
+    arguments = [
+        argument(
+            "projects",
+            "Project directories, or glob patterns of project directories such as 'packages/*'.",
+            multiple=True,
+        )
+    ]
+
+    options: ClassVar[List[Option]] = [
+        option(
+            "no-lock",
+            None,
+            "Disables building wheel files with lock dependencies.",
+        ),
+        option(
+            "only-lock",
+            None,
+            "Uses lock dependencies only which are pinned to exact versions, instead of pyproject.toml",
+        ),
+        option(
+            "with-groups",
+            None,
+            "Specify which dependency groups to use to build the wheel files, on top of required groups from "
+            "pyproject.toml.  Can be specified multiple times or as a comma delimited list.",
+            flag=False,
+            multiple=True,
+        ),
+        option(
+            "force",
+            None,
+            "Builds the wheels even if wheels built from the same inputs are in the build cache.",
+        ),
+        option(
+            "reproducible",
+            None,
+            "Builds byte for byte reproducible wheels, see `poetry blixbuild --help`.",
+        ),
+        util.workers_option("Number of projects built in parallel processes."),
+        *util.resolve_options(),
+    ]
+
+    def handle(self) -> int:
+        util.validate_options_mutually_exclusive(self.option, "no-lock", "only-lock")
+        base_dir = Path.cwd()
+        projects = workspace.find_projects(base_dir, self.argument("projects"))
+
+        args = [f"--{name}" for name in BUILD_FLAGS if self.option(name)]
+        args.extend(f"--with-groups={groups}" for groups in self.option("with-groups"))
+        args.extend(f"--{name}={os.path.abspath(self.option(name))}" for name in BUILD_PATHS if self.option(name))
+
+        def display(project: Path) -> str:
+            return os.path.relpath(project, base_dir)
+
+        def on_result(result: ProjectResult) -> None:
+            if result.status == ProjectResult.BUILT:
+                self.line(f"Built <c1>{display(result.project)}</c1> in {result.seconds:.2f}s")
+            elif result.status == ProjectResult.FAILED:
+                self.line(f"<error>Failed</error> to build <c1>{display(result.project)}</c1> in {result.seconds:.2f}s")
+            else:
+                self.line(f"Skipped <c1>{display(result.project)}</c1>: {result.output}")
+            self.line(result.output, verbosity=Verbosity.VERBOSE)
+
+        workers = util.parse_workers(self.option("workers"))
+        self.line(f"Building {len(projects)} project(s) with {min(workers, len(projects))} worker process(es)")
+        start = time.perf_counter()
+        results = workspace.build_workspace(projects, args, workers, on_result)
+        built = sum(result.status == ProjectResult.BUILT for result in results)
+        self.line(f"Built {built} of {len(results)} project(s) in {time.perf_counter() - start:.2f}s")
+
+        if built < len(results):
+            self.line_error("")
+            self.line_error(workspace.failure_report(results))
+            return 1
+        return 0
@@ -0,0 +1,63 @@
+"""
+Benchmarks expanding a data directory of many files via poeblix's parallel scandir walker, against listing every file
+in data_files and checking each one with exists() and is_file() as before directory sources were supported.
+
+Not collected by pytest.  Run with:
+
+    python test/benchmarks/bench_data_files_scan.py [--files 100000]
+"""
+
+import argparse
+import os
+import tempfile
+import time
+from pathlib import Path
+from typing import List
+
+from poeblix.util.datafiles import expand_data_files
+
+
+def write_tree(root: Path, count: int, per_dir: int) -> List[str]:
+    """Writes `count` small files, `per_dir` per directory in a tree of nested directories"""
+    files = []
+    for i in range(count):
+        directory = root / f"d{i // per_dir // 10}" / f"d{i // per_dir}"
+        if i % per_dir == 0:
+            directory.mkdir(parents=True, exist_ok=True)
+        path = directory / f"file{i}.js"
+        path.write_bytes(b"x")
+        files.append(str(path.relative_to(root.parent)))
+    return files
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--files", type=int, default=100000, help="Number of files in the synthetic tree")
+    parser.add_argument("--per-dir", type=int, default=50, help="Number of files per directory")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        project_dir = Path(tmp)
+        files = write_tree(project_dir / "assets", args.files, args.per_dir)
+        print(f"Synthetic tree: {args.files} files in {len(files) // args.per_dir} directories")
+
+        start = time.perf_counter()
+        for file in files:
+            path = project_dir / file
+            assert path.exists() and path.is_file()
+        print(f"{'exists() + is_file() per listed file':<45} {(time.perf_counter() - start) * 1000:>9.1f} ms")
+
+        for name, data_files in [
+            ("directory source", [{"destination": "share", "from": ["assets"], "preserve_structure": True}]),
+            ("glob source", [{"destination": "share", "from": ["assets/**/*.js"], "preserve_structure": True}]),
+        ]:
+            for workers in sorted({1, os.cpu_count() or 1}):
+                start = time.perf_counter()
+                expanded = expand_data_files(project_dir, data_files, workers=workers)
+                elapsed = time.perf_counter() - start
+                assert len(expanded) == args.files
+                print(f"{f'{name}, {workers} thread(s)':<45} {elapsed * 1000:>9.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Benchmarks loading poetry.lock via Poetry's Locker against poeblix's read-only loader, on a synthetic lock file.
+
+Not collected by pytest.  Run with:
+
+    python test/benchmarks/bench_lock_loader.py [--packages 5000]
+"""
+
+import argparse
+import gc
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Any, Callable, Tuple
+
+from poetry.packages import Locker
+
+from poeblix.util.lock import load_locked_repository
+
+
+def write_lock(path: Path, count: int) -> None:
+    """Writes a lock file with `count` packages, each depending on a few others and locked with two file hashes"""
+    lines = []
+    for i in range(count):
+        lines.append("[[package]]")
+        lines.append(f'name = "package-{i}"')
+        lines.append(f'version = "1.{i % 100}.{i % 7}"')
+        lines.append(f'description = "Synthetic package {i}"')
+        lines.append("optional = false")
+        lines.append('python-versions = ">=3.7"')
+        lines.append("files = [")
+        for suffix in ("py3-none-any.whl", "tar.gz"):
+            lines.append(f'    {{file = "package_{i}-1.0.{suffix}", hash = "sha256:{i:064x}"}},')
+        lines.append("]")
+        lines.append("")
+        deps = sorted({j for j in (i * 2 + 1, i * 3 + 2, i + 7) if j < count})
+        if deps:
+            lines.append("[package.dependencies]")
+            for j in deps:
+                lines.append(f'package-{j} = ">=1.0"')
+            lines.append("")
+    lines.append("[metadata]")
+    lines.append('lock-version = "2.0"')
+    lines.append('python-versions = "^3.7"')
+    lines.append(f'content-hash = "{0:064x}"')
+    path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+
+
+def measure(func: Callable[[], Any]) -> Tuple[float, int]:
+    """Returns the wall time of a run, and the peak memory of a separate run as tracing slows down allocations"""
+    gc.collect()
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+
+    gc.collect()
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--packages", type=int, default=5000, help="Number of packages in the synthetic lock file")
+    parser.add_argument("--lookups", type=int, default=50, help="Number of packages looked up in the lazy case")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        lock_path = Path(tmp) / "poetry.lock"
+        write_lock(lock_path, args.packages)
+        print(f"Synthetic lock: {args.packages} packages, {lock_path.stat().st_size / 1024:.0f} KiB")
+
+        def lazy_lookups() -> Any:
+            repo = load_locked_repository(Locker(lock_path, {}))
+            return [repo.packages_named(f"package-{i}") for i in range(min(args.lookups, args.packages))]
+
+        cases = [
+            ("Locker.locked_repository()", lambda: Locker(lock_path, {}).locked_repository()),
+            ("load_locked_repository().packages", lambda: load_locked_repository(Locker(lock_path, {})).packages),
+            ("load_locked_repository() only", lambda: load_locked_repository(Locker(lock_path, {}))),
+            (f"load_locked_repository() + {args.lookups} lookups", lazy_lookups),
+        ]
+        for name, func in cases:
+            elapsed, peak = measure(func)
+            print(f"{name:<45} {elapsed * 1000:>9.1f} ms   peak {peak / 1024 / 1024:>7.1f} MiB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Benchmarks finding the package sources of a large package with Poetry's WheelBuilder, against reusing poeblix's index
+of an unchanged source tree from the build cache, and checks both find the same files.
+
+Not collected by pytest.  Run with:
+
+    python test/benchmarks/bench_source_discovery.py [--modules 30000]
+"""
+
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+from poetry.core.factory import Factory
+from poetry.core.masonry.builders.wheel import WheelBuilder
+
+from poeblix.util import discovery
+from poeblix.util.cache import BlixCache
+
+PYPROJECT = """
+[tool.poetry]
+name = "bigpackage"
+version = "0.1.0"
+description = "Synthetic package with many modules"
+authors = ["poeblix"]
+packages = [{ include = "bigpackage", from = "src" }]
+
+[tool.poetry.dependencies]
+python = "^3.9"
+"""
+
+
+def write_package(project_dir: Path, modules: int, per_dir: int) -> None:
+    (project_dir / "pyproject.toml").write_text(PYPROJECT)
+    package = project_dir / "src" / "bigpackage"
+    for i in range(modules):
+        directory = package / f"sub{i // per_dir // 10}" / f"sub{i // per_dir}"
+        if i % per_dir == 0:
+            directory.mkdir(parents=True, exist_ok=True)
+            (directory / "__init__.py").write_text("")
+            (directory.parent / "__init__.py").write_text("")
+        (directory / f"module{i}.py").write_text(f"VALUE = {i}\n")
+    (package / "__init__.py").write_text("")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--modules", type=int, default=30000, help="Number of modules in the synthetic package")
+    parser.add_argument("--per-dir", type=int, default=50, help="Number of modules per directory")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        project_dir = Path(tmp) / "project"
+        project_dir.mkdir()
+        write_package(project_dir, args.modules, args.per_dir)
+        # Lets the tree age past the window in which the index is not trusted
+        time.sleep(0.1)
+        cache = BlixCache(Path(tmp) / "cache", "builds")
+        builder = WheelBuilder(Factory().create_poetry(project_dir))
+
+        start = time.perf_counter()
+        cold = builder.find_files_to_add()
+        print(f"{'WheelBuilder.find_files_to_add()':<45} {(time.perf_counter() - start) * 1000:>9.1f} ms")
+
+        def find():
+            return discovery.find_files_to_add(builder, cache, True, builder.find_files_to_add)
+
+        for name in ("indexing the source tree", "reusing the index"):
+            start = time.perf_counter()
+            files = find()
+            print(f"{name:<45} {(time.perf_counter() - start) * 1000:>9.1f} ms")
+            assert sorted(f.relative_to_target_root() for f in files) == sorted(
+                f.relative_to_target_root() for f in cold
+            )
+        print(f"{len(cold)} package source(s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Benchmarks reading what `poetry blixvalidatewheel` needs from a wheel with many members: its Requires-Dist, member names
+and resolution manifest.  Compares opening the wheel once per validation step, with pkginfo and ZipFile as before,
+against sharing one WheelReader between the steps, in time, bytes read and read syscalls from /proc/self/io.
+
+Not collected by pytest.  Run with:
+
+    python test/benchmarks/bench_wheel_reader.py [--members 50000]
+"""
+
+import argparse
+import tempfile
+import time
+import zipfile
+from pathlib import Path
+from typing import Any, Callable, Dict, Tuple
+
+import pkginfo
+
+from poeblix.util.manifest import MANIFEST_NAME
+from poeblix.util.wheel import WheelReader
+
+DIST_INFO = "bigwheel-0.1.0.dist-info"
+
+
+def write_wheel(path: Path, members: int, requirements: int) -> None:
+    metadata = "Metadata-Version: 2.1\nName: bigwheel\nVersion: 0.1.0\n" + "".join(
+        f"Requires-Dist: dependency{i} (>=1.0.{i},<2.0.0)\n" for i in range(requirements)
+    )
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as wheel:
+        for i in range(members):
+            folder = "bigwheel-0.1.0.data/data/share" if i % 2 else "bigwheel/subpackage"
+            wheel.writestr(f"{folder}/module{i // 100}/file{i}.py", b"x = 1\n")
+        wheel.writestr(f"{DIST_INFO}/METADATA", metadata)
+        wheel.writestr(f"{DIST_INFO}/WHEEL", "Wheel-Version: 1.0\nGenerator: poetry-core\nRoot-Is-Purelib: true\n")
+        wheel.writestr(f"{DIST_INFO}/{MANIFEST_NAME}", '{"version": 1}\n')
+        wheel.writestr(f"{DIST_INFO}/RECORD", "")
+
+
+def io_counters() -> Dict[str, int]:
+    try:
+        with open("/proc/self/io") as f:
+            return {key: int(value) for key, value in (line.split(": ") for line in f)}
+    except OSError:
+        return {}
+
+
+def read_per_step(path: Path) -> Tuple[Any, ...]:
+    """Opens the wheel once per validation step, as blixvalidatewheel did before WheelReader"""
+    metadata = pkginfo.get_metadata(str(path))
+    assert metadata is not None
+    wheel = pkginfo.Wheel(str(path))
+    names = zipfile.ZipFile(path).namelist()
+    with zipfile.ZipFile(path) as manifest_wheel:
+        name = next(n for n in manifest_wheel.namelist() if n.endswith(f".dist-info/{MANIFEST_NAME}"))
+        manifest = manifest_wheel.read(name)
+    return list(metadata.requires_dist), f"{wheel.name}-{wheel.version}.data", names, manifest
+
+
+def read_once(path: Path) -> Tuple[Any, ...]:
+    with WheelReader(path) as wheel:
+        return wheel.requires_dist, wheel.data_dir, list(wheel.members), wheel.read_dist_info(MANIFEST_NAME)
+
+
+def measure(name: str, read: Callable[[Path], Tuple[Any, ...]], path: Path, repeat: int) -> Tuple[Any, ...]:
+    before = io_counters()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = read(path)
+    seconds = (time.perf_counter() - start) / repeat
+    after = io_counters()
+    if before and after:
+        read_bytes = (after["rchar"] - before["rchar"]) / repeat / 1024
+        syscalls = (after["syscr"] - before["syscr"]) / repeat
+        print(f"{name:<30} {seconds * 1000:>9.1f} ms {read_bytes:>10.0f} KiB read {syscalls:>8.0f} read syscalls")
+    else:
+        print(f"{name:<30} {seconds * 1000:>9.1f} ms (read counters need /proc/self/io)")
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--members", type=int, default=50000, help="Number of members in the synthetic wheel")
+    parser.add_argument("--requirements", type=int, default=300, help="Number of Requires-Dist in METADATA")
+    parser.add_argument("--repeat", type=int, default=5, help="Number of reads to average")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "bigwheel-0.1.0-py3-none-any.whl"
+        write_wheel(path, args.members, args.requirements)
+        print(f"{args.members} member(s), {path.stat().st_size / 1024 / 1024:.1f} MiB")
+        per_step = measure("one open per step (pkginfo)", read_per_step, path, args.repeat)
+        once = measure("shared WheelReader", read_once, path, args.repeat)
+        assert per_step == once
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Stress test building a wheel with a data file larger than 4 GiB, which needs Zip64 extensions.  The data file is
+sparse, so it takes no disk space, and the peak memory of each build must stay under a fixed limit whatever its size.
+
+Not collected by pytest, as each build deflates several GiB.  Run with:
+
+    python test/benchmarks/stress_zip64.py [--size-gib 5] [--workers 1 --workers 4] [--store]
+"""
+
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import zipfile
+from pathlib import Path
+
+PROJECT = Path(__file__).resolve().parents[1] / "positive_cases" / "happy_case_example"
+
+
+def build(cwd: Path, workers: int) -> float:
+    """Builds the wheel, returning the peak RSS of the build in MiB"""
+    proc = subprocess.Popen(
+        ["poetry", "blixbuild", f"--workers={workers}"], cwd=cwd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE
+    )
+    # wait4() reports the resources of this build alone, unlike getrusage(RUSAGE_CHILDREN)
+    _, status, rusage = os.wait4(proc.pid, 0)
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    stderr = proc.stderr.read().decode() if proc.stderr else ""
+    if proc.returncode:
+        raise RuntimeError(f"Build failed with exit code {proc.returncode}: {stderr}")
+    # ru_maxrss is in KiB on Linux, bytes on macOS
+    return rusage.ru_maxrss / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+
+def check_member(wheel_path: Path, name: str, size: int) -> None:
+    """Reads the large member back, which checks its CRC"""
+    with zipfile.ZipFile(wheel_path) as wheel:
+        info = wheel.getinfo(name)
+        assert info.file_size == size, f"{name} is {info.file_size} bytes, expected {size}"
+        with wheel.open(info) as f:
+            while f.read(16 * 1024 * 1024):
+                pass
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--size-gib", type=float, default=5, help="Size of the sparse data file in GiB")
+    parser.add_argument("--workers", type=int, action="append", help="Worker counts to build with, default 1 and 4")
+    parser.add_argument("--max-rss-mib", type=float, default=256, help="Peak RSS limit of a build in MiB")
+    parser.add_argument(
+        "--store", action="store_true", help="Stores the data file uncompressed, so the wheel itself exceeds 4 GiB"
+    )
+    args = parser.parse_args()
+    size = int(args.size_gib * 1024 * 1024 * 1024)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cwd = Path(tmp) / "project"
+        shutil.copytree(PROJECT, cwd, ignore=shutil.ignore_patterns("dist"))
+        with open(cwd / "data_files" / "large.bin", "wb") as f:
+            f.truncate(size)
+        pyproject = cwd / "pyproject.toml"
+        content = pyproject.read_text().replace(
+            '"data_files/athirdfile" ]', '"data_files/athirdfile", "data_files/large.bin" ]'
+        )
+        if args.store:
+            content = content.replace(
+                "[build-system]", '[tool.blix.data.compression]\nstore = [".bin"]\n\n[build-system]'
+            )
+        pyproject.write_text(content)
+        wheel_path = cwd / "dist" / "blixexample-0.1.0-py3-none-any.whl"
+        print(f"Sparse data file: {size / 1024 ** 3:.1f} GiB, {'stored' if args.store else 'deflated'}")
+
+        failed = False
+        for workers in args.workers or [1, 4]:
+            start = time.perf_counter()
+            peak = build(cwd, workers)
+            elapsed = time.perf_counter() - start
+            check_member(wheel_path, "blixexample-0.1.0.data/data/share/data/threes/large.bin", size)
+            wheel_size = wheel_path.stat().st_size
+            ok = peak <= args.max_rss_mib
+            failed |= not ok
+            print(
+                f"{workers} worker(s): built in {elapsed:.1f}s, wheel {wheel_size / 1024 ** 2:.1f} MiB, "
+                f"peak RSS {peak:.0f} MiB {'OK' if ok else f'exceeds {args.max_rss_mib:.0f} MiB'}"
+            )
+        sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
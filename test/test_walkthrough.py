@@ -1,8 +1,34 @@
+import glob
+import hashlib
+import json
 import os.path
+import pathlib
+import queue
+import shutil
+import signal
+import socket
+import struct
 import subprocess
 import sys
+import threading
+import zipfile
 
 import pkginfo
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def blix_cache_dir(tmp_path, monkeypatch):
+    """Caches of each test in its own directory, instead of Poetry's cache directory"""
+    monkeypatch.setenv("POEBLIX_CACHE_DIR", str(tmp_path / "blix-cache"))
+
+
+@pytest.fixture
+def project(tmp_path):
+    """Copy of the happy case example project, without its built wheels"""
+    cwd = str(tmp_path / "project")
+    shutil.copytree("positive_cases/happy_case_example", cwd, ignore=shutil.ignore_patterns("dist", "__pycache__"))
+    return cwd
 
 
 def test_positive_happy_case_example():
@@ -232,3 +258,1008 @@ def test_negative_missing_data_files_from_project():
         "Wheel at [dist/blixexample-missing_data_files_from_project.whl] contains extraneous data_files not specified in pyproject.toml: ['blixexample-0.1.0.data/data/share/data/test.txt', 'blixexample-0.1.0.data/data/share/data/anotherfile', 'blixexample-0.1.0.data/data/share/data/threes/athirdfile']"
         in stderr
     ), "Did not get expected error message!"
+
+
+def test_positive_resolution_cache(tmp_path):
+    cwd = "positive_cases/happy_case_example"
+    cache_dir = str(tmp_path / "cache")
+
+    # First build populates the cache, second build and validation reuse it
+    output = subprocess.check_output(["poetry", "blixbuild", f"--cache-dir={cache_dir}"], cwd=cwd).decode()
+    assert "0 hit(s), 1 miss(es)" in output, output
+    output = subprocess.check_output(["poetry", "blixbuild", "--force", f"--cache-dir={cache_dir}"], cwd=cwd).decode()
+    assert "1 hit(s), 0 miss(es)" in output, output
+    output = subprocess.check_output(
+        [
+            "poetry",
+            "blixvalidatewheel",
+            "--ignore-manifest",
+            f"--cache-dir={cache_dir}",
+            "dist/blixexample-0.1.0-py3-none-any.whl",
+        ],
+        cwd=cwd,
+    ).decode()
+    assert "1 hit(s), 0 miss(es)" in output, output
+
+    # Different groups resolve to a different cache entry
+    output = subprocess.check_output(
+        ["poetry", "blixbuild", "--with-groups=integ", f"--cache-dir={cache_dir}"], cwd=cwd
+    ).decode()
+    assert "0 hit(s), 1 miss(es)" in output, output
+
+    # Cache can be disabled
+    output = subprocess.check_output(
+        ["poetry", "blixbuild", "--force", "--no-resolution-cache", f"--cache-dir={cache_dir}"], cwd=cwd
+    ).decode()
+    assert "Resolution cache" not in output, output
+
+
+def test_positive_cache_eviction(tmp_path):
+    from poeblix.util.cache import BlixCache
+
+    cache = BlixCache(tmp_path, "resolution", max_size=1024, max_age=60)
+    for key in ("aa", "bb"):
+        with cache.lock(key):
+            cache.put_json(key, "x" * 400)
+    assert sorted(os.listdir(tmp_path / "resolution" / "locks")) == ["aa", "bb"]
+
+    # Evicting the least recently used entry removes the lock file of its key too
+    os.utime(tmp_path / "resolution" / "aa.json", (0, 0))
+    with cache.lock("cc"):
+        cache.put_json("cc", "x" * 400)
+    assert cache.get_json("aa") is None
+    assert sorted(os.listdir(tmp_path / "resolution" / "locks")) == ["bb", "cc"]
+
+    # Lock files of keys that never got an entry are removed once stale
+    with cache.lock("dd"):
+        pass
+    os.utime(tmp_path / "resolution" / "locks" / "dd", (0, 0))
+    cache.evict()
+    assert sorted(os.listdir(tmp_path / "resolution" / "locks")) == ["bb", "cc"]
+
+
+def test_positive_fast_resolve_matches_solver():
+    wheel = "dist/blixexample-0.1.0-py3-none-any.whl"
+    for cwd, options in [
+        ("positive_cases/happy_case_example", []),
+        ("positive_cases/happy_case_example", ["--with-groups=integ,dev"]),
+        ("positive_cases/only_lock", ["--only-lock"]),
+    ]:
+        requires_dist = []
+        for resolver_options in [[], ["--fast-resolve"]]:
+            subprocess.check_call(
+                ["poetry", "blixbuild", "--no-resolution-cache", *options, *resolver_options], cwd=cwd
+            )
+            requires_dist.append(sorted(pkginfo.get_metadata(os.path.join(cwd, wheel)).requires_dist))
+
+        assert requires_dist[0] == requires_dist[1], f"Fast resolver differs from solver for {cwd} {options}"
+
+        # Validate wheel built with the solver using the fast resolver
+        validate_options = [o for o in options if o.startswith("--with-groups")]
+        subprocess.check_call(
+            ["poetry", "blixvalidatewheel", "--no-resolution-cache", "--fast-resolve", *validate_options, wheel],
+            cwd=cwd,
+        )
+
+
+def test_positive_locked_only():
+    cwd = "positive_cases/happy_case_example"
+    subprocess.check_call(["poetry", "blixbuild", "--locked-only", "--no-resolution-cache"], cwd=cwd)
+    subprocess.check_call(
+        [
+            "poetry",
+            "blixvalidatewheel",
+            "--locked-only",
+            "--no-resolution-cache",
+            "dist/blixexample-0.1.0-py3-none-any.whl",
+        ],
+        cwd=cwd,
+    )
+
+
+def test_negative_locked_only_missing_from_lock():
+    cwd = "negative_cases/locked_only_missing_from_lock"
+    # Validate build fails instead of looking up the missing dependency from remote sources
+    proc = subprocess.Popen(["poetry", "blixbuild", "--locked-only"], cwd=cwd, stderr=subprocess.PIPE)
+    stdout, stderr = proc.communicate()
+    assert stdout is None
+    stderr = stderr.decode()
+    assert (
+        "poetry.lock does not contain packages satisfying: ['requests (>=2.31.0,<3.0.0)']" in stderr
+    ), "Did not get expected error message!"
+
+
+def test_positive_marker_env_snapshot(tmp_path):
+    cwd = "positive_cases/happy_case_example"
+    snapshot = tmp_path / "markers.json"
+    subprocess.check_call(["poetry", "blixmarkerenv", f"--output={snapshot}"], cwd=cwd)
+
+    # Resolve for a Python 3.10 target, which needs backports not used on newer Pythons
+    marker_env = json.loads(snapshot.read_text())
+    marker_env.update(python_full_version="3.10.4", python_version="3.10", version_info=[3, 10, 4, "final", 0])
+    snapshot.write_text(json.dumps(marker_env))
+    subprocess.check_call(["poetry", "blixbuild", "--with-groups=integ", f"--marker-env={snapshot}"], cwd=cwd)
+
+    path = os.path.join(cwd, "dist/blixexample-0.1.0-py3-none-any.whl")
+    requires_dist = pkginfo.get_metadata(path).requires_dist
+    assert "exceptiongroup (==1.1.1)" in requires_dist
+    assert "tomli (==2.0.1)" in requires_dist
+
+    subprocess.check_call(
+        [
+            "poetry",
+            "blixvalidatewheel",
+            "--with-groups=integ",
+            f"--marker-env={snapshot}",
+            "dist/blixexample-0.1.0-py3-none-any.whl",
+        ],
+        cwd=cwd,
+    )
+
+
+def test_positive_incremental_resolution(tmp_path, project):
+    cache_dir = str(tmp_path / "cache")
+    wheel = os.path.join(project, "dist/blixexample-0.1.0-py3-none-any.whl")
+
+    # Without --fast-resolve, dependencies are only ever resolved by the solver
+    subprocess.check_call(["poetry", "blixbuild", f"--cache-dir={cache_dir}"], cwd=project)
+    assert not glob.glob(os.path.join(cache_dir, "incremental", "*.json"))
+
+    # First build records the resolved graph, then a lock bump of a single package re-resolves from it
+    subprocess.check_call(["poetry", "blixbuild", f"--cache-dir={cache_dir}", "--fast-resolve"], cwd=project)
+    assert len(glob.glob(os.path.join(cache_dir, "incremental", "*.json"))) == 1
+    lock_path = os.path.join(project, "poetry.lock")
+    with open(lock_path) as f:
+        lock = f.read()
+    with open(lock_path, "w") as f:
+        f.write(lock.replace('[package.dependencies]\nsix = ">=1.5"\n', ""))
+    output = subprocess.check_output(
+        ["poetry", "blixbuild", f"--cache-dir={cache_dir}", "--fast-resolve", "-vv"], cwd=project
+    ).decode()
+    assert "Re-resolving from the previous resolution, with changed packages in poetry.lock: ['python-dateutil']" in (
+        output
+    ), output
+    incremental = sorted(pkginfo.get_metadata(wheel).requires_dist)
+    assert "six (==1.16.0)" not in incremental
+
+    # Must be identical to a full solve
+    subprocess.check_call(["poetry", "blixbuild", f"--cache-dir={cache_dir}", "--full-solve"], cwd=project)
+    assert incremental == sorted(pkginfo.get_metadata(wheel).requires_dist)
+
+
+def test_positive_group_sets(tmp_path, project):
+    group_sets = ["--group-set=main", "--group-set=integ", "--group-set=integ,dev"]
+    variants = [("main", []), ("main+integ", ["integ"]), ("main+dev+integ", ["integ", "dev"])]
+
+    def group_set_requires_dist(*options):
+        subprocess.check_call(["poetry", "blixbuild", "--force", *group_sets, *options], cwd=project)
+        return {
+            variant: sorted(
+                pkginfo.get_metadata(
+                    os.path.join(project, "dist", variant, "blixexample-0.1.0-py3-none-any.whl")
+                ).requires_dist
+            )
+            for variant, _ in variants
+        }
+
+    # Without --fast-resolve, each set is resolved by the solver, through the resolution cache
+    cache_dir = tmp_path / "cache"
+    solved = group_set_requires_dist(f"--cache-dir={cache_dir}")
+    assert len(glob.glob(os.path.join(cache_dir, "resolution", "*.json"))) == len(variants)
+    # Walking the lock once per group gives the same dependencies
+    assert group_set_requires_dist("--fast-resolve") == solved
+
+    # Each wheel must match a wheel built for its groups alone
+    for variant, with_groups in variants:
+        path = os.path.join(project, "dist", variant, "blixexample-0.1.0-py3-none-any.whl")
+        with zipfile.ZipFile(path) as wheel:
+            assert wheel.testzip() is None
+        requires_dist = solved[variant]
+
+        options = [f"--with-groups={','.join(with_groups)}"] if with_groups else []
+        subprocess.check_call(["poetry", "blixbuild", *options], cwd=project)
+        expected = sorted(
+            pkginfo.get_metadata(os.path.join(project, "dist/blixexample-0.1.0-py3-none-any.whl")).requires_dist
+        )
+        assert requires_dist == expected, variant
+
+        subprocess.check_call(["poetry", "blixvalidatewheel", *options, path], cwd=project)
+
+
+def test_positive_target_envs(tmp_path):
+    cwd = "positive_cases/happy_case_example"
+    current = tmp_path / "current.json"
+    subprocess.check_call(["poetry", "blixmarkerenv", f"--output={current}"], cwd=cwd)
+    options = ["--with-groups=integ"]
+    for python_full_version in ["3.10.4", "3.12.0"]:
+        target = tmp_path / f"py{python_full_version}.json"
+        marker_env = json.loads(current.read_text())
+        marker_env.update(python_full_version=python_full_version, python_version=python_full_version[:-2])
+        target.write_text(json.dumps(marker_env))
+        options.append(f"--target-env={target}")
+    subprocess.check_call(["poetry", "blixbuild", *options], cwd=cwd)
+
+    # Backports are only needed by the Python 3.10 target
+    path = os.path.join(cwd, "dist/blixexample-0.1.0-py3-none-any.whl")
+    requires_dist = pkginfo.get_metadata(path).requires_dist
+    assert 'exceptiongroup (==1.1.1) ; python_version == "3.10"' in requires_dist
+    assert 'tomli (==2.0.1) ; python_version == "3.10"' in requires_dist
+    assert "pytest (==7.3.1)" in requires_dist
+
+    subprocess.check_call(["poetry", "blixvalidatewheel", *options, "dist/blixexample-0.1.0-py3-none-any.whl"], cwd=cwd)
+
+
+def test_positive_snapshot_env(tmp_path, project):
+    from poeblix import api
+    from poeblix.util import markers, util
+    from poeblix.util.lock import load_locked_repository
+
+    poetry, env = api.load_project(project)
+    marker_env = markers.get_marker_env(env)
+
+    # Snapshots of the project's environment read everything but its markers from it
+    snapshot = markers.snapshot_env(env, marker_env)
+    assert snapshot.marker_env is marker_env
+    assert snapshot.python == env.python
+
+    # Target environments are resolved for a snapshot alone, without an environment to probe, like in the worker
+    # processes of --target-env
+    target = markers.SnapshotEnv(
+        tmp_path / "target", dict(marker_env, python_full_version="3.10.4", python_version="3.10")
+    )
+    try:
+        target.python
+        assert False, "A snapshot without an environment has no interpreter"
+    except AttributeError:
+        pass
+    locked_repository = load_locked_repository(poetry.locker)
+    names = {op.package.name for op in util.resolve_dependencies(poetry, target, locked_repository, ["integ"])}
+    assert {"pytest", "tomli", "exceptiongroup"} <= names, names
+    api.unload_projects()
+
+
+def test_positive_lock_file_markers(tmp_path):
+    from types import SimpleNamespace
+
+    from poetry.core.packages.dependency import Dependency
+    from poetry.core.packages.project_package import ProjectPackage
+
+    from poeblix.util.lock import load_locked_repository, locked_marker_lookup
+    from poeblix.util.resolver import resolve_locked, resolve_locked_group_sets
+
+    def entry(version, markers=None):
+        lines = ["[[package]]", 'name = "numpy"', f'version = "{version}"', 'python-versions = ">=3.8"']
+        if markers is not None:
+            lines.append(f"markers = {markers}")
+        return "\n".join(lines) + "\n\n"
+
+    def walk(lock, sys_platform):
+        lock_path = tmp_path / "poetry.lock"
+        lock_path.write_text(lock + '[metadata]\nlock-version = "2.1"\npython-versions = "^3.8"\ncontent-hash = ""\n')
+        repository = load_locked_repository(SimpleNamespace(lock=lock_path))
+        marker_env = {"python_full_version": "3.11.7", "python_version": "3.11", "sys_platform": sys_platform}
+        ops = resolve_locked(
+            root, repository.packages_named, marker_env, locked_marker=locked_marker_lookup(repository)
+        )
+        group_sets = resolve_locked_group_sets(
+            root, [["main"]], repository.packages_named, marker_env, locked_marker_lookup(repository)
+        )
+        if ops is None:
+            assert group_sets is None
+            return None
+        assert [[op.package.version.text for op in ops]] == [[op.package.version.text for op in s] for s in group_sets]
+        return [op.package.version.text for op in ops]
+
+    root = ProjectPackage("example", "0.1.0")
+    root.add_dependency(Dependency("numpy", ">=1.24"))
+
+    # Poetry 2 lock files, with one marker for all groups, or a marker per group
+    split = entry("1.24.4", "'sys_platform == \"win32\"'") + entry("1.26.4", "'sys_platform == \"linux\"'")
+    assert walk(split, "linux") == ["1.26.4"]
+    assert walk(split, "win32") == ["1.24.4"]
+    per_group = entry("1.24.4", "{ main = 'sys_platform == \"win32\"' }") + entry(
+        "1.26.4", "{ main = 'sys_platform == \"linux\"', dev = 'sys_platform == \"darwin\"' }"
+    )
+    assert walk(per_group, "darwin") == ["1.26.4"]
+    assert walk(per_group, "win32") == ["1.24.4"]
+
+    # A package only locked for other environments, or several packages which apply, are left to the solver
+    assert walk(entry("1.24.4", "'sys_platform == \"win32\"'"), "linux") is None
+    assert walk(entry("1.24.4") + entry("1.26.4"), "linux") is None
+
+
+def test_positive_lock_file_parse_cache(tmp_path):
+    from poeblix.util import lock
+
+    def write(path, version):
+        path.parent.mkdir(exist_ok=True)
+        path.write_text(f'[[package]]\nname = "numpy"\nversion = "{version}"\n\n[metadata]\nlock-version = "2.1"\n')
+        return path.resolve()
+
+    # Identical lock files share their data, and changed ones are parsed again
+    first, second = write(tmp_path / "a" / "poetry.lock", "1.26.4"), write(tmp_path / "b" / "poetry.lock", "1.26.4")
+    data = lock._parse_lock(first)
+    assert lock._parse_lock(first) is data
+    assert lock._parse_lock(second) is data
+    write(first, "1.24.4")
+    assert lock._parse_lock(first)["package"][0]["version"] == "1.24.4"
+
+    # Once the lock file is older than its timestamps' precision, its stamp is enough to reuse its data
+    os.utime(first, (0, 0))
+    data = lock._parse_lock(first)
+    assert lock._parse_lock(first) is data
+    assert lock._parsed_locks[first][0] is not None
+
+    # Only the latest version of each lock file is kept
+    assert [path for path in lock._parsed_locks if path.is_relative_to(tmp_path.resolve())] == [first, second]
+
+
+def test_positive_locked_package_markers():
+    from poetry.core.packages.dependency import Dependency
+    from poetry.core.packages.package import Package
+    from poetry.core.packages.project_package import ProjectPackage
+    from poetry.core.version.markers import parse_marker
+
+    from poeblix.util.resolver import resolve_locked, resolve_locked_group_sets
+
+    # numpy locked once per platform, as Poetry does for dependencies with different versions per environment
+    windows, linux = Package("numpy", "1.24.4"), Package("numpy", "1.26.4")
+    windows.marker = parse_marker('sys_platform == "win32"')
+    linux.marker = parse_marker('sys_platform == "linux"')
+    locked = {"numpy": [windows, linux]}
+    root = ProjectPackage("example", "0.1.0")
+    root.add_dependency(Dependency("numpy", ">=1.24"))
+    marker_env = {"python_full_version": "3.11.7", "python_version": "3.11", "sys_platform": "linux"}
+
+    ops = resolve_locked(root, lambda name: locked.get(name, []), marker_env)
+    assert [op.package for op in ops] == [linux]
+    group_sets = resolve_locked_group_sets(root, [["main"]], lambda name: locked.get(name, []), marker_env)
+    assert [[op.package for op in ops] for ops in group_sets] == [[linux]]
+
+    # Left to the solver if more than one locked package applies
+    linux.marker = parse_marker('python_version >= "3.9"')
+    assert resolve_locked(root, lambda name: locked.get(name, []), dict(marker_env, sys_platform="win32")) is None
+
+
+def test_positive_resolution_manifest(project):
+    wheel = "dist/blixexample-0.1.0-py3-none-any.whl"
+    subprocess.check_call(["poetry", "blixbuild"], cwd=project)
+    with zipfile.ZipFile(os.path.join(project, wheel)) as f:
+        manifest = json.loads(f.read("blixexample-0.1.0.dist-info/blix.json"))
+    assert ("six", "1.16.0") in [(p["name"], p["version"]) for p in manifest["resolved"][0]]
+
+    # Unchanged project validates against the manifest
+    output = subprocess.check_output(["poetry", "blixvalidatewheel", wheel], cwd=project).decode()
+    assert "Using the wheel's resolution manifest" in output, output
+    output = subprocess.check_output(["poetry", "blixvalidatewheel", "--ignore-manifest", wheel], cwd=project).decode()
+    assert "resolution manifest" not in output, output
+
+    # Changes to poetry.lock resolve dependencies again, which no longer need six
+    lock_path = os.path.join(project, "poetry.lock")
+    with open(lock_path) as f:
+        lock = f.read()
+    with open(lock_path, "w") as f:
+        f.write(lock.replace('[package.dependencies]\nsix = ">=1.5"\n', ""))
+    result = subprocess.run(["poetry", "blixvalidatewheel", wheel], cwd=project, capture_output=True)
+    assert result.returncode == 1
+    assert "Resolution manifest of the wheel does not match the project" in result.stdout.decode()
+    assert "Packages in Wheel file are not present in pyproject.toml/poetry.lock: ['six']" in result.stderr.decode()
+
+
+def test_positive_parallel_wheel_writer(project):
+    path = os.path.join(project, "dist/blixexample-0.1.0-py3-none-any.whl")
+
+    # Building with several workers must give the same wheel as building with one
+    wheels = []
+    for workers in ["1", "4"]:
+        subprocess.check_call(["poetry", "blixbuild", "--only-lock", f"--workers={workers}"], cwd=project)
+        with open(path, "rb") as f:
+            wheels.append(f.read())
+    assert wheels[0] == wheels[1]
+
+    subprocess.check_call(["poetry", "blixvalidatewheel", path], cwd=project)
+
+
+def test_positive_raw_zip_members(tmp_path):
+    from poeblix.util.wheel import compress_file, copy_member_raw, write_compressed
+
+    # Deflated and stored members, empty ones and non-ASCII names
+    files = {"module.py": b"import os\n" * 1000, "empty.txt": b"", "données.bin": os.urandom(4096)}
+    for name, content in files.items():
+        (tmp_path / name).write_bytes(content)
+
+    def write(path, add):
+        with zipfile.ZipFile(path, "w") as target:
+            for name in files:
+                for compress_type in (zipfile.ZIP_DEFLATED, zipfile.ZIP_STORED):
+                    zinfo = zipfile.ZipInfo(f"{compress_type}/{name}", (2020, 1, 1, 0, 0, 0))
+                    zinfo.external_attr = 0o644 << 16
+                    zinfo.file_size = len(files[name])
+                    add(target, zinfo, tmp_path / name, compress_type)
+        return path.read_bytes()
+
+    def add_with_zipfile(target, zinfo, source, compress_type):
+        zinfo.compress_type = compress_type
+        with source.open("rb") as src, target.open(zinfo, "w") as dest:
+            shutil.copyfileobj(src, dest)
+
+    # Members written from their compressed data are the same as zipfile writes them
+    expected = write(tmp_path / "zipfile.zip", add_with_zipfile)
+    actual = write(
+        tmp_path / "compressed.zip",
+        lambda target, zinfo, source, compress_type: write_compressed(
+            target, zinfo, compress_file(source, compress_type)
+        ),
+    )
+    assert actual == expected
+
+    # Members copied without recompressing them are the same as in the source
+    with zipfile.ZipFile(tmp_path / "zipfile.zip") as source, zipfile.ZipFile(tmp_path / "copied.zip", "w") as target:
+        for info in source.infolist():
+            copy_member_raw(source, info, target)
+    assert (tmp_path / "copied.zip").read_bytes() == expected
+
+
+def test_positive_compression_policy(project):
+    with open(os.path.join(project, "data_files/compressible"), "wb") as f:
+        f.write(b"a" * 100000)
+    with open(os.path.join(project, "data_files/random"), "wb") as f:
+        f.write(os.urandom(100000))
+    pyproject = os.path.join(project, "pyproject.toml")
+    with open(pyproject) as f:
+        content = f.read()
+    content = content.replace(
+        '"data_files/athirdfile" ]', '"data_files/athirdfile", "data_files/compressible", "data_files/random" ]'
+    )
+    content = content.replace(
+        "[build-system]", '[tool.blix.data.compression]\nstore = [".txt"]\nauto = true\nlevel = 9\n\n[build-system]'
+    )
+    with open(pyproject, "w") as f:
+        f.write(content)
+    subprocess.check_call(["poetry", "blixbuild"], cwd=project)
+
+    path = os.path.join(project, "dist/blixexample-0.1.0-py3-none-any.whl")
+    with zipfile.ZipFile(path) as wheel:
+        assert wheel.testzip() is None
+        data = "blixexample-0.1.0.data/data/share/data/"
+        assert wheel.getinfo(data + "test.txt").compress_type == zipfile.ZIP_STORED
+        assert wheel.getinfo(data + "threes/random").compress_type == zipfile.ZIP_STORED
+        assert wheel.getinfo(data + "threes/compressible").compress_type == zipfile.ZIP_DEFLATED
+        assert wheel.getinfo("blixexample/main.py").compress_type == zipfile.ZIP_DEFLATED
+
+    subprocess.check_call(["poetry", "blixvalidatewheel", path], cwd=project)
+
+
+def test_positive_data_file_directories_and_globs(project):
+    for asset in ["assets/index.js", "assets/static/lib/app.js", "assets/static/style.css"]:
+        os.makedirs(os.path.dirname(os.path.join(project, asset)), exist_ok=True)
+        with open(os.path.join(project, asset), "w") as f:
+            f.write(asset)
+    pyproject = os.path.join(project, "pyproject.toml")
+    with open(pyproject) as f:
+        content = f.read()
+    content = content.replace(
+        '{ destination = "share/data/threes", from = [ "data_files/athirdfile" ] }',
+        '{ destination = "share/data/threes", from = [ "data_files/athirdfile" ] },\n'
+        '    { destination = "share/ext", from = [ "assets" ], preserve_structure = true },\n'
+        '    { destination = "share/js", from = [ "assets/**/*.js" ] }',
+    )
+    with open(pyproject, "w") as f:
+        f.write(content)
+    subprocess.check_call(["poetry", "blixbuild"], cwd=project)
+
+    path = os.path.join(project, "dist/blixexample-0.1.0-py3-none-any.whl")
+    with zipfile.ZipFile(path) as wheel:
+        data = "blixexample-0.1.0.data/data/"
+        names = [name[len(data) :] for name in wheel.namelist() if name.startswith(data)]
+    assert names == [
+        "share/data/test.txt",
+        "share/data/anotherfile",
+        "share/data/threes/athirdfile",
+        "share/ext/assets/index.js",
+        "share/ext/assets/static/lib/app.js",
+        "share/ext/assets/static/style.css",
+        "share/js/index.js",
+        "share/js/app.js",
+    ]
+
+    subprocess.check_call(["poetry", "blixvalidatewheel", path], cwd=project)
+
+    # Files added to a data directory after the build are missing from the wheel
+    with open(os.path.join(project, "assets/new.js"), "w") as f:
+        f.write("new")
+    assert subprocess.call(["poetry", "blixvalidatewheel", path], cwd=project) != 0
+
+
+def test_positive_build_cache(tmp_path, project):
+    cache_dir = str(tmp_path / "cache")
+    path = os.path.join(project, "dist/blixexample-0.1.0-py3-none-any.whl")
+
+    def build(*options):
+        output = subprocess.check_output(["poetry", "blixbuild", f"--cache-dir={cache_dir}", *options], cwd=project)
+        with open(path, "rb") as f:
+            return output.decode(), f.read()
+
+    output, wheel = build()
+    assert "Wheel is up to date" not in output, output
+
+    # Unchanged inputs reuse the cached wheel, even if dist/ was cleaned
+    shutil.rmtree(os.path.join(project, "dist"))
+    output, cached_wheel = build()
+    assert "Wheel is up to date, reused cached build" in output, output
+    assert cached_wheel == wheel
+
+    # --force always builds, and so does --full-solve, to resolve with the solver
+    output, _ = build("--force")
+    assert "Wheel is up to date" not in output, output
+    output, _ = build("--full-solve")
+    assert "Wheel is up to date" not in output, output
+
+    # Wheels are not stored with --no-build-cache, or if they are larger than the build cache
+    def cached_wheels():
+        return sorted(glob.glob(os.path.join(cache_dir, "builds", "*.whl")))
+
+    before = cached_wheels()
+    assert before
+    output, _ = build("--no-build-cache", "--reproducible")
+    assert "Wheel is up to date" not in output, output
+    subprocess.check_call(
+        ["poetry", "blixbuild", f"--cache-dir={cache_dir}", "--reproducible"],
+        cwd=project,
+        env=dict(os.environ, POEBLIX_BUILD_CACHE_MAX_SIZE="1000"),
+    )
+    assert cached_wheels() == before
+
+    # Changing options, sources or data_files builds again
+    output, _ = build("--only-lock")
+    assert "Wheel is up to date" not in output, output
+    with open(os.path.join(project, "data_files/test.txt"), "a") as f:
+        f.write("changed")
+    output, _ = build()
+    assert "Wheel is up to date" not in output, output
+    with open(os.path.join(project, "src/blixexample/main.py"), "a") as f:
+        f.write("\n# changed\n")
+    output, _ = build()
+    assert "Wheel is up to date" not in output, output
+    output, _ = build()
+    assert "Wheel is up to date, reused cached build" in output, output
+
+    # So does changing the README written into METADATA, or the license files copied into .dist-info
+    with open(os.path.join(project, "pyproject.toml")) as f:
+        pyproject = f.read()
+    with open(os.path.join(project, "pyproject.toml"), "w") as f:
+        f.write(pyproject.replace("authors = ", 'readme = "README.md"\nauthors = ', 1))
+    for name in ("README.md", "LICENSE"):
+        with open(os.path.join(project, name), "w") as f:
+            f.write(f"{name} before\n")
+    build()
+    for name in ("README.md", "LICENSE"):
+        with open(os.path.join(project, name), "w") as f:
+            f.write(f"{name} after\n")
+        output, _ = build()
+        assert "Wheel is up to date" not in output, output
+        assert (
+            f"{name} after"
+            in zipfile.ZipFile(path)
+            .read(f"blixexample-0.1.0.dist-info/{'METADATA' if name == 'README.md' else name}")
+            .decode()
+        )
+
+
+def test_positive_reproducible_build(tmp_path):
+    env = dict(os.environ, SOURCE_DATE_EPOCH="1700000000")
+
+    def build(name, copy_function, *options):
+        cwd = str(tmp_path / name)
+        shutil.copytree(
+            "positive_cases/happy_case_example",
+            cwd,
+            ignore=shutil.ignore_patterns("dist"),
+            copy_function=copy_function,
+        )
+        subprocess.check_call(
+            ["poetry", "blixbuild", "--reproducible", "--force", f"--cache-dir={tmp_path / 'cache'}", *options],
+            cwd=cwd,
+            env=env,
+        )
+        with open(os.path.join(cwd, "dist/blixexample-0.1.0-py3-none-any.whl"), "rb") as f:
+            return hashlib.sha256(f.read()).hexdigest(), os.path.join(cwd, "dist/blixexample-0.1.0-py3-none-any.whl")
+
+    # Copies of the project at different paths with different modification times, built by a different number of threads
+    # on hosts with different kernels
+    host = tmp_path / "host.json"
+    subprocess.check_call(["poetry", "blixmarkerenv", f"--output={host}"], cwd="positive_cases/happy_case_example")
+    other_host = tmp_path / "other_host.json"
+    other_host.write_text(
+        json.dumps(dict(json.loads(host.read_text()), platform_release="0.0.1-other", platform_version="#1 other"))
+    )
+    digest, path = build("first", shutil.copy2, f"--marker-env={host}")
+    other_digest, _ = build("second", shutil.copy, "--workers", "4", f"--marker-env={other_host}")
+    assert digest == other_digest
+    with zipfile.ZipFile(path) as wheel:
+        wheel_manifest = json.loads(wheel.read("blixexample-0.1.0.dist-info/blix.json"))
+    assert "platform_release" not in wheel_manifest["inputs"]["marker_envs"][0]
+    assert "poetry" not in wheel_manifest["inputs"]
+
+    # The manifest is still used to validate the wheel
+    validate = subprocess.run(
+        ["poetry", "blixvalidatewheel", "dist/blixexample-0.1.0-py3-none-any.whl"],
+        cwd=os.path.dirname(os.path.dirname(path)),
+        capture_output=True,
+        text=True,
+    )
+    assert validate.returncode == 0, validate.stderr
+    assert "Using the wheel's resolution manifest" in validate.stdout
+
+    with zipfile.ZipFile(path) as wheel:
+        infos = wheel.infolist()
+    assert all(info.date_time == (2023, 11, 14, 22, 13, 20) for info in infos)
+    assert all(info.create_system == 3 for info in infos)
+    data_files = [info.filename for info in infos if ".data/" in info.filename]
+    assert data_files == sorted(data_files)
+
+    # Without --reproducible, package sources are timestamped the same as by `poetry build`
+    cwd = os.path.dirname(os.path.dirname(path))
+    subprocess.check_call(["poetry", "blixbuild", "--force", "--no-build-cache"], cwd=cwd, env=env)
+    with zipfile.ZipFile(path) as wheel:
+        date_time = wheel.getinfo("blixexample/__init__.py").date_time
+    subprocess.check_call(["poetry", "build", "-f", "wheel"], cwd=cwd, env=env)
+    with zipfile.ZipFile(path) as wheel:
+        assert wheel.getinfo("blixexample/__init__.py").date_time == date_time
+
+
+def test_positive_repin(tmp_path, project):
+    path = os.path.join(project, "dist/blixexample-0.1.0-py3-none-any.whl")
+
+    def requires_dist(wheel_path):
+        return sorted(pkginfo.Wheel(wheel_path).requires_dist)
+
+    def members(wheel_path):
+        with zipfile.ZipFile(wheel_path) as wheel:
+            return {
+                info.filename: (info.CRC, info.compress_type, info.compress_size, info.date_time)
+                for info in wheel.infolist()
+                if not info.filename.endswith(("/METADATA", "/RECORD", "/blix.json"))
+            }
+
+    subprocess.check_call(["poetry", "blixbuild", "--force"], cwd=project)
+    pinned = requires_dist(path)
+
+    # A wheel built without the lock file gets the same pins as blixbuild, and keeps all other members as they are
+    subprocess.check_call(["poetry", "blixbuild", "--no-lock", "--force"], cwd=project)
+    unpinned_members = members(path)
+    assert requires_dist(path) != pinned
+    subprocess.check_call(["poetry", "blixrepin", "dist/blixexample-0.1.0-py3-none-any.whl"], cwd=project)
+    assert requires_dist(path) == pinned
+    assert members(path) == unpinned_members
+    with zipfile.ZipFile(path) as wheel:
+        assert wheel.testzip() is None
+    subprocess.check_call(["poetry", "blixvalidatewheel", "dist/blixexample-0.1.0-py3-none-any.whl"], cwd=project)
+
+    # Also re-pins wheels built by `poetry build`, written to another path
+    subprocess.check_call(["poetry", "build", "-f", "wheel"], cwd=project)
+    output = str(tmp_path / "repinned.whl")
+    subprocess.check_call(["poetry", "blixrepin", path, f"--output={output}"], cwd=project)
+    assert requires_dist(output) == pinned
+    assert members(output) == members(path)
+
+
+def test_positive_workspace(tmp_path):
+    def project(name, path_dependency=None, data_file="data_files/test.txt"):
+        cwd = tmp_path / name
+        shutil.copytree("positive_cases/happy_case_example", cwd, ignore=shutil.ignore_patterns("dist"))
+        pyproject = (cwd / "pyproject.toml").read_text().replace("data_files/test.txt", data_file)
+        if path_dependency:
+            pyproject += (
+                "\n[tool.poetry.group.local]\noptional = true\n\n[tool.poetry.group.local.dependencies]\n"
+                f'local = {{ path = "../{path_dependency}", develop = true }}\n'
+            )
+        (cwd / "pyproject.toml").write_text(pyproject)
+
+    project("lib")
+    project("app", path_dependency="lib")
+    project("broken", data_file="data_files/missing.txt")
+    project("dependent", path_dependency="broken")
+
+    process = subprocess.run(
+        ["poetry", "blixworkspace", "*", "--workers=2", "--force", f"--cache-dir={tmp_path / 'cache'}"],
+        cwd=tmp_path,
+        capture_output=True,
+        text=True,
+    )
+    assert process.returncode == 1, process.stdout + process.stderr
+    output = process.stdout
+    assert "Built lib in" in output and "Built app in" in output, output
+    assert output.index("Built lib in") < output.index("Built app in"), output
+    assert "Failed to build broken" in output, output
+    assert "Skipped dependent: Path dependency" in output, output
+    assert "Built 2 of 4 project(s)" in output, output
+    # Combined report of failures, with the output of the failed build
+    assert "data_files/missing.txt in data_files is not found" in process.stderr, process.stderr
+    assert "dependent skipped" in process.stderr, process.stderr
+
+    for name, built in [("lib", True), ("app", True), ("broken", False), ("dependent", False)]:
+        assert os.path.exists(tmp_path / name / "dist/blixexample-0.1.0-py3-none-any.whl") == built, name
+
+
+def test_positive_concurrent_builds(tmp_path, project):
+    dist = os.path.join(project, "dist")
+    wheel_name = "blixexample-0.1.0-py3-none-any.whl"
+
+    # Poetry creates the project's virtualenv on first use, which is not safe to do concurrently
+    subprocess.check_call(["poetry", "blixbuild", f"--cache-dir={tmp_path / 'cache'}"], cwd=project)
+
+    # Builds of the same wheel and of variants with other options, all at once
+    variants = [[], [], ["--only-lock", "--variant=only-lock"], ["--with-groups=integ", "--variant=integ"]]
+    processes = [
+        subprocess.Popen(
+            ["poetry", "blixbuild", "--force", f"--cache-dir={tmp_path / 'cache'}", *options],
+            cwd=project,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+        )
+        for options in variants
+    ]
+    for process in processes:
+        output, _ = process.communicate()
+        assert process.returncode == 0, output.decode()
+
+    # No staged files are left behind, and every wheel is complete
+    assert sorted(os.listdir(dist)) == [wheel_name, "integ", "only-lock"]
+    for path in [os.path.join(dist, wheel_name), *glob.glob(os.path.join(dist, "*", wheel_name))]:
+        with zipfile.ZipFile(path) as wheel:
+            assert wheel.testzip() is None
+    assert os.listdir(os.path.join(dist, "integ")) == [wheel_name]
+    assert "pytest (==7.3.1)" in pkginfo.Wheel(os.path.join(dist, "integ", wheel_name)).requires_dist
+    assert "nemoize (==0.1.0)" in pkginfo.Wheel(os.path.join(dist, "only-lock", wheel_name)).requires_dist
+
+    # Variant names must not point outside of dist/
+    process = subprocess.run(["poetry", "blixbuild", "--variant=../other"], cwd=project, capture_output=True, text=True)
+    assert process.returncode != 0
+    assert "--variant must be a directory name" in process.stdout + process.stderr
+
+
+def test_positive_source_discovery_index(tmp_path, project):
+    package = os.path.join(project, "src/blixexample")
+
+    def build(cache_dir, *options):
+        output = subprocess.check_output(
+            ["poetry", "blixbuild", "--force", f"--cache-dir={tmp_path / cache_dir}", *options],
+            cwd=project,
+            stderr=subprocess.STDOUT,
+        )
+        with zipfile.ZipFile(os.path.join(project, "dist/blixexample-0.1.0-py3-none-any.whl")) as wheel:
+            return output.decode(), sorted(wheel.namelist())
+
+    # Unchanged sources are found from the index
+    build("cache")
+    output, files = build("cache", "-vvv")
+    assert "Reusing the index of 2 package source(s)" in output, output
+
+    # Added and renamed modules and packages are found again, the same as without an index
+    os.makedirs(os.path.join(package, "subpackage"))
+    for name in ("__init__.py", "module.py"):
+        with open(os.path.join(package, "subpackage", name), "w") as f:
+            f.write("")
+    os.rename(os.path.join(package, "main.py"), os.path.join(package, "renamed.py"))
+    output, files = build("cache", "-vvv")
+    assert "Reusing the index of 2 package source(s)" not in output, output
+    assert build("cold")[1] == files
+    assert "blixexample/subpackage/module.py" in files
+    assert "blixexample/renamed.py" in files
+    assert "blixexample/main.py" not in files
+
+    # Newly ignored files are left out
+    with open(os.path.join(project, ".gitignore"), "w") as f:
+        f.write("renamed.py\n")
+    subprocess.check_call(["git", "init", "-q"], cwd=project)
+    _, files = build("cache")
+    assert "blixexample/renamed.py" not in files
+    assert build("other-cold")[1] == files
+
+
+def test_positive_source_discovery_fallback(tmp_path):
+    from types import SimpleNamespace
+
+    from poeblix.util import discovery
+    from poeblix.util.cache import BlixCache
+
+    # Without the poetry-core internals the index relies on, sources are always found by the builder
+    cache = BlixCache(tmp_path / "cache", "builds")
+    builder = SimpleNamespace(_path=tmp_path, format="wheel")
+    found = []
+    for _ in range(2):
+        assert discovery.find_files_to_add(builder, cache, True, lambda: found.append(1) or set()) == set()
+    assert len(found) == 2
+    assert not os.path.exists(tmp_path / "cache" / "builds")
+
+    # The git directory of worktrees is found from their .git file, without running git
+    project = tmp_path / "worktree" / "project"
+    common_dir = tmp_path / "repo" / ".git"
+    git_dir = common_dir / "worktrees" / "worktree"
+    os.makedirs(project)
+    os.makedirs(git_dir)
+    (git_dir / "commondir").write_text("../..\n")
+    (tmp_path / "worktree" / ".git").write_text(f"gitdir: {git_dir}\n")
+    assert discovery._git_dirs(project) == (git_dir, git_dir / "../..")
+
+
+def test_positive_watch(tmp_path, project):
+    path = os.path.join(project, "dist/blixexample-0.1.0-py3-none-any.whl")
+    lines: "queue.Queue[str]" = queue.Queue()
+
+    def contents(wheel_path):
+        with zipfile.ZipFile(wheel_path) as wheel:
+            return {name: wheel.read(name) for name in wheel.namelist()}
+
+    def wait_for(text):
+        seen = []
+        while True:
+            line = lines.get(timeout=60)
+            seen.append(line)
+            assert "Failed" not in line, "".join(seen)
+            if text in line:
+                return line
+
+    process = subprocess.Popen(
+        ["poetry", "blixbuild", "--watch", f"--cache-dir={tmp_path / 'cache'}"],
+        cwd=project,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        text=True,
+    )
+    threading.Thread(target=lambda: [lines.put(line) for line in process.stdout], daemon=True).start()
+    try:
+        wait_for("Watching 5 file(s) for changes")
+
+        # Only the modified module is replaced
+        with open(os.path.join(project, "src/blixexample/main.py"), "a") as f:
+            f.write("\n# changed\n")
+        assert "1 modified file(s)" in wait_for("Updated wheel")
+        assert contents(path)["blixexample/main.py"].endswith(b"# changed\n")
+
+        # The lock file resolves the dependencies again, and added files build the wheel again
+        os.utime(os.path.join(project, "poetry.lock"))
+        assert "poetry.lock" in wait_for("Updated wheel")
+        with open(os.path.join(project, "src/blixexample/added.py"), "w") as f:
+            f.write("ADDED = True\n")
+        assert "files added to or removed from the wheel" in wait_for("Updated wheel")
+        with open(os.path.join(project, "data_files/test.txt"), "a") as f:
+            f.write("changed")
+        assert "1 modified file(s)" in wait_for("Updated wheel")
+    finally:
+        process.send_signal(signal.SIGINT)
+        process.wait(timeout=60)
+    assert process.returncode == 0
+
+    # The updated wheel has the same contents as a wheel built from scratch
+    watched = contents(path)
+    subprocess.check_call(["poetry", "blixbuild", "--force", f"--cache-dir={tmp_path / 'cache'}"], cwd=project)
+    assert watched == contents(path)
+    with zipfile.ZipFile(path) as wheel:
+        assert wheel.testzip() is None
+
+
+def test_positive_daemon(tmp_path, project):
+    socket_path = str(tmp_path / "blix.sock")
+    path = os.path.join(project, "dist/blixexample-0.1.0-py3-none-any.whl")
+
+    def client(*args, cwd=project):
+        return subprocess.run(
+            [sys.executable, "-m", "poeblix.client", f"--socket={socket_path}", "--no-fallback", *args],
+            cwd=cwd,
+            capture_output=True,
+            text=True,
+        )
+
+    assert client("blixbuild").returncode == 1
+    daemon = subprocess.Popen(
+        ["poetry", "blixdaemon", f"--socket={socket_path}", "--jobs=2", "--idle-timeout=60"],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        text=True,
+    )
+    try:
+        assert "listening on" in daemon.stdout.readline()
+
+        # Commands run in the client's working directory and environment
+        build = client("blixbuild", "--force", "--reproducible", f"--cache-dir={tmp_path / 'cache'}")
+        assert build.returncode == 0, build.stdout
+        assert "Built blixexample-0.1.0-py3-none-any.whl" in build.stdout
+        environ = dict(os.environ, SOURCE_DATE_EPOCH="1700000000")
+        build = subprocess.run(
+            [sys.executable, "-m", "poeblix.client", f"--socket={socket_path}", "--no-fallback", "blixbuild", "--force"]
+            + ["--reproducible", f"--cache-dir={tmp_path / 'cache'}"],
+            cwd=os.path.join(project, "src"),
+            env=environ,
+            capture_output=True,
+            text=True,
+        )
+        assert build.returncode == 0, build.stdout
+        assert all(info.date_time == (2023, 11, 14, 22, 13, 20) for info in zipfile.ZipFile(path).infolist())
+        validate = client("blixvalidatewheel", "dist/blixexample-0.1.0-py3-none-any.whl")
+        assert validate.returncode == 0, validate.stdout
+        assert "Validation succeeded!" in validate.stdout
+
+        # The project is loaded again when pyproject.toml changes
+        with open(os.path.join(project, "pyproject.toml")) as f:
+            pyproject = f.read()
+        with open(os.path.join(project, "pyproject.toml"), "w") as f:
+            f.write(pyproject.replace('version = "0.1.0"', 'version = "0.2.0"', 1))
+        build = client("blixbuild", f"--cache-dir={tmp_path / 'cache'}")
+        assert build.returncode == 0, build.stdout
+        assert os.path.exists(os.path.join(project, "dist/blixexample-0.2.0-py3-none-any.whl"))
+
+        # Failures and unknown commands are reported with their exit codes
+        assert client("blixvalidatewheel", "dist/missing.whl").returncode != 0
+        unknown = client("build")
+        assert unknown.returncode == 1
+        assert "only runs these commands" in unknown.stdout
+        assert client("blixbuild", cwd=str(tmp_path)).returncode == 1
+
+        # Malformed requests get an error response instead of a dropped connection
+        from poeblix.util.daemon import recv_message, request
+
+        response = request(pathlib.Path(socket_path), {"cwd": project}, timeout=60)
+        assert response["exit_code"] == 1 and "Invalid request" in response["output"], response
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(60)
+            sock.connect(socket_path)
+            sock.sendall(struct.pack("!I", 5) + b"{oops")
+            response = recv_message(sock)
+        assert response["exit_code"] == 1 and "Invalid request" in response["output"], response
+
+        assert client("--stop").returncode == 0
+        daemon.wait(timeout=60)
+    finally:
+        if daemon.poll() is None:
+            daemon.kill()
+    output = daemon.stdout.read()
+    assert daemon.returncode == 0, output
+    assert "blixbuild --force --reproducible" in output
+    assert not os.path.exists(socket_path)
+
+    # Stops by itself after the idle timeout
+    daemon = subprocess.run(
+        ["poetry", "blixdaemon", f"--socket={socket_path}", "--idle-timeout=1"], capture_output=True, timeout=60
+    )
+    assert daemon.returncode == 0
+    assert not os.path.exists(socket_path)
+
+
+def test_positive_api(tmp_path, project):
+    from poeblix import api
+
+    cache_dir = tmp_path / "cache"
+    path = os.path.join(project, "dist/blixexample-0.1.0-py3-none-any.whl")
+
+    result = api.build(project, cache_dir=cache_dir)
+    assert result.wheels == [pathlib.Path(path)]
+    assert not result.cached
+    assert "Building blixexample (0.1.0)" in result.output
+    # Including what the wheel builder prints, in order
+    copied = "data_files/test.txt to wheel relative blixexample-0.1.0.data/data/share/data/test.txt"
+    assert copied in result.output, result.output
+    assert result.output.index("Building blixexample (0.1.0)") < result.output.index(copied)
+    # The project stays loaded, and the second build reuses the cached wheel
+    loaded = api.load_project(project)
+    result = api.build(project, cache_dir=cache_dir)
+    assert result.cached
+    assert api.load_project(project) == loaded
+
+    validation = api.validate_wheel(path, project, cache_dir=cache_dir)
+    assert validation.valid, validation.error
+    assert "Validation succeeded!" in validation.output
+    validation = api.validate_wheel(path, project, no_lock=True, with_groups=["integ"], cache_dir=cache_dir)
+    assert not validation
+    assert "Packages in Wheel file are not present in pyproject.toml/poetry.lock" in validation.error
+
+    # The project is loaded again when pyproject.toml changes
+    with open(os.path.join(project, "pyproject.toml")) as f:
+        pyproject = f.read()
+    with open(os.path.join(project, "pyproject.toml"), "w") as f:
+        f.write(pyproject.replace('version = "0.1.0"', 'version = "0.2.0"', 1))
+    result = api.build(project, only_lock=True, cache_dir=cache_dir)
+    assert result.wheels == [pathlib.Path(project, "dist/blixexample-0.2.0-py3-none-any.whl")]
+    assert api.load_project(project) != loaded
+    api.unload_projects()